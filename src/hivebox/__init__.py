@@ -1,5 +1,9 @@
 """Hivebox package configuration and shared utilities."""
 
+import json
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
 __version__ = "0.4.0"
 
 SENSEBOX_TEMP_SENSORS = {
@@ -10,6 +14,36 @@ SENSEBOX_TEMP_SENSORS = {
 
 FORMAT = 'json'
 
-def get_sensor_data(box_id, sensor_id):
+OPENSENSEMAP_URL = 'https://api.opensensemap.org'
+
+def get_sensor_data(box_id, sensor_id, base_url=OPENSENSEMAP_URL):
     """Generate API URL to retrieve temperature for given senseBox."""
-    return f'https://api.opensensemap.org/boxes/{box_id}/sensors/{sensor_id}'
+    return f'{base_url}/boxes/{box_id}/sensors/{sensor_id}'
+
+def get_box_data(box_id, base_url=OPENSENSEMAP_URL):
+    """Generate API URL to retrieve metadata, including sensors, of a senseBox."""
+    return f'{base_url}/boxes/{box_id}'
+
+def load_sensor_data(path: Union[str, Path]) -> Dict[str, str]:
+    """Load a senseBox ID to temperature sensor ID mapping from a JSON file."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not all(
+            isinstance(k, str) and isinstance(v, str) for k, v in data.items()):
+        raise ValueError(f'{path} must map senseBox IDs to sensor IDs')
+    return data
+
+def load_box_locations(path: Union[str, Path]) -> Dict[str, Tuple[float, float]]:
+    """Load senseBox locations from a JSON file mapping box IDs to [lon, lat].
+
+    Coordinates are in GeoJSON order, as in openSenseMap's currentLocation.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    try:
+        locations = {box_id: (float(lon), float(lat)) for box_id, (lon, lat, *_) in data.items()}
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f'{path} must map senseBox IDs to [lon, lat]') from e
+    if not all(-180 <= lon <= 180 and -90 <= lat <= 90 for lon, lat in locations.values()):
+        raise ValueError(f'{path} has coordinates out of range')
+    return locations
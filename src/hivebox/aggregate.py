@@ -0,0 +1,125 @@
+"""Temperature aggregation module."""
+
+import math
+import statistics
+from datetime import datetime
+from typing import TYPE_CHECKING, Sequence, Tuple
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional extra
+    np = None
+
+if TYPE_CHECKING:  # pragma: no cover
+    from hivebox.temperature import SensorReading
+
+AGGREGATION_METHODS = ("mean", "median", "trimmed", "mad", "weighted")
+
+# Scales the median absolute deviation to a standard deviation estimate
+# for normally distributed data.
+MAD_SCALE = 1.4826
+
+class Aggregator:
+    """Reduces sensor readings to a single robust temperature.
+
+    Methods:
+        mean      plain arithmetic mean
+        median    middle value
+        trimmed   mean after dropping the `trim` fraction at each end
+        mad       mean of values within `mad_threshold` scaled MADs of the median
+        weighted  mean weighted by 0.5 ** (age / half_life)
+
+    Readings are turned into value and age columns once and reduced with
+    vectorized NumPy operations when the optional numpy extra is
+    installed, falling back to the standard library otherwise.
+    """
+
+    def __init__(self, method: str = "mean", trim: float = 0.1,
+                 mad_threshold: float = 3.5, half_life: float = 1800.0):
+        if method not in AGGREGATION_METHODS:
+            raise ValueError(f"Unknown aggregation method: {method}")
+        if not 0 <= trim < 0.5:
+            raise ValueError("trim must be in [0, 0.5)")
+        self.method = method
+        self.trim = trim
+        self.mad_threshold = mad_threshold
+        self.half_life = half_life
+
+    def __call__(self, readings: Sequence['SensorReading'], now: datetime) -> float:
+        """Reduce the finite readings to one value.
+
+        Raises TemperatureServiceError when no finite reading is left.
+        """
+        readings = [r for r in readings if math.isfinite(r.value)]
+        if not readings:
+            # Imported late: the temperature module imports this one.
+            from hivebox.temperature import (  # pylint: disable=import-outside-toplevel
+                TemperatureServiceError)
+            raise TemperatureServiceError("No finite readings available")
+        values, ages = self.columns(readings, now)
+        if np is not None:
+            return float(getattr(self, f"_{self.method}_np")(values, ages))
+        return float(getattr(self, f"_{self.method}_py")(values, ages))
+
+    def columns(self, readings: Sequence['SensorReading'], now: datetime) -> Tuple:
+        """Split readings into value and age-in-seconds columns."""
+        reference = now.timestamp()
+        count = len(readings)
+        if np is not None:
+            values = np.fromiter((r.value for r in readings), dtype=np.float64, count=count)
+            if self.method != "weighted":
+                return values, None
+            stamps = np.fromiter((r.timestamp.timestamp() for r in readings),
+                                 dtype=np.float64, count=count)
+            return values, np.maximum(reference - stamps, 0.0)
+        values = [r.value for r in readings]
+        if self.method != "weighted":
+            return values, None
+        return values, [max(reference - r.timestamp.timestamp(), 0.0) for r in readings]
+
+    # NumPy backend
+
+    def _mean_np(self, values, _ages):
+        return values.mean()
+
+    def _median_np(self, values, _ages):
+        return np.median(values)
+
+    def _trimmed_np(self, values, _ages):
+        cut = int(len(values) * self.trim)
+        if cut == 0:
+            return values.mean()
+        return np.partition(values, (cut, len(values) - cut - 1))[cut:len(values) - cut].mean()
+
+    def _mad_np(self, values, _ages):
+        median = np.median(values)
+        deviation = np.abs(values - median)
+        limit = self.mad_threshold * MAD_SCALE * np.median(deviation)
+        return values[deviation <= limit].mean()
+
+    def _weighted_np(self, values, ages):
+        weights = np.exp2(-ages / self.half_life)
+        return np.dot(values, weights) / weights.sum()
+
+    # Standard library fallback
+
+    def _mean_py(self, values, _ages):
+        return sum(values) / len(values)
+
+    def _median_py(self, values, _ages):
+        return statistics.median(values)
+
+    def _trimmed_py(self, values, _ages):
+        cut = int(len(values) * self.trim)
+        kept = sorted(values)[cut:len(values) - cut]
+        return sum(kept) / len(kept)
+
+    def _mad_py(self, values, _ages):
+        median = statistics.median(values)
+        deviations = [abs(v - median) for v in values]
+        limit = self.mad_threshold * MAD_SCALE * statistics.median(deviations)
+        kept = [v for v, d in zip(values, deviations) if d <= limit]
+        return sum(kept) / len(kept)
+
+    def _weighted_py(self, values, ages):
+        weights = [2.0 ** (-age / self.half_life) for age in ages]
+        return sum(v * w for v, w in zip(values, weights)) / sum(weights)
@@ -0,0 +1,82 @@
+"""Shared plumbing for the periodic background services."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from hivebox.cache import CacheService, CacheServiceError
+
+class PeriodicTask:
+    """Runs `tick` in a background task every `period` seconds until stopped.
+
+    Subclasses implement tick() and period. A failing tick is reported and
+    retried next period: ending the loop would silently leave the process
+    without updates.
+    """
+
+    name = "background task"
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def period(self) -> float:
+        raise NotImplementedError
+
+    @property
+    def running(self) -> bool:
+        """Whether the background loop is active."""
+        return self.task is not None and not self.task.done()
+
+    async def tick(self):
+        raise NotImplementedError
+
+    async def run(self):
+        """Tick forever, starting immediately."""
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                print(f"Unexpected {self.name} error: {e!r}", flush=True)
+            await asyncio.sleep(self.period)
+
+    def start(self):
+        """Schedule the loop on the running event loop."""
+        if not self.running:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel the loop and wait for it to finish."""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+@asynccontextmanager
+async def lease(cache_svc: CacheService, ttl: int, key: Optional[str] = None,
+                label: str = "Cache lease") -> AsyncIterator[bool]:
+    """Hold a Redis lease for the block, yielding whether to do the work here.
+
+    Yields False only while another replica holds the lease. The lease is
+    released on exit; lease errors are reported under `label`.
+    """
+    try:
+        token = await cache_svc.acquire_lease(ttl, key)
+    except CacheServiceError as e:
+        # Without Redis there is no one to coordinate with.
+        print(f"{label} error: {e}", flush=True)
+        yield True
+        return
+    if token is None:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        try:
+            await cache_svc.release_lease(token, key)
+        except CacheServiceError as e:
+            print(f"{label} error: {e}", flush=True)
@@ -0,0 +1,64 @@
+"""Circuit breaker module."""
+
+import random
+import time
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Tracks dependency failures and decides when calls may go through.
+
+    After failure_threshold consecutive failures the circuit opens and
+    calls are refused without touching the dependency. Once a jittered,
+    exponentially growing delay has passed the owner runs a single trial
+    (half-open); its outcome closes the circuit or reopens it with a
+    longer delay.
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.retry_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether regular calls may use the dependency."""
+        return self.state == CircuitState.CLOSED
+
+    def remaining(self) -> float:
+        """Seconds until the next trial is due, 0 when closed or due now."""
+        if self.state == CircuitState.CLOSED:
+            return 0.0
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def half_open(self):
+        """Mark the start of a trial call."""
+        self.state = CircuitState.HALF_OPEN
+
+    def record_success(self):
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened = 0
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when this call opened the circuit."""
+        self.failures += 1
+        if self.state == CircuitState.HALF_OPEN or (
+                self.state == CircuitState.CLOSED
+                and self.failures >= self.failure_threshold):
+            self._open()
+            return True
+        return False
+
+    def _open(self):
+        delay = min(self.max_delay, self.base_delay * 2 ** self.opened)
+        self.retry_at = time.monotonic() + random.uniform(delay / 2, delay)
+        self.opened += 1
+        self.state = CircuitState.OPEN
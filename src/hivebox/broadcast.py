@@ -0,0 +1,55 @@
+"""In-process fan-out of temperature updates to streaming clients."""
+
+import asyncio
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, Optional, Set
+
+# Every live broadcaster, so shutdown can end all open streams at once.
+_BROADCASTERS: "weakref.WeakSet[Broadcaster]" = weakref.WeakSet()
+
+
+class Broadcaster:
+    """Deliver each published message to every current subscriber.
+
+    Every subscriber gets a queue holding only the latest message: a slow
+    client skips intermediate updates instead of buffering them, so an idle
+    subscriber costs one queue and nothing else. Publishing None tells all
+    subscribers to stop; once closed, later subscribers are told at once.
+    """
+
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.closed = False
+        _BROADCASTERS.add(self)
+
+    def publish(self, message: Optional[str]):
+        if self.closed:
+            return
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue]:
+        """Register a queue for the duration of the with block."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if self.closed:
+            queue.put_nowait(None)
+        self.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers.discard(queue)
+
+    def close(self):
+        """Ask every subscriber to finish."""
+        self.publish(None)
+        self.closed = True
+
+
+def close_all():
+    """Close every broadcaster in this process, ending all open streams."""
+    for broadcaster in list(_BROADCASTERS):
+        broadcaster.close()
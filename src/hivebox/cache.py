@@ -1,71 +1,512 @@
 """Redis caching module."""
 
+import asyncio
 import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union
 from pydantic import ValidationError
 from redis.asyncio import Redis
-from redis.exceptions import ConnectionError
-from hivebox.temperature import TemperatureResult
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.connection import parse_url
+from redis.asyncio.sentinel import Sentinel
+from redis.cluster import LoadBalancingStrategy
+from redis.exceptions import (
+    ConnectionError,
+    RedisClusterException,
+    RedisError,
+    TimeoutError as RedisTimeoutError
+)
+from hivebox.breaker import CircuitBreaker, CircuitState
+from hivebox.broadcast import Broadcaster
+from hivebox.codec import dumps, loads, parse_timestamp
+from hivebox.metrics import CACHE_ERRORS, REDIS_LATENCY
+from hivebox.temperature import SensorReading, TemperatureResult
 
 class CacheMessages:
     REDIS_CONN_FAIL = "Connection to redis server failed"
     REDIS_CONN_SUCCESS = "Connection to redis server succeeded"
     RETRY_TOO_SOON = "Tried to reconnect too soon"
+    CIRCUIT_OPEN = "Redis circuit is open, skipping cache"
     CACHE_OUTDATED = "Cache is outdated"
     CACHE_INVALID = "Cache is invalid or malformed"
+    REDIS_COMMAND_FAIL = "Redis rejected the command"
+
+# A cluster client raises RedisClusterException when no node is reachable.
+REDIS_ERRORS = (ConnectionError, RedisTimeoutError, RedisClusterException)
+# Errors from a reachable Redis, e.g. a cross-slot command or a script
+# error; they fail the call without counting against the circuit.
+COMMAND_ERRORS = (RedisError,)
+
+# Delete the lease only if it still holds our token, so an expired lease
+# that another replica has since taken is never released by us.
+RELEASE_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Token bucket kept as a hash of the token count and last refill time, in
+# Redis server time so replicas' clocks don't matter. Takes up to ARGV[3]
+# tokens and returns how many were granted and, if none were, how many ms
+# until the next one is due.
+TAKE_TOKENS_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call("time")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call("hmget", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("pexpire", KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+local wait = 0
+if granted == 0 then
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+return {granted, wait}
+"""
 
 class CacheServiceError(Exception):
     """Raised when cache service operations fail."""
 
+ERROR_KINDS = {message: name.lower() for name, message in vars(CacheMessages).items()
+               if name.isupper()}
+
+def _error(message: str) -> CacheServiceError:
+    """Build a CacheServiceError and count it by kind."""
+    CACHE_ERRORS.labels(kind=ERROR_KINDS.get(message, "other")).inc()
+    return CacheServiceError(message)
+
+class LocalCache:
+    """Bounded in-process cache whose entries expire after a TTL.
+
+    Least recently used entries are evicted once maxsize is reached.
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if time.monotonic() >= expires:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one key, or everything when no key is given."""
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+
+TOPOLOGIES = ("standalone", "sentinel", "cluster")
+
+def create_clients(dsn: str, cfg: dict, topology: Optional[dict] = None) -> Tuple[Any, Any, Any]:
+    """Build the writer, reader and pub/sub clients for a Redis topology.
+
+    standalone uses the DSN for everything. sentinel discovers the primary
+    and a replica of service_name through the listed sentinels, taking
+    credentials and db from the DSN. cluster routes reads to replicas
+    itself; as the asyncio cluster client has no pub/sub, and cluster
+    pipelines refuse PUBLISH, subscriptions and publishes go through a
+    plain connection to the DSN node, as every publish reaches the whole
+    cluster.
+    """
+    topology = topology or {}
+    mode = topology.get("mode", "standalone")
+    read_from_replicas = topology.get("read_from_replicas", True)
+    kwargs = {key: value for key, value in cfg.items() if value is not None}
+    if mode == "standalone":
+        client = Redis.from_url(dsn, **kwargs)
+        return client, client, client
+    if mode == "sentinel":
+        url = parse_url(dsn)
+        url.pop("host", None)
+        url.pop("port", None)
+        if url.pop("connection_class", None) is not None:
+            # rediss://; the sentinel pools pick their own connection class.
+            url["ssl"] = True
+        sentinels = [(host, int(port)) for host, _, port in
+                     (node.rpartition(":") for node in topology.get("sentinels", ()))]
+        sentinel = Sentinel(sentinels, **url, **kwargs)
+        service_name = topology.get("service_name", "mymaster")
+        client = sentinel.master_for(service_name)
+        reader = sentinel.slave_for(service_name) if read_from_replicas else client
+        return client, reader, client
+    if mode == "cluster":
+        strategy = LoadBalancingStrategy.ROUND_ROBIN if read_from_replicas else None
+        client = RedisCluster.from_url(dsn, load_balancing_strategy=strategy, **kwargs)
+        return client, client, Redis.from_url(dsn, **kwargs)
+    raise ValueError(f"Unknown Redis topology {mode!r}, expected one of {TOPOLOGIES}")
+
+@dataclass(frozen=True)
+class CachedResult:
+    """A cached result together with its serialized response body.
+
+    The body is the exact JSON stored in Redis, validated once when it was
+    written or first read, so hits can be served without re-serializing.
+    """
+    result: TemperatureResult
+    body: bytes
+
+def _dump_reading(reading: SensorReading) -> bytes:
+    return dumps({
+        "sensor_id": reading.sensor_id,
+        "value": reading.value,
+        "timestamp": reading.timestamp.isoformat(),
+    })
+
+def _load_reading(raw: Union[bytes, str]) -> Optional[SensorReading]:
+    try:
+        data = loads(raw)
+        return SensorReading(
+            sensor_id=data["sensor_id"],
+            value=float(data["value"]),
+            timestamp=parse_timestamp(data["timestamp"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
 class CacheService:
-    """Handles temperature data caching and retrieval."""
+    """Handles temperature data caching and retrieval.
+
+    Keys live under a namespace: one for the aggregate result and one per
+    sensor reading. Every key carries a Redis-side expiry anchored to the
+    data's own timestamp, so Redis evicts dead data by itself. The
+    aggregate is retained stale_ttl seconds past max_age so it can still be
+    served while a refresh runs. Each update is also appended to a capped
+    history stream and published on the updates channel in the same
+    round-trip; every replica's listener relays it to its broadcaster.
 
-    def __init__(self, dsn: str, redis_config: dict):
+    All Redis calls go through a circuit breaker: once Redis is deemed
+    down, calls fail fast and a background probe pings it with jittered
+    exponential backoff until it answers again.
+
+    Writes, leases and pings go to the primary (client); cached reads may
+    be served by replicas (reader), see create_clients.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, dsn: str, redis_config: dict, local: Optional[LocalCache] = None,
+                 max_age: int = 3600, stale_ttl: int = 86400, namespace: str = "hivebox",
+                 breaker: Optional[CircuitBreaker] = None, history_maxlen: int = 100_000,
+                 broadcaster: Optional[Broadcaster] = None, topology: Optional[dict] = None):
         self.dsn = dsn
         self.cfg = redis_config
-        self.tag = "temp:latest"
+        self.topology = topology
+        self.cluster = (topology or {}).get("mode") == "cluster"
+        self.namespace = namespace
+        self.max_age = max_age
+        self.stale_ttl = stale_ttl
+        self.tag = f"{namespace}:temp:latest"
+        self.lease_tag = f"{namespace}:lease:temp:latest"
+        self.channel = f"{namespace}:invalidate"
+        self.updates_channel = f"{namespace}:updates"
+        self.history_tag = f"{namespace}:history"
+        self.catalog_tag = f"{namespace}:catalog"
+        self.catalog_lease_tag = f"{namespace}:lease:catalog"
+        self.history_maxlen = history_maxlen
+        self.instance_id = uuid.uuid4().hex
+        self.local = local if local is not None else LocalCache()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.broadcaster = broadcaster if broadcaster is not None else Broadcaster()
+        self.listener: Optional[asyncio.Task] = None
+        self.prober: Optional[asyncio.Task] = None
         self.client = None
-        self.last_retry = None
-        self.client = Redis.from_url(self.dsn, **self.cfg)
+        self.client, self.reader, self.subscriber = create_clients(
+            self.dsn, self.cfg, self.topology)
+        self.release_script = self.client.register_script(RELEASE_LEASE_SCRIPT)
+        self.take_tokens_script = self.client.register_script(TAKE_TOKENS_SCRIPT)
 
     async def connect(self):
-        now = int(time.time())
-        if self.last_retry is not None:
-            delta = now - self.last_retry
-            if delta < 300:
-                raise CacheServiceError(CacheMessages.RETRY_TOO_SOON)
-        self.last_retry = now
+        if self.breaker.remaining() > 0:
+            raise _error(CacheMessages.RETRY_TOO_SOON)
         try:
             await self.client.ping()
+            self.breaker.record_success()
             print(CacheMessages.REDIS_CONN_SUCCESS, flush=True)
-        except ConnectionError:
+        except REDIS_ERRORS:
+            self._record_failure()
             print(CacheMessages.REDIS_CONN_FAIL, flush=True)
 
+    async def ping(self):
+        """Check Redis is reachable, through the circuit breaker."""
+        await self.call(self.client.ping)
+
+    async def call(self, fn, *args, **kwargs):
+        """Run one Redis command behind the circuit breaker."""
+        if not self.breaker.allow():
+            raise _error(CacheMessages.CIRCUIT_OPEN)
+        command = getattr(fn, "__name__", "script")
+        try:
+            with REDIS_LATENCY.labels(command=command).time():
+                result = await fn(*args, **kwargs)
+        except REDIS_ERRORS as e:
+            self._record_failure()
+            raise _error(CacheMessages.REDIS_CONN_FAIL) from e
+        except COMMAND_ERRORS as e:
+            raise _error(CacheMessages.REDIS_COMMAND_FAIL) from e
+        self.breaker.record_success()
+        return result
+
+    def _record_failure(self):
+        if self.breaker.record_failure() and (self.prober is None or self.prober.done()):
+            self.prober = asyncio.create_task(self.probe())
+
+    async def probe(self):
+        """Ping Redis after each backoff delay until the circuit closes.
+
+        Pooled connections are dropped after a failed ping so the next
+        attempt dials Redis afresh instead of reusing a broken socket.
+        """
+        while self.breaker.state != CircuitState.CLOSED:
+            await asyncio.sleep(self.breaker.remaining())
+            self.breaker.half_open()
+            try:
+                await self.client.ping()
+            except REDIS_ERRORS:
+                self.breaker.record_failure()
+                await self._disconnect()
+                continue
+            self.breaker.record_success()
+            print(CacheMessages.REDIS_CONN_SUCCESS, flush=True)
+
+    async def _disconnect(self):
+        # The cluster client re-discovers its nodes by itself.
+        for client in {id(c): c for c in (self.client, self.reader)}.values():
+            pool = getattr(client, "connection_pool", None)
+            if pool is not None:
+                await pool.disconnect()
+
     async def _check(self, cache: TemperatureResult):
         now = int(time.time())
-        return (now - cache.timestamp) < 3600
+        return (now - cache.timestamp) < self.max_age
 
-    async def fetch(self):
+    def sensor_key(self, sensor_id: str) -> str:
+        # Hash-tagged so a cluster keeps all readings in one slot for MGET.
+        return f"{{{self.namespace}}}:sensor:{sensor_id}"
+
+    def region_key(self, region: str) -> str:
+        return f"{self.namespace}:temp:region:{region}"
+
+    async def fetch(self, allow_stale: bool = False) -> TemperatureResult:
+        return (await self.fetch_cached(allow_stale)).result
+
+    async def fetch_cached(self, allow_stale: bool = False,
+                           key: Optional[str] = None) -> CachedResult:
+        """Return the cached result along with its pre-serialized body.
+
+        key selects another result than the global one, e.g. a region's.
+        """
+        key = key or self.tag
+        cache = self.local.get(key)
+        if cache is None:
+            cache = await self._fetch_remote(key)
+            self.local.set(key, cache)
+        if allow_stale or await self._check(cache.result):
+            return cache
+        else:
+            raise _error(CacheMessages.CACHE_OUTDATED)
+
+    async def _fetch_remote(self, key: str) -> CachedResult:
+        raw = await self.call(self.reader.get, key)
         try:
-            try:
-                raw = await self.client.get(self.tag)
-            except ConnectionError:
-                await self.connect()
-                raw = await self.client.get(self.tag)
-        except ConnectionError:
-            raise CacheServiceError(CacheMessages.REDIS_CONN_FAIL)
+            result = TemperatureResult.model_validate_json(raw)
+        except ValidationError:
+            raise _error(CacheMessages.CACHE_INVALID)
+        return CachedResult(result, raw.encode() if isinstance(raw, str) else raw)
+
+    async def update(self, result: TemperatureResult,
+                     readings: Sequence[SensorReading] = ()):
+        """Store the aggregate, its readings and a history entry in one round-trip."""
+        pipe = self.client.pipeline(transaction=False)
+        payload = result.model_dump_json()
+        expires = (result.timestamp + self.max_age + self.stale_ttl) * 1000
+        pipe.set(self.tag, payload, pxat=expires)
+        self._set_readings(pipe, readings)
+        if self.history_maxlen > 0:
+            entry = {"value": result.value, "status": result.status,
+                     "timestamp": result.timestamp}
+            pipe.xadd(self.history_tag, entry, maxlen=self.history_maxlen, approximate=True)
+        await self._execute(pipe, [(self.channel, f"{self.instance_id} {self.tag}"),
+                                   (self.updates_channel, payload)])
+        self.local.set(self.tag, CachedResult(result, payload.encode()))
+
+    async def update_region(self, key: str, result: TemperatureResult, ttl: int,
+                            readings: Sequence[SensorReading] = ()) -> CachedResult:
+        """Store a regional result for ttl seconds, with the readings it fetched.
+
+        Regional results are neither kept stale nor recorded in history;
+        the region is simply recomputed once its key has expired.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        payload = result.model_dump_json()
+        pipe.set(key, payload, pxat=(result.timestamp + ttl) * 1000)
+        self._set_readings(pipe, readings)
+        await self._execute(pipe, [(self.channel, f"{self.instance_id} {key}")])
+        cache = CachedResult(result, payload.encode())
+        self.local.set(key, cache)
+        return cache
+
+    async def _execute(self, pipe, messages: Sequence[Tuple[str, str]]):
+        """Run the pipeline and publish messages, in the same round-trip if possible.
+
+        A cluster pipeline refuses PUBLISH, so there the messages follow
+        through the subscriber connection once the writes are done.
+        """
+        if not self.cluster:
+            for channel, message in messages:
+                pipe.publish(channel, message)
+            await self.call(pipe.execute)
+            return
+        await self.call(pipe.execute)
+        for channel, message in messages:
+            await self.call(self.subscriber.publish, channel, message)
+
+    def _set_readings(self, pipe, readings: Sequence[SensorReading]):
+        for reading in readings:
+            expires = int((reading.timestamp.timestamp() + self.max_age) * 1000)
+            pipe.set(self.sensor_key(reading.sensor_id), _dump_reading(reading), pxat=expires)
+
+    async def fetch_readings(self, sensor_ids: Iterable[str]) -> Dict[str, SensorReading]:
+        """Return the cached, unexpired readings for sensor_ids with one MGET."""
+        sensor_ids = list(sensor_ids)
+        if not sensor_ids:
+            return {}
+        # A cluster client splits the keys by slot itself; hash tags make it one.
+        mget = self.reader.mget_nonatomic if self.cluster else self.reader.mget
+        raw = await self.call(mget, [self.sensor_key(i) for i in sensor_ids])
+        readings = {}
+        for sensor_id, value in zip(sensor_ids, raw):
+            reading = _load_reading(value) if value is not None else None
+            if reading is not None:
+                readings[sensor_id] = reading
+        return readings
+
+    def _on_invalidate(self, data):
+        if isinstance(data, bytes):
+            data = data.decode()
+        sender, _, key = data.partition(" ")
+        if sender != self.instance_id:
+            self.local.invalidate(key or None)
+
+    def _on_update(self, data):
+        if isinstance(data, str):
+            data = data.encode()
         try:
-            cache = TemperatureResult.model_validate_json(raw)
+            result = TemperatureResult.model_validate_json(data)
         except ValidationError:
-            raise CacheServiceError(CacheMessages.CACHE_INVALID)
-        if await self._check(cache):
-            return cache
-        else:
-            raise CacheServiceError(CacheMessages.CACHE_OUTDATED)
+            return
+        self.local.set(self.tag, CachedResult(result, data))
+        self.broadcaster.publish(data.decode())
+
+    async def listen(self):
+        """Drop L1 entries that other replicas have rewritten and relay updates.
+
+        Invalidations sent while the subscription is down are lost, so the
+        whole L1 is cleared whenever it has to be re-established.
+        """
+        backoff = 1
+        while True:
+            pubsub = self.subscriber.pubsub()
+            try:
+                await pubsub.subscribe(self.channel, self.updates_channel)
+                backoff = 1
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    if channel == self.updates_channel:
+                        self._on_update(message["data"])
+                    else:
+                        self._on_invalidate(message["data"])
+            except REDIS_ERRORS:
+                self.local.invalidate()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+    def start_listener(self):
+        """Run the invalidation listener in the background."""
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.listen())
 
-    async def update(self, result: TemperatureResult):
-        serialized = result.model_dump_json()
+    async def stop_listener(self):
+        """Cancel the invalidation listener and wait for it to finish."""
+        if self.listener is None:
+            return
+        self.listener.cancel()
         try:
-            await self.client.set(self.tag, serialized)
-        except ConnectionError:
-            await self.connect()
-            await self.client.set(self.tag, serialized)
\ No newline at end of file
+            await self.listener
+        except asyncio.CancelledError:
+            pass
+        self.listener = None
+
+    async def close(self):
+        """Stop background tasks, end subscriber streams and close the pool."""
+        await self.stop_listener()
+        self.broadcaster.close()
+        if self.prober is not None:
+            self.prober.cancel()
+            try:
+                await self.prober
+            except asyncio.CancelledError:
+                pass
+            self.prober = None
+        for client in {id(c): c for c in (self.client, self.reader, self.subscriber)}.values():
+            await client.aclose()
+
+    async def acquire_lease(self, ttl: int, key: Optional[str] = None) -> Optional[str]:
+        """Try to become the replica that recomputes the cached value.
+
+        key names another lease than the cached value's. Returns a token
+        to pass to release_lease, or None when another replica already
+        holds the lease.
+        """
+        token = uuid.uuid4().hex
+        acquired = await self.call(self.client.set, key or self.lease_tag, token,
+                                   nx=True, ex=ttl)
+        return token if acquired else None
+
+    async def release_lease(self, token: str, key: Optional[str] = None):
+        """Release a lease obtained from acquire_lease."""
+        await self.call(self.release_script, keys=[key or self.lease_tag], args=[token])
+
+    def bucket_key(self, name: str) -> str:
+        return f"{self.namespace}:ratelimit:{name}"
+
+    async def take_tokens(self, key: str, rate: float, burst: int,
+                          count: int) -> Tuple[int, float]:
+        """Take up to count tokens from a shared bucket refilled at rate per second.
+
+        Returns the number granted and, when none were, the seconds until
+        the next token is due.
+        """
+        granted, wait = await self.call(self.take_tokens_script, keys=[key],
+                                        args=[rate, burst, count])
+        return int(granted), int(wait) / 1000
@@ -0,0 +1,102 @@
+"""JSON encoding and decoding on the hot paths.
+
+orjson and msgspec are optional extras; the standard library is used for
+whatever is not installed. Upstream sensor payloads are decoded by msgspec
+into just the fields we read, or by orjson otherwise, and the API encodes
+its responses with orjson when available.
+"""
+
+import json
+import math
+from datetime import datetime, timezone
+from typing import Any, Optional, Tuple, Union
+from fastapi.responses import JSONResponse
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional extra
+    orjson = None
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - msgspec is an optional extra
+    msgspec = None
+
+# Errors raised for malformed input, whichever backend decoded it.
+DECODE_ERRORS = (KeyError, TypeError, ValueError) + (
+    (msgspec.MsgspecError,) if msgspec is not None else ())
+
+if msgspec is not None:
+    class _Measurement(msgspec.Struct):
+        createdAt: str
+        value: Union[str, float]
+
+    class _Sensor(msgspec.Struct):
+        lastMeasurement: Optional[_Measurement] = None
+
+    _SENSOR_DECODER = msgspec.json.Decoder(_Sensor)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Deserialize a JSON document from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize obj to compact UTF-8 JSON.
+
+    Like orjson, the fallback never writes the non-standard NaN and
+    Infinity tokens; it raises ValueError where orjson writes null.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode()
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp, assuming UTC when no offset is given.
+
+    openSenseMap's "2025-05-20T21:00:00.000Z" form is sliced directly;
+    anything else goes through datetime.fromisoformat.
+    """
+    if (len(value) in (20, 24) and value[-1] == "Z" and value[10] == "T"
+            and value[4] + value[7] + value[13] + value[16] == "--::"
+            and (len(value) == 20 or value[19] == ".")):
+        try:
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                            int(value[20:23] or 0) * 1000, tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    timestamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def load_measurement(content: bytes) -> Tuple[float, datetime]:
+    """Return the value and time of a sensor payload's lastMeasurement.
+
+    Raises one of DECODE_ERRORS when the payload is malformed or the value
+    is not a finite number, e.g. "NaN".
+    """
+    if msgspec is not None:
+        measurement = _SENSOR_DECODER.decode(content).lastMeasurement
+        if measurement is None:
+            raise KeyError("lastMeasurement")
+        created_at, value = measurement.createdAt, measurement.value
+    else:
+        measurement = loads(content)["lastMeasurement"]
+        created_at, value = measurement["createdAt"], measurement["value"]
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"Non-finite measurement {value}")
+    return value, parse_timestamp(created_at)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,220 @@
+"""senseBox discovery module."""
+
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import httpx
+from pydantic import BaseModel, ValidationError
+from hivebox import OPENSENSEMAP_URL, get_box_data
+from hivebox.background import PeriodicTask, lease
+from hivebox.cache import CacheService, CacheServiceError
+from hivebox.region import RegionService
+from hivebox.temperature import TemperatureService, TemperatureServiceError
+
+PHENOMENA = ("temperatur", "temperature", "lufttemperatur", "air temperature")
+UNITS = ("°c", "℃", "c", "degc")
+
+
+class DiscoveryError(Exception):
+    """Raised when box metadata cannot be retrieved."""
+
+
+class BoxEntry(BaseModel):
+    """The temperature sensor and location found for one senseBox."""
+    sensor_id: str
+    location: Optional[Tuple[float, float]] = None
+
+
+class BoxCatalog(BaseModel):
+    """Discovered senseBoxes, keyed by box ID, and when they were discovered."""
+    timestamp: int
+    boxes: Dict[str, BoxEntry]
+
+    def sensor_data(self) -> Dict[str, str]:
+        return {box_id: entry.sensor_id for box_id, entry in self.boxes.items()}
+
+    def locations(self) -> Dict[str, Tuple[float, float]]:
+        """Return the known locations as (lon, lat)."""
+        return {box_id: entry.location for box_id, entry in self.boxes.items()
+                if entry.location is not None}
+
+
+def find_temperature_sensor(box: Dict[str, Any], phenomena: Sequence[str] = PHENOMENA,
+                            units: Sequence[str] = UNITS) -> Optional[str]:
+    """Return the ID of the box's air temperature sensor, if it has one.
+
+    A sensor whose title names the phenomenon and whose unit is Celsius is
+    preferred; otherwise any Celsius sensor with "temp" in its title.
+    """
+    fallback = None
+    for sensor in box.get("sensors") or ():
+        title = str(sensor.get("title", "")).strip().casefold()
+        unit = str(sensor.get("unit", "")).strip().casefold()
+        if unit not in units or "_id" not in sensor:
+            continue
+        if title in phenomena:
+            return sensor["_id"]
+        if fallback is None and "temp" in title:
+            fallback = sensor["_id"]
+    return fallback
+
+
+def _box_entry(box: Dict[str, Any], phenomena: Sequence[str] = PHENOMENA) -> Optional[BoxEntry]:
+    sensor_id = find_temperature_sensor(box, phenomena)
+    if sensor_id is None:
+        return None
+    try:
+        lon, lat = box["currentLocation"]["coordinates"][:2]
+        location = (float(lon), float(lat))
+    except (KeyError, TypeError, ValueError):
+        location = None
+    return BoxEntry(sensor_id=sensor_id, location=location)
+
+
+class DiscoveryService(PeriodicTask):
+    """Keeps a catalog of the senseBoxes' temperature sensors and locations.
+
+    Box metadata is fetched once per `interval`, either for a list of box
+    IDs or for every box in a bbox measuring the phenomenon, and stored in
+    Redis without expiry so restarts and other replicas start from it.
+    Every `reload_interval` the catalog is read back and applied to the
+    temperature and region services, so the hot path only ever sees a plain
+    box to sensor mapping. Only a discovering instance (the first worker of
+    each pod) calls upstream, and only the one of them holding the catalog
+    lease, through the upstream rate limiter; the others follow the cached
+    catalog.
+    """
+
+    name = "discovery"
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-instance-attributes
+    def __init__(self, temp_svc: TemperatureService, cache_svc: CacheService,
+                 client: httpx.AsyncClient, boxes: Iterable[str] = (),
+                 bbox: Optional[str] = None, phenomenon: str = "Temperatur",
+                 interval: int = 86400, reload_interval: int = 300, concurrency: int = 10,
+                 base_url: str = OPENSENSEMAP_URL, region_svc: Optional[RegionService] = None,
+                 discover: bool = True, lease_ttl: int = 600):
+        super().__init__()
+        self.temp_svc = temp_svc
+        self.cache_svc = cache_svc
+        self.client = client
+        self.boxes = list(boxes)
+        self.bbox = bbox
+        self.phenomenon = phenomenon
+        # The configured phenomenon names the sensor too, besides the usual titles.
+        self.phenomena = (phenomenon.strip().casefold(), *PHENOMENA)
+        self.interval = interval
+        self.reload_interval = reload_interval
+        self.concurrency = max(1, concurrency)
+        self.base_url = base_url
+        self.region_svc = region_svc
+        self.discover_here = discover
+        self.lease_ttl = lease_ttl
+        self.catalog: Optional[BoxCatalog] = None
+
+    @property
+    def period(self) -> float:
+        return self.reload_interval
+
+    async def discover(self) -> BoxCatalog:
+        """Fetch box metadata upstream and build a fresh catalog."""
+        if self.bbox is not None:
+            boxes = await self._get(f"{self.base_url}/boxes",
+                                    params={"bbox": self.bbox, "phenomenon": self.phenomenon})
+            if not isinstance(boxes, list):
+                raise DiscoveryError("Unexpected box listing from openSenseMap")
+        else:
+            boxes = await self._fetch_boxes(self.boxes)
+        entries = {}
+        for box in boxes:
+            entry = _box_entry(box, self.phenomena) if isinstance(box, dict) else None
+            if entry is not None and "_id" in box:
+                entries[box["_id"]] = entry
+        if not entries:
+            raise DiscoveryError("No senseBox with a temperature sensor was found")
+        print(f"Discovered {len(entries)} of {len(boxes)} senseBoxes", flush=True)
+        return BoxCatalog(timestamp=int(time.time()), boxes=entries)
+
+    async def _fetch_boxes(self, box_ids: List[str]) -> List[Dict[str, Any]]:
+        """Fetch each box's metadata through at most `concurrency` workers."""
+        pending = iter(box_ids)
+        boxes = []
+
+        async def worker():
+            for box_id in pending:
+                try:
+                    boxes.append(await self._get(get_box_data(box_id, self.base_url)))
+                except DiscoveryError as e:
+                    print(f"Discovery error: {e}", flush=True)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return boxes
+
+    async def _get(self, url: str, params: Optional[Dict[str, str]] = None) -> Any:
+        try:
+            if self.temp_svc.limiter is not None:
+                await self.temp_svc.limiter.acquire()
+            response = await self.client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError, TemperatureServiceError) as e:
+            raise DiscoveryError(f"Failed to fetch {url}: {e}") from e
+
+    async def load(self) -> Optional[BoxCatalog]:
+        """Return the catalog stored in Redis, if any."""
+        raw = await self.cache_svc.call(self.cache_svc.reader.get, self.cache_svc.catalog_tag)
+        if raw is None:
+            return None
+        try:
+            return BoxCatalog.model_validate_json(raw)
+        except ValidationError:
+            return None
+
+    async def refresh(self) -> Optional[BoxCatalog]:
+        """Apply the cached catalog, rediscovering first if it is due and ours to do."""
+        try:
+            catalog = await self.load()
+        except CacheServiceError as e:
+            print(f"Catalog fetch error: {e}", flush=True)
+            catalog = self.catalog
+        if self.discover_here and self._due(catalog):
+            catalog = await self._rediscover(catalog)
+        if catalog is not None:
+            self.apply(catalog)
+        return catalog
+
+    def _due(self, catalog: Optional[BoxCatalog]) -> bool:
+        return catalog is None or time.time() - catalog.timestamp >= self.interval
+
+    async def _rediscover(self, catalog: Optional[BoxCatalog]) -> Optional[BoxCatalog]:
+        """Discover and store a new catalog, unless another replica holds the lease."""
+        async with lease(self.cache_svc, self.lease_ttl, self.cache_svc.catalog_lease_tag,
+                         "Catalog lease") as ours:
+            if not ours:
+                # Another replica is discovering; its catalog is picked up later.
+                return catalog
+            try:
+                catalog = await self.discover()
+            except DiscoveryError as e:
+                print(f"Discovery error: {e}", flush=True)
+                return catalog
+            try:
+                await self.cache_svc.call(self.cache_svc.client.set,
+                                          self.cache_svc.catalog_tag,
+                                          catalog.model_dump_json())
+            except CacheServiceError as e:
+                print(f"Catalog update error: {e}", flush=True)
+        return catalog
+
+    def apply(self, catalog: BoxCatalog):
+        """Switch the services over to the catalog's boxes, once per catalog."""
+        if self.catalog is not None and self.catalog.timestamp == catalog.timestamp:
+            return
+        self.catalog = catalog
+        self.temp_svc.set_sensors(catalog.sensor_data())
+        if self.region_svc is not None:
+            for box_id, (lon, lat) in catalog.locations().items():
+                self.region_svc.index.add(box_id, lat, lon)
+
+    async def tick(self):
+        await self.refresh()
@@ -0,0 +1,143 @@
+"""Spatial index of senseBox locations for regional queries."""
+
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+# Region parameters are rounded to about 10m so that nearly identical
+# queries share one cached result.
+PRECISION = 4
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+@dataclass(frozen=True)
+class Region:
+    """A bounding box, or a circle of radius km around (lat, lon).
+
+    min_lon may exceed max_lon for a box crossing the antimeridian. For a
+    circle, the bounds are its enclosing box and may reach past +-180.
+    """
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
+    center: Optional[Tuple[float, float]] = None
+    radius: Optional[float] = None
+
+    @classmethod
+    def bbox(cls, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> "Region":
+        """Build a box from west, south, east, north edges in degrees."""
+        if not (-90 <= min_lat <= max_lat <= 90):
+            raise ValueError("Latitudes must satisfy -90 <= south <= north <= 90")
+        if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+            raise ValueError("Longitudes must be within -180 and 180")
+        return cls(*(round(v, PRECISION) for v in (min_lat, min_lon, max_lat, max_lon)))
+
+    @classmethod
+    def circle(cls, lat: float, lon: float, radius: float) -> "Region":
+        """Build the region within radius km of (lat, lon)."""
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("Coordinates must be within -90..90 and -180..180")
+        if radius <= 0:
+            raise ValueError("Radius must be positive")
+        lat, lon, radius = round(lat, PRECISION), round(lon, PRECISION), round(radius, 3)
+        angle = radius / EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        min_lat, max_lat = lat - dlat, lat + dlat
+        if min_lat <= -90 or max_lat >= 90 or angle >= math.pi / 2:
+            # The circle covers a pole, so every longitude.
+            return cls(max(-90.0, min_lat), -180.0, min(90.0, max_lat), 180.0, (lat, lon), radius)
+        dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+        return cls(min_lat, lon - dlon, max_lat, lon + dlon, (lat, lon), radius)
+
+    @property
+    def key(self) -> str:
+        """A canonical name for the region, usable in cache keys."""
+        if self.center is not None:
+            return f"circle:{self.center[0]},{self.center[1]},{self.radius}"
+        return f"bbox:{self.min_lon},{self.min_lat},{self.max_lon},{self.max_lat}"
+
+    def contains(self, lat: float, lon: float) -> bool:
+        if self.center is not None:
+            return haversine(self.center[0], self.center[1], lat, lon) <= self.radius
+        if not self.min_lat <= lat <= self.max_lat:
+            return False
+        if self.min_lon <= self.max_lon:
+            return self.min_lon <= lon <= self.max_lon
+        return lon >= self.min_lon or lon <= self.max_lon
+
+
+class GeoIndex:
+    """Box locations bucketed into a grid of cell_size-degree cells.
+
+    A search only visits the cells overlapping the region's bounds and
+    checks the boxes in them exactly, so its cost follows the size of the
+    region rather than the number of boxes indexed.
+    """
+
+    def __init__(self, locations: Mapping[str, Sequence[float]] = (), cell_size: float = 0.5):
+        self.cell_size = cell_size
+        self.columns = math.ceil(360 / cell_size)
+        self.rows = math.ceil(180 / cell_size)
+        self.cells: Dict[Tuple[int, int], List[Tuple[str, float, float]]] = defaultdict(list)
+        self.locations: Dict[str, Tuple[float, float]] = {}
+        for box_id, (lon, lat) in dict(locations).items():
+            self.add(box_id, lat, lon)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def _row(self, lat: float) -> int:
+        return min(self.rows - 1, max(0, math.floor((lat + 90) / self.cell_size)))
+
+    def _column(self, lon: float) -> int:
+        return math.floor((lon + 180) / self.cell_size)
+
+    def add(self, box_id: str, lat: float, lon: float):
+        """Index a box, replacing its previous location."""
+        if box_id in self.locations:
+            self.remove(box_id)
+        cell = (self._row(lat), self._column(lon) % self.columns)
+        self.cells[cell].append((box_id, lat, lon))
+        self.locations[box_id] = (lat, lon)
+
+    def remove(self, box_id: str):
+        lat, lon = self.locations.pop(box_id)
+        cell = (self._row(lat), self._column(lon) % self.columns)
+        self.cells[cell] = [entry for entry in self.cells[cell] if entry[0] != box_id]
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def _cells(self, region: Region) -> Iterator[List[Tuple[str, float, float]]]:
+        rows = range(self._row(region.min_lat), self._row(region.max_lat) + 1)
+        max_lon = region.max_lon
+        if max_lon < region.min_lon:
+            max_lon += 360
+        first = self._column(region.min_lon)
+        count = min(self.columns, self._column(max_lon) - first + 1)
+        if len(rows) * count > len(self.cells):
+            # A region wider than the populated grid: walk what is there.
+            for (row, column), entries in self.cells.items():
+                if row in rows and (column - first) % self.columns < count:
+                    yield entries
+            return
+        for row in rows:
+            for column in range(first, first + count):
+                entries = self.cells.get((row, column % self.columns))
+                if entries:
+                    yield entries
+
+    def search(self, region: Region) -> List[str]:
+        """Return the IDs of the boxes located within region."""
+        return [box_id for entries in self._cells(region)
+                for box_id, lat, lon in entries if region.contains(lat, lon)]
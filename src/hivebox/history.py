@@ -0,0 +1,69 @@
+"""Temperature history module."""
+
+from typing import Dict, List
+from pydantic import BaseModel
+from hivebox.cache import CacheService
+
+class HistoryBucket(BaseModel):
+    """Downsampled temperature over one step of the requested range."""
+    start: int
+    min: float
+    avg: float
+    max: float
+    count: int
+
+class TemperatureHistory(BaseModel):
+    """Bucketed temperature history for API response."""
+    start: int
+    end: int
+    step: int
+    buckets: List[HistoryBucket]
+
+class HistoryService:
+    """Downsamples the history stream written by CacheService.update.
+
+    Stream entry IDs carry the append time in milliseconds, so a range is
+    an XRANGE over IDs. Entries are read in chunks and folded straight into
+    their buckets, keeping memory bounded by the bucket count rather than
+    the number of points in the range.
+    """
+
+    def __init__(self, cache_svc: CacheService, chunk: int = 1000):
+        self.cache_svc = cache_svc
+        self.chunk = chunk
+
+    async def query(self, start: int, end: int, step: int) -> TemperatureHistory:
+        """Return min/avg/max buckets of `step` seconds over [start, end)."""
+        client = self.cache_svc.reader
+        acc: Dict[int, List[float]] = {}
+        cursor = str(start * 1000)
+        last = str(end * 1000 - 1)
+
+        while True:
+            entries = await self.cache_svc.call(
+                client.xrange, self.cache_svc.history_tag, min=cursor, max=last, count=self.chunk)
+            for entry_id, fields in entries:
+                entry_id = _text(entry_id)
+                value = float(_text(fields.get("value", fields.get(b"value"))))
+                index = (int(entry_id.split("-")[0]) // 1000 - start) // step
+                bucket = acc.get(index)
+                if bucket is None:
+                    acc[index] = [value, value, value, 1]
+                else:
+                    bucket[0] = min(bucket[0], value)
+                    bucket[1] = max(bucket[1], value)
+                    bucket[2] += value
+                    bucket[3] += 1
+            if len(entries) < self.chunk:
+                break
+            cursor = f"({entry_id}"
+
+        buckets = [
+            HistoryBucket(start=start + index * step, min=low, avg=round(total / count, 2),
+                          max=high, count=count)
+            for index, (low, high, total, count) in sorted(acc.items())
+        ]
+        return TemperatureHistory(start=start, end=end, step=step, buckets=buckets)
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,78 @@
+"""Prometheus metrics for the request, cache and upstream paths.
+
+When PROMETHEUS_MULTIPROC_DIR is set, every worker writes its samples to
+that directory and the registry returned by registry() merges them, so any
+worker can answer a scrape for the whole pod. The directory must be empty
+when the first worker starts.
+"""
+
+import os
+from typing import Optional
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY
+from prometheus_client import multiprocess
+
+# Upstream responses usually take 100ms-2s; the default buckets stop at 10s
+# which is well below the 30s client timeout.
+UPSTREAM_BUCKETS = (.05, .1, .25, .5, 1, 2.5, 5, 10, 20, 30)
+# Redis answers in well under a millisecond on a healthy network.
+REDIS_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+
+UPSTREAM_LATENCY = Histogram(
+    "hivebox_upstream_request_seconds",
+    "Time spent fetching one sensor from openSenseMap.",
+    ["sensor"], buckets=UPSTREAM_BUCKETS)
+REDIS_LATENCY = Histogram(
+    "hivebox_redis_command_seconds",
+    "Time spent on one Redis command or pipeline.",
+    ["command"], buckets=REDIS_BUCKETS)
+TEMPERATURE_LATENCY = Histogram(
+    "hivebox_temperature_request_seconds",
+    "End-to-end /temperature latency by cache outcome (hit, stale, miss, error).",
+    ["outcome"])
+CACHE_ERRORS = Counter(
+    "hivebox_cache_errors",
+    "CacheServiceError occurrences by kind.",
+    ["kind"])
+UPSTREAM_THROTTLED = Counter(
+    "hivebox_upstream_throttled",
+    "Upstream calls the rate limiter delayed or rejected.",
+    ["outcome"])
+RATE_LIMIT_WAIT = Histogram(
+    "hivebox_rate_limit_wait_seconds",
+    "Time upstream calls waited for a token beyond the locally prefetched ones.",
+    buckets=REDIS_BUCKETS + (2.5, 5, 10))
+RATE_LIMIT_TOKENS = Counter(
+    "hivebox_rate_limit_tokens",
+    "Tokens taken from the shared bucket (redis) or, while Redis is down, the local one.",
+    ["source"])
+# Timestamps rather than ages so the value stays correct between updates;
+# the age is time() - value at query time.
+RESULT_TIMESTAMP = Gauge(
+    "hivebox_temperature_timestamp_seconds",
+    "Timestamp of the newest temperature result served or computed.",
+    multiprocess_mode="max")
+# Only the refresh leader sets it; the other workers stay at 0, which
+# livemax ignores.
+OLDEST_READING_TIMESTAMP = Gauge(
+    "hivebox_oldest_reading_timestamp_seconds",
+    "Timestamp of the oldest sensor reading in the last aggregate.",
+    multiprocess_mode="livemax")
+
+
+def multiprocess_enabled() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def registry() -> CollectorRegistry:
+    """Return the registry to expose: this process, or all workers."""
+    if not multiprocess_enabled():
+        return REGISTRY
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged)
+    return merged
+
+
+def mark_process_dead(pid: Optional[int] = None):
+    """Drop a worker's live gauges once it stops serving (default: this one)."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid if pid is not None else os.getpid())
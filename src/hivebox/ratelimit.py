@@ -0,0 +1,114 @@
+"""Cluster-wide rate limiting of upstream calls."""
+
+import asyncio
+import time
+from typing import Tuple
+from hivebox.cache import CacheService, CacheServiceError
+from hivebox.metrics import RATE_LIMIT_TOKENS, RATE_LIMIT_WAIT, UPSTREAM_THROTTLED
+from hivebox.temperature import TemperatureServiceError
+
+
+class RateLimitedError(TemperatureServiceError):
+    """Raised when no upstream call token became available within max_wait."""
+
+
+class RateLimiter:
+    """Token bucket shared by every replica through Redis.
+
+    The bucket refills at `rate` tokens per second up to `burst`. Tokens
+    are taken from Redis `prefetch` at a time and spent locally, so most
+    calls cost no round-trip; unspent tokens are dropped after the time
+    the bucket needs to refill them, which keeps a replica from hoarding
+    budget it does not use. Callers wait up to max_wait for a token; with
+    a max_wait of 0 they only try once.
+
+    While Redis is unavailable a local bucket takes over with a
+    1/`replicas` share of the rate and burst, so the processes sharing the
+    budget stay within it together.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, cache_svc: CacheService, rate: float, burst: int = 10,
+                 prefetch: int = 5, max_wait: float = 5.0, name: str = "upstream",
+                 replicas: int = 1):
+        self.cache_svc = cache_svc
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.prefetch = max(1, min(prefetch, self.burst))
+        self.max_wait = max_wait
+        self.key = cache_svc.bucket_key(name)
+        self.tokens = 0
+        self.expires = 0.0
+        replicas = max(1, replicas)
+        self.local_rate = rate / replicas
+        self.local_burst = max(1.0, self.burst / replicas)
+        self.local_tokens = self.local_burst
+        self.local_updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for a token to make one upstream call."""
+        if self._spend():
+            return
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        try:
+            if self.max_wait > 0:
+                await asyncio.wait_for(self._acquire(deadline), self.max_wait)
+            else:
+                # wait_for(..., 0) would time out before a single attempt.
+                await self._acquire(deadline)
+        except asyncio.TimeoutError:
+            UPSTREAM_THROTTLED.labels(outcome="rejected").inc()
+            raise RateLimitedError(
+                f"No upstream call token within {self.max_wait}s") from None
+        RATE_LIMIT_WAIT.observe(time.monotonic() - start)
+
+    async def _acquire(self, deadline: float):
+        throttled = False
+        while True:
+            async with self.lock:
+                # Another caller may have refilled while we queued.
+                if self._spend():
+                    return
+                granted, wait = await self._take(self.prefetch)
+                if granted:
+                    self.tokens = granted - 1
+                    self.expires = time.monotonic() + granted / self.rate
+                    return
+                if not throttled:
+                    UPSTREAM_THROTTLED.labels(outcome="delayed").inc()
+                    throttled = True
+                if time.monotonic() + wait > deadline:
+                    raise asyncio.TimeoutError
+                # Sleeping under the lock keeps the other waiters off Redis.
+                await asyncio.sleep(wait)
+
+    def _spend(self) -> bool:
+        if self.tokens > 0 and time.monotonic() < self.expires:
+            self.tokens -= 1
+            return True
+        self.tokens = 0
+        return False
+
+    async def _take(self, count: int) -> Tuple[int, float]:
+        try:
+            granted, wait = await self.cache_svc.take_tokens(
+                self.key, self.rate, self.burst, count)
+            source = "redis"
+        except CacheServiceError:
+            granted, wait = self._take_local(count)
+            source = "local"
+        RATE_LIMIT_TOKENS.labels(source=source).inc(granted)
+        return granted, wait
+
+    def _take_local(self, count: int) -> Tuple[int, float]:
+        """Take tokens from this replica's fallback bucket, as the Redis script does."""
+        now = time.monotonic()
+        self.local_tokens = min(
+            self.local_burst, self.local_tokens + (now - self.local_updated) * self.local_rate)
+        self.local_updated = now
+        granted = min(count, int(self.local_tokens))
+        self.local_tokens -= granted
+        wait = 0.0 if granted else (1 - self.local_tokens) / self.local_rate
+        return granted, wait
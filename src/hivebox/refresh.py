@@ -0,0 +1,127 @@
+"""Background temperature refresh module."""
+
+import asyncio
+import time
+from typing import Optional
+from hivebox.background import PeriodicTask, lease
+from hivebox.cache import CacheService, CacheServiceError
+from hivebox.metrics import OLDEST_READING_TIMESTAMP
+from hivebox.singleflight import SingleFlight
+from hivebox.temperature import (
+    TemperatureResult,
+    TemperatureService,
+    TemperatureServiceError
+)
+
+class RefreshService(PeriodicTask):
+    """Recomputes the average temperature and caches it.
+
+    Recomputation is coalesced twice: within the process through a
+    SingleFlight, and across replicas through a Redis lease so only one pod
+    calls upstream while the others reuse its result.
+
+    A delegated service belongs to a worker whose pod runs the background
+    loop in another worker process; it reports itself as running so stale
+    values are served, but never starts a loop of its own.
+    """
+
+    name = "background refresh"
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, temp_svc: TemperatureService, cache_svc: CacheService, interval: int,
+                 lease_ttl: int = 60, lease_wait: float = 5.0, delegated: bool = False):
+        super().__init__()
+        self.temp_svc = temp_svc
+        self.cache_svc = cache_svc
+        self.interval = interval
+        self.lease_ttl = lease_ttl
+        self.lease_wait = lease_wait
+        self.delegated = delegated
+        self.poll_interval = 0.1
+        self.flight = SingleFlight()
+        self.warm = False
+
+    @property
+    def running(self) -> bool:
+        """Whether a background refresh loop is active for this pod."""
+        return self.delegated or super().running
+
+    @property
+    def period(self) -> float:
+        return self.interval
+
+    async def refresh(self, until_quorum: bool = True) -> TemperatureResult:
+        """Return a freshly computed result, joining any refresh in flight.
+
+        A caller waiting on the result gets it as soon as a quorum of the
+        sensors has replied; the background loop passes until_quorum=False
+        to wait for every sensor up to the deadline.
+        """
+        return await self.flight.do(self.cache_svc.tag, lambda: self._refresh(until_quorum))
+
+    async def warm_up(self, timeout: float) -> bool:
+        """Load the latest result, computing it if none is cached, within timeout.
+
+        Returns whether a result is now at hand; failures are reported and
+        left for the refresher or a later readiness check to recover from.
+        """
+        try:
+            await asyncio.wait_for(self._warm_up(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Warm-up did not finish within {timeout}s", flush=True)
+        except TemperatureServiceError as e:
+            print(f"Warm-up error: {e}", flush=True)
+        return self.warm
+
+    async def _warm_up(self):
+        try:
+            await self.cache_svc.fetch(allow_stale=True)
+        except CacheServiceError:
+            await self.refresh()
+        self.warm = True
+
+    async def _refresh(self, until_quorum: bool) -> TemperatureResult:
+        async with lease(self.cache_svc, self.lease_ttl) as ours:
+            if not ours:
+                result = await self._await_peer()
+                if result is not None:
+                    return result
+            await self._seed()
+            changed = await self.temp_svc.refresh_readings(until_quorum=until_quorum)
+            readings = self.temp_svc.current_readings()
+            result = self.temp_svc.aggregate(readings)
+            if not self.delegated:
+                OLDEST_READING_TIMESTAMP.set(min(r.timestamp for r in readings).timestamp())
+            try:
+                await self.cache_svc.update(result, changed)
+            except CacheServiceError as e:
+                print(f"Cache update error: {e}", flush=True)
+            return result
+
+    async def _seed(self):
+        """Start from the readings other replicas have already stored."""
+        try:
+            cached = await self.cache_svc.fetch_readings(self.temp_svc.sensor_data.values())
+        except CacheServiceError as e:
+            print(f"Cache readings error: {e}", flush=True)
+            return
+        self.temp_svc.seed(cached.values())
+
+    async def _await_peer(self) -> Optional[TemperatureResult]:
+        """Wait briefly for the replica holding the lease, serving any cached value."""
+        deadline = time.monotonic() + self.lease_wait
+        while True:
+            try:
+                return await self.cache_svc.fetch(allow_stale=True)
+            except CacheServiceError:
+                pass
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def tick(self):
+        """Refresh once for every sensor; failures keep the previous value."""
+        try:
+            await self.refresh(until_quorum=False)
+        except TemperatureServiceError as e:
+            print(f"Background refresh error: {e}", flush=True)
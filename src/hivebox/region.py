@@ -0,0 +1,62 @@
+"""Regional temperature module."""
+
+from typing import Dict, Tuple
+from hivebox.cache import CachedResult, CacheService, CacheServiceError
+from hivebox.geo import GeoIndex, Region
+from hivebox.singleflight import SingleFlight
+from hivebox.temperature import TemperatureService, TemperatureServiceError
+
+class EmptyRegionError(TemperatureServiceError):
+    """Raised when no configured senseBox is located within the region."""
+
+class RegionService:
+    """Averages the sensors located within a region and caches each region.
+
+    Box locations live in a GeoIndex, so a query only looks at the boxes
+    near the region. A regional result is cached under its own key for ttl
+    seconds; on a miss, the region's sensors are seeded from the shared
+    per-sensor cache and only those that are due are fetched upstream.
+    Concurrent requests for the same region share one computation.
+    """
+
+    def __init__(self, temp_svc: TemperatureService, cache_svc: CacheService,
+                 index: GeoIndex, ttl: int = 300):
+        self.temp_svc = temp_svc
+        self.cache_svc = cache_svc
+        self.index = index
+        self.ttl = ttl
+        self.flight = SingleFlight()
+
+    def sensors(self, region: Region) -> Dict[str, str]:
+        """Return the box to sensor mapping of the configured boxes in region."""
+        sensor_data = self.temp_svc.sensor_data
+        return {box_id: sensor_data[box_id] for box_id in self.index.search(region)
+                if box_id in sensor_data}
+
+    async def fetch(self, region: Region) -> Tuple[CachedResult, str]:
+        """Return the region's result and whether it was a cache hit or miss."""
+        key = self.cache_svc.region_key(region.key)
+        try:
+            return await self.cache_svc.fetch_cached(allow_stale=True, key=key), "hit"
+        except CacheServiceError:
+            pass
+        return await self.flight.do(key, lambda: self._compute(region, key)), "miss"
+
+    async def _compute(self, region: Region, key: str) -> CachedResult:
+        sensor_data = self.sensors(region)
+        if not sensor_data:
+            raise EmptyRegionError("No senseBoxes in the requested region")
+        try:
+            cached = await self.cache_svc.fetch_readings(sensor_data.values())
+        except CacheServiceError as e:
+            print(f"Cache readings error: {e}", flush=True)
+        else:
+            self.temp_svc.seed(cached.values())
+        changed = await self.temp_svc.refresh_readings(sensor_data, until_quorum=True)
+        result = self.temp_svc.aggregate(self.temp_svc.current_readings(sensor_data),
+                                         total=len(sensor_data))
+        try:
+            return await self.cache_svc.update_region(key, result, self.ttl, changed)
+        except CacheServiceError as e:
+            print(f"Cache update error: {e}", flush=True)
+        return CachedResult(result, result.model_dump_json().encode())
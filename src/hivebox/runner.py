@@ -0,0 +1,170 @@
+"""Production entry point: a pre-forking uvicorn supervisor.
+
+The app is imported once in the supervisor, then one worker per available
+CPU is forked to serve the same listening socket. Each worker learns its
+index through HIVEBOX_WORKER_ID and the pool size through HIVEBOX_WORKERS,
+which the app uses to run a single background refresher per pod and to
+split connection budgets. Crashed workers are replaced with the same index.
+
+Run with `python -m hivebox.runner`; WEB_CONCURRENCY overrides the worker
+count derived from the container's CPU quota.
+"""
+
+import argparse
+import math
+import os
+import shutil
+import signal
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+import uvicorn
+from hivebox.broadcast import close_all
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+# Workers that die sooner than this after starting are restarted with a delay
+# so a crashing app does not fork in a tight loop.
+MIN_WORKER_LIFETIME = 1.0
+
+
+def cpu_quota(cgroup_root: Path = CGROUP_ROOT) -> float:
+    """Return the CPUs this process may use, honouring cgroup v2 and v1 limits."""
+    try:
+        quota, period = (cgroup_root / "cpu.max").read_text().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int((cgroup_root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((cgroup_root / "cpu" / "cpu.cfs_period_us").read_text())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count(env: Optional[Mapping[str, str]] = None,
+                 cgroup_root: Path = CGROUP_ROOT) -> int:
+    """Return WEB_CONCURRENCY if set, else one worker per (partial) CPU."""
+    if env is None:
+        env = os.environ
+    if env.get("WEB_CONCURRENCY"):
+        return max(1, int(env["WEB_CONCURRENCY"]))
+    return max(1, math.ceil(cpu_quota(cgroup_root)))
+
+
+class Server(uvicorn.Server):
+    """uvicorn server that ends the open update streams when it shuts down.
+
+    uvicorn waits for in-flight responses before running the lifespan
+    shutdown, so streams left open would hold SIGTERM until the pod is
+    killed.
+    """
+
+    async def shutdown(self, sockets=None):
+        close_all()
+        await super().shutdown(sockets=sockets)
+
+
+class Supervisor:
+    """Fork and babysit uvicorn workers sharing one socket."""
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.children: Dict[int, tuple[int, float]] = {}
+        self.stopping = False
+        self.metrics_dir: Optional[str] = None
+
+    def run(self):
+        os.environ["HIVEBOX_WORKERS"] = str(self.workers)
+        if self.workers > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+            # Must be set before prometheus_client is imported by the app.
+            self.metrics_dir = tempfile.mkdtemp(prefix="hivebox-metrics-")
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = self.metrics_dir
+        try:
+            self.config.load()
+            if self.workers == 1:
+                os.environ["HIVEBOX_WORKER_ID"] = "0"
+                Server(self.config).run()
+                return
+            self.serve()
+        finally:
+            if self.metrics_dir is not None:
+                shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    def serve(self):
+        sock = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.workers):
+            self.spawn(index, sock)
+        print(f"Started {self.workers} workers", flush=True)
+
+        while self.children:
+            try:
+                pid, _status = os.wait()
+            except ChildProcessError:
+                break
+            index, started = self.children.pop(pid)
+            self.reap(pid)
+            if self.stopping:
+                continue
+            print(f"Worker {index} (pid {pid}) exited, restarting", flush=True)
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            self.spawn(index, sock)
+        sock.close()
+
+    def spawn(self, index: int, sock):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            os.environ["HIVEBOX_WORKER_ID"] = str(index)
+            status = 1
+            try:
+                Server(self.config).run(sockets=[sock])
+                status = 0
+            finally:
+                # A crash must not look like a clean exit to the supervisor.
+                os._exit(status)
+        self.children[pid] = (index, time.monotonic())
+
+    def reap(self, pid: int):
+        # Imported late: the metrics module must see PROMETHEUS_MULTIPROC_DIR.
+        from hivebox.metrics import mark_process_dead  # pylint: disable=import-outside-toplevel
+        mark_process_dead(pid)
+
+    def stop(self, signum, _frame):
+        """Forward the signal so every worker drains and exits."""
+        self.stopping = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--log-level", default=os.environ.get("UV_LOGLVL", "info"))
+    parser.add_argument("--workers", type=int, default=worker_count())
+    args = parser.parse_args()
+
+    config = uvicorn.Config(args.app, host=args.host, port=args.port,
+                            log_level=args.log_level, lifespan="on")
+    Supervisor(config, max(1, args.workers)).run()
+
+
+if __name__ == "__main__":
+    main()
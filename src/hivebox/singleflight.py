@@ -0,0 +1,32 @@
+"""In-process request coalescing module."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome.
+
+    Callers that arrive while a call for the same key is in flight await
+    that call instead of starting their own. A cancelled caller does not
+    cancel the shared call.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of fn(), joining an in-flight call for key."""
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self.calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future):
+        if self.calls.get(key) is future:
+            del self.calls[key]
+        # Mark the exception retrieved so waiters that went away
+        # do not leave "exception was never retrieved" warnings.
+        if not future.cancelled():
+            future.exception()
@@ -1,12 +1,20 @@
 """Temperature data processing module."""
 
+import asyncio
+import math
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Dict
-import requests
-from . import get_sensor_data
+from typing import TYPE_CHECKING, List, Dict, Iterable, Iterator, Optional, Tuple
+import httpx
+from . import OPENSENSEMAP_URL, get_sensor_data
+from .aggregate import Aggregator
+from .codec import DECODE_ERRORS, load_measurement
+from .metrics import UPSTREAM_LATENCY
 from pydantic import BaseModel
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .ratelimit import RateLimiter
+
 
 class TemperatureServiceError(Exception):
     """Raised when temperature service operations fail."""
@@ -21,67 +29,269 @@ class SensorReading:
 
 
 class TemperatureResult(BaseModel):
-    """Final averaged temperature with status for API response."""
+    """Final averaged temperature with status for API response.
+
+    sensors and total tell how many of the configured sensors contributed;
+    degraded is set when some of them did not.
+    """
     value: float
     status: str
     timestamp: int
+    sensors: Optional[int] = None
+    total: Optional[int] = None
+    degraded: bool = False
 
 # pylint: disable=too-few-public-methods
 class TemperatureService:
-    """Service for processing temperature data from sensors."""
+    """Service for processing temperature data from sensors.
+
+    The latest reading of every sensor is kept between fetches. A sensor is
+    only requested again once its reading is older than report_interval,
+    i.e. when the senseBox is due to have published a new measurement.
+    Due sensors are streamed through at most `concurrency` workers, so the
+    number of requests in flight does not grow with the sensor count.
+
+    A refresh is bounded by one overall deadline rather than by per-request
+    timeouts. Sensors that fail or miss the deadline are skipped; a result
+    is produced as long as at least a `quorum` fraction of the sensors have
+    a current reading. Background refreshes wait for every sensor up to the
+    deadline for the best coverage; refreshes a request waits on stop as
+    soon as quorum is reached.
 
-    def __init__(self, sensor_data: Dict[str, str]):
-        """Initialize temperature service with sensor data mapping."""
+    With a limiter, every upstream request first takes a token from it.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, sensor_data: Dict[str, str],
+                 client: Optional[httpx.AsyncClient] = None, report_interval: int = 300,
+                 concurrency: int = 10, aggregator: Optional[Aggregator] = None,
+                 base_url: str = OPENSENSEMAP_URL, deadline: Optional[float] = None,
+                 quorum: float = 0.5, limiter: Optional["RateLimiter"] = None):
+        """Initialize temperature service with sensor data mapping.
+
+        The client is normally the app-scoped pool opened in the lifespan;
+        when none is given, a short-lived one is opened per fetch.
+        """
         if not sensor_data:
             raise TemperatureServiceError("No sensor data provided")
         self.sensor_data = sensor_data
+        self.client = client
+        self.report_interval = report_interval
+        self.concurrency = max(1, concurrency)
+        self.aggregator = aggregator if aggregator is not None else Aggregator()
+        self.base_url = base_url
+        self.deadline = deadline
+        self.quorum = quorum
+        self.limiter = limiter
+        self.errors: Dict[str, str] = {}
+        self.readings: Dict[str, SensorReading] = {}
 
-    def get_average_temperature(self) -> TemperatureResult:
+    async def get_average_temperature(self) -> TemperatureResult:
         """Calculate and return average temperature from all sensor readings."""
-        readings = self._fetch_readings()
+        return self.aggregate(await self.fetch_readings())
+
+    def aggregate(self, readings: List[SensorReading],
+                  total: Optional[int] = None) -> TemperatureResult:
+        """Reduce the given readings into a result with status.
+
+        total is the number of sensors the readings were drawn from, all
+        configured sensors by default.
+        """
         if not readings:
             raise TemperatureServiceError("No readings available")
-               
-        avg_temp = round(sum(r.value for r in readings) / len(readings), 1)
+
+        now = datetime.now(timezone.utc)
+        avg_temp = round(self.aggregator(readings, now), 1)
         status = self._determine_temperature_status(avg_temp)
-        computed_at = int(datetime.now(timezone.utc).timestamp())
+        computed_at = int(now.timestamp())
+        if total is None:
+            total = len(self.sensor_data)
 
-        return TemperatureResult(value=avg_temp, status=status, timestamp=computed_at)
+        return TemperatureResult(value=avg_temp, status=status, timestamp=computed_at,
+                                 sensors=len(readings), total=total,
+                                 degraded=len(readings) < total)
 
-    def _fetch_readings(self) -> List[SensorReading]:
+    async def fetch_readings(self) -> List[SensorReading]:
         """Fetch current readings from all sensors that are less than 1 hour old."""
-        readings = []
-        current_time = datetime.now(timezone.utc)
+        await self.refresh_readings()
+        return self.current_readings()
 
-        for box_id, sensor_id in self.sensor_data.items():
-            url = get_sensor_data(box_id, sensor_id)
-            try:
-                response = requests.get(url, timeout=30)
-                data = response.json()
-                reading_time = datetime.fromisoformat(
-                    data['lastMeasurement']['createdAt'].replace('Z', '+00:00'))
-                time_diff = current_time - reading_time
+    async def refresh_readings(self, sensor_data: Optional[Dict[str, str]] = None,
+                               until_quorum: bool = False) -> List[SensorReading]:
+        """Fetch the sensors that are due and return the readings that changed.
 
-                if time_diff.total_seconds() > 3600:
-                    continue
+        sensor_data restricts the refresh to a subset of the sensors. With
+        until_quorum, the refresh ends as soon as a quorum of them has a
+        current reading; sensors still in flight are left for the next one.
+        """
+        if sensor_data is None:
+            sensor_data = self.sensor_data
+        now = datetime.now(timezone.utc)
+        due = [
+            (box_id, sensor_id) for box_id, sensor_id in sensor_data.items()
+            if self._is_due(sensor_id, now)
+        ]
+        needed = None
+        if until_quorum:
+            # Sensors that are not due already have a current reading.
+            needed = self._required(len(sensor_data)) - (len(sensor_data) - len(due))
+            if needed <= 0:
+                return []
 
-                reading = SensorReading(
-                    timestamp=reading_time,
-                    value=float(data['lastMeasurement']['value']),
-                    sensor_id=sensor_id)
-                readings.append(reading)
+        if self.client is None:
+            async with httpx.AsyncClient(timeout=30) as client:
+                return await self._fetch_all(client, iter(due), needed)
+        return await self._fetch_all(self.client, iter(due), needed)
 
-            except requests.RequestException as e:
-                raise TemperatureServiceError(
-                    f"Failed to fetch data for sensor {sensor_id}: {str(e)}") from e
-            except ValueError as e:
-                raise TemperatureServiceError(
-                    f"Invalid data received from sensor {sensor_id}: {str(e)}") from e
+    def _required(self, total: int) -> int:
+        return max(1, math.ceil(self.quorum * total))
+
+    def current_readings(self, sensor_data: Optional[Dict[str, str]] = None
+                         ) -> List[SensorReading]:
+        """Return the kept readings that are less than 1 hour old, if they make quorum.
+
+        sensor_data restricts the readings, and the quorum, to a subset.
+        """
+        if sensor_data is None:
+            sensor_data = self.sensor_data
+        current_time = datetime.now(timezone.utc)
+        readings = [
+            reading for reading in map(self.readings.get, sensor_data.values())
+            if reading is not None
+            and self._is_current(reading, current_time)
+        ]
 
+        total = len(sensor_data)
+        required = self._required(total)
+        if len(readings) >= required:
+            return readings
+        errors = [self.errors[i] for i in sensor_data.values() if i in self.errors]
+        if errors:
+            raise TemperatureServiceError(
+                f"Only {len(readings)} of {total} sensors reported, {required} required. "
+                f"{errors[0]}")
         if not readings:
             raise TemperatureServiceError("All available readings are over 1 hour old")
+        raise TemperatureServiceError(
+            f"Only {len(readings)} of {total} sensors reported, {required} required")
+
+    def set_sensors(self, sensor_data: Dict[str, str]):
+        """Switch to another set of sensors, dropping state kept for the old ones."""
+        if not sensor_data:
+            raise TemperatureServiceError("No sensor data provided")
+        sensor_ids = set(sensor_data.values())
+        self.readings = {k: v for k, v in self.readings.items() if k in sensor_ids}
+        self.errors = {k: v for k, v in self.errors.items() if k in sensor_ids}
+        self.sensor_data = sensor_data
+
+    def seed(self, readings: Iterable[SensorReading]):
+        """Adopt readings fetched elsewhere, e.g. by another replica, if newer."""
+        for reading in readings:
+            self._keep(reading)
+
+    def _is_due(self, sensor_id: str, now: datetime) -> bool:
+        reading = self.readings.get(sensor_id)
+        return reading is None or (
+            (now - reading.timestamp).total_seconds() >= self.report_interval)
+
+    @staticmethod
+    def _is_current(reading: SensorReading, now: datetime) -> bool:
+        return (now - reading.timestamp).total_seconds() <= 3600
+
+    async def _fetch_all(self, client: httpx.AsyncClient, sensors: Iterator[Tuple[str, str]],
+                         needed: Optional[int] = None) -> List[SensorReading]:
+        """Run sensors through a bounded worker pool, keeping readings as they arrive.
+
+        Failed sensors are recorded in errors, and cleared from it once they
+        reply again. Once the deadline passes, or `needed` sensors have
+        replied with a current reading, the remaining workers are cancelled
+        and whatever arrived is kept.
+        """
+        changed = []
+        in_flight = set()
+        errors: Dict[str, str] = {}
+        replied = 0
+        enough = asyncio.Event()
+
+        async def worker():
+            for box_id, sensor_id in sensors:
+                in_flight.add(sensor_id)
+                try:
+                    reading = await self._fetch_reading(client, box_id, sensor_id)
+                except TemperatureServiceError as e:
+                    errors[sensor_id] = str(e)
+                    continue
+                finally:
+                    in_flight.discard(sensor_id)
+                self.errors.pop(sensor_id, None)
+                if self._keep(reading):
+                    changed.append(reading)
+                if needed is not None and self._is_current(reading, datetime.now(timezone.utc)):
+                    nonlocal replied
+                    replied += 1
+                    if replied >= needed:
+                        enough.set()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        finished = asyncio.ensure_future(asyncio.wait(workers))
+        quorum = asyncio.ensure_future(enough.wait())
+        try:
+            await asyncio.wait((finished, quorum), timeout=self.deadline,
+                               return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            for task in workers:
+                task.cancel()
+            raise
+        finally:
+            finished.cancel()
+            quorum.cancel()
+        pending = [task for task in workers if not task.done()]
+        if pending:
+            missed = set(in_flight)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if not enough.is_set():
+                for sensor_id in missed:
+                    errors[sensor_id] = (
+                        f"Sensor {sensor_id} did not reply within the {self.deadline}s deadline")
+        self.errors.update(errors)
+        if errors:
+            print(f"{len(errors)} sensors failed to refresh, "
+                  f"e.g. {next(iter(errors.values()))}", flush=True)
+        return changed
+
+    def _keep(self, reading: SensorReading) -> bool:
+        """Store the reading if it is newer than the kept one."""
+        current = self.readings.get(reading.sensor_id)
+        if current is None or reading.timestamp > current.timestamp:
+            self.readings[reading.sensor_id] = reading
+            return True
+        return False
+
+    async def _fetch_reading(self, client: httpx.AsyncClient,
+                             box_id: str, sensor_id: str) -> SensorReading:
+        """Fetch and parse the latest measurement of a single sensor."""
+        url = get_sensor_data(box_id, sensor_id, self.base_url)
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        try:
+            with UPSTREAM_LATENCY.labels(sensor=sensor_id).time():
+                response = await client.get(url)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise TemperatureServiceError(
+                f"Failed to fetch data for sensor {sensor_id}: {str(e)}") from e
+        return self._process_sensor_reading(response, sensor_id)
 
-        return readings
+    def _process_sensor_reading(self, response, sensor_id: str) -> SensorReading:
+        """Parse an upstream sensor response into a reading."""
+        try:
+            value, reading_time = load_measurement(response.content)
+            return SensorReading(timestamp=reading_time, value=value, sensor_id=sensor_id)
+        except DECODE_ERRORS as e:
+            raise TemperatureServiceError(
+                f"Invalid data received from sensor {sensor_id}: {str(e)}") from e
 
     def _determine_temperature_status(self, temperature: float) -> str:
         """Return temperature status based on provided value."""
@@ -1,15 +1,43 @@
 """Main entry point for the application."""
 
+import asyncio
+import math
+import time
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+import httpx
 import prometheus_client
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, Response, HTTPException
-from pydantic import AliasChoices, BaseModel, Field, RedisDsn
+from fastapi import Depends, FastAPI, Query, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import AliasChoices, BaseModel, Field, FilePath, RedisDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from hivebox.cache import CacheService, CacheMessages, CacheServiceError
+from hivebox.cache import CacheService, CachedResult, CacheMessages, CacheServiceError, LocalCache
 from hivebox import __version__
+from hivebox.aggregate import Aggregator
+from hivebox.breaker import CircuitBreaker
+from hivebox.codec import FastJSONResponse
+from hivebox.discovery import DiscoveryService
+from hivebox.broadcast import Broadcaster, close_all
 from hivebox.temperature import TemperatureService, TemperatureServiceError, TemperatureResult
-from hivebox import SENSEBOX_TEMP_SENSORS as SB_SENS
+from hivebox.history import HistoryService, TemperatureHistory
+from hivebox.metrics import (
+    RESULT_TIMESTAMP,
+    TEMPERATURE_LATENCY,
+    mark_process_dead,
+    registry as metrics_registry
+)
+from hivebox.ratelimit import RateLimiter
+from hivebox.refresh import RefreshService
+from hivebox.geo import GeoIndex, Region
+from hivebox.region import EmptyRegionError, RegionService
+from hivebox import (
+    SENSEBOX_TEMP_SENSORS as SB_SENS,
+    OPENSENSEMAP_URL,
+    load_box_locations,
+    load_sensor_data
+)
 
 class RedisConfig(BaseModel):
     encoding: str
@@ -17,6 +45,67 @@ class RedisConfig(BaseModel):
     socket_connect_timeout: Optional[int] = None
     retry_on_timeout: Optional[bool] = None
     socket_timeout: Optional[int] = None
+    max_connections: Optional[int] = None
+    socket_keepalive: Optional[bool] = None
+    health_check_interval: Optional[int] = None
+
+class RedisTopologyConfig(BaseModel):
+    mode: Literal["standalone", "sentinel", "cluster"] = "standalone"
+    # host:port of each sentinel; REDIS_URL then only supplies credentials and db.
+    sentinels: List[str] = []
+    service_name: str = "mymaster"
+    read_from_replicas: bool = True
+
+class AggregationConfig(BaseModel):
+    method: Literal["mean", "median", "trimmed", "mad", "weighted"] = "mean"
+    trim: float = Field(0.1, ge=0, lt=0.5)
+    mad_threshold: float = Field(3.5, gt=0)
+    half_life: float = Field(1800.0, gt=0)
+
+class GeoConfig(BaseModel):
+    cell_size: float = Field(0.5, gt=0, le=90)
+    # Seconds a regional result is cached before it is recomputed.
+    region_ttl: int = Field(300, gt=0)
+
+class CircuitConfig(BaseModel):
+    failure_threshold: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+class LocalCacheConfig(BaseModel):
+    ttl: float = 30.0
+    maxsize: int = 128
+
+class UpstreamConfig(BaseModel):
+    base_url: str = OPENSENSEMAP_URL
+    timeout: float = 30.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    concurrency: int = 10
+    deadline: Optional[float] = Field(10.0, gt=0)
+    quorum: float = Field(0.5, gt=0, le=1)
+
+class DiscoveryConfig(BaseModel):
+    enabled: bool = False
+    # Boxes to resolve, SENSORS' boxes when empty; or every box in a
+    # west,south,east,north bbox measuring the phenomenon.
+    boxes: List[str] = []
+    bbox: Optional[str] = None
+    phenomenon: str = "Temperatur"
+    interval: int = Field(86400, gt=0)
+    reload_interval: int = Field(300, gt=0)
+
+class RateLimitConfig(BaseModel):
+    # Upstream requests per second across all replicas; 0 disables the limit.
+    rate: float = Field(0.0, ge=0)
+    burst: int = Field(10, gt=0)
+    prefetch: int = Field(5, gt=0)
+    max_wait: float = Field(5.0, ge=0)
+    # Pods sharing the budget; while Redis is down each worker of each pod
+    # keeps to its share of it.
+    replicas: int = Field(1, gt=0)
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -35,56 +124,404 @@ class Settings(BaseSettings):
     },
         validation_alias=AliasChoices('REDIS'),
     )
+    redis_topology: RedisTopologyConfig = Field(
+        RedisTopologyConfig(),
+        validation_alias=AliasChoices('REDIS_TOPOLOGY'),
+    )
+    circuit: CircuitConfig = Field(
+        CircuitConfig(),
+        validation_alias=AliasChoices('REDIS_CIRCUIT'),
+    )
+    local_cache: LocalCacheConfig = Field(
+        LocalCacheConfig(),
+        validation_alias=AliasChoices('LOCAL_CACHE'),
+    )
+    history_maxlen: int = Field(
+        100_000,
+        validation_alias=AliasChoices('HISTORY_MAXLEN'),
+    )
+    refresh_interval: int = Field(
+        300,
+        validation_alias=AliasChoices('REFRESH_INTERVAL'),
+    )
+    warmup_timeout: float = Field(
+        10.0,
+        validation_alias=AliasChoices('WARMUP_TIMEOUT'),
+    )
+    sensors: Dict[str, str] = Field(
+        SB_SENS,
+        validation_alias=AliasChoices('SENSORS'),
+    )
+    sensors_file: Optional[FilePath] = Field(
+        None,
+        validation_alias=AliasChoices('SENSORS_FILE'),
+    )
+    box_locations_file: Optional[FilePath] = Field(
+        None,
+        validation_alias=AliasChoices('BOX_LOCATIONS_FILE'),
+    )
+    discovery: DiscoveryConfig = Field(
+        DiscoveryConfig(),
+        validation_alias=AliasChoices('DISCOVERY'),
+    )
+    geo: GeoConfig = Field(
+        GeoConfig(),
+        validation_alias=AliasChoices('GEO'),
+    )
+    aggregation: AggregationConfig = Field(
+        AggregationConfig(),
+        validation_alias=AliasChoices('AGGREGATION'),
+    )
+    report_interval: int = Field(
+        300,
+        validation_alias=AliasChoices('SENSOR_REPORT_INTERVAL'),
+    )
+    upstream: UpstreamConfig = Field(
+        UpstreamConfig(),
+        validation_alias=AliasChoices('UPSTREAM'),
+    )
+    rate_limit: RateLimitConfig = Field(
+        RateLimitConfig(),
+        validation_alias=AliasChoices('UPSTREAM_RATE_LIMIT'),
+    )
+    worker_id: int = Field(
+        0,
+        validation_alias=AliasChoices('HIVEBOX_WORKER_ID'),
+    )
+    workers: int = Field(
+        1,
+        validation_alias=AliasChoices('HIVEBOX_WORKERS'),
+    )
+
+def create_http_client(cfg: UpstreamConfig) -> httpx.AsyncClient:
+    """Build the pooled keep-alive client shared by all upstream calls."""
+    limits = httpx.Limits(
+        max_connections=cfg.max_connections,
+        max_keepalive_connections=cfg.max_keepalive_connections,
+        keepalive_expiry=cfg.keepalive_expiry,
+    )
+    try:
+        return httpx.AsyncClient(timeout=cfg.timeout, limits=limits, http2=cfg.http2)
+    except ImportError:
+        print("HTTP/2 requested but h2 is not installed, using HTTP/1.1", flush=True)
+        return httpx.AsyncClient(timeout=cfg.timeout, limits=limits)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    settings = Settings()
+    http_client = create_http_client(settings.upstream)
+    app.state.http_client = http_client
+    sensor_data = settings.sensors
+    if settings.sensors_file is not None:
+        sensor_data = load_sensor_data(settings.sensors_file)
+    app.state.temp_svc = TemperatureService(
+        sensor_data, http_client, report_interval=settings.report_interval,
+        concurrency=settings.upstream.concurrency, base_url=settings.upstream.base_url,
+        deadline=settings.upstream.deadline, quorum=settings.upstream.quorum,
+        aggregator=Aggregator(**settings.aggregation.model_dump()))
     try:
-        redis_config = Settings().redis_config.model_dump(mode="json")
-        redis_dsn = str(Settings().redis_url)
-        cache_svc = CacheService(redis_dsn, redis_config)
+        redis_config = settings.redis_config.model_dump(mode="json")
+        if redis_config["max_connections"] is not None:
+            # The configured pool size is the budget for the whole pod.
+            redis_config["max_connections"] = math.ceil(
+                redis_config["max_connections"] / max(1, settings.workers))
+        redis_dsn = str(settings.redis_url)
+        local_cache = LocalCache(**settings.local_cache.model_dump())
+        breaker = CircuitBreaker(**settings.circuit.model_dump())
+        cache_svc = CacheService(redis_dsn, redis_config, local_cache, breaker=breaker,
+                                 history_maxlen=settings.history_maxlen,
+                                 topology=settings.redis_topology.model_dump())
         app.state.cache_svc = cache_svc
+        if settings.rate_limit.rate > 0:
+            rate_limit = settings.rate_limit.model_dump()
+            rate_limit["replicas"] *= max(1, settings.workers)
+            app.state.temp_svc.limiter = RateLimiter(cache_svc, **rate_limit)
+        app.state.history_svc = HistoryService(cache_svc)
+        cache_svc.start_listener()
         try:
             await cache_svc.connect()
         except CacheServiceError:
             print(CacheMessages.REDIS_CONN_FAIL, flush=True)
     except Exception:
         pass
-    yield
+    app.state.refresh_svc = None
+    app.state.region_svc = None
+    app.state.discovery_svc = None
+    if hasattr(app.state, "cache_svc"):
+        locations = {}
+        if settings.box_locations_file is not None:
+            locations = load_box_locations(settings.box_locations_file)
+        app.state.region_svc = RegionService(
+            app.state.temp_svc, app.state.cache_svc,
+            GeoIndex(locations, settings.geo.cell_size), settings.geo.region_ttl)
+        if settings.discovery.enabled:
+            # Start from the stored catalog; it is refreshed in the background.
+            discovery = settings.discovery
+            app.state.discovery_svc = DiscoveryService(
+                app.state.temp_svc, app.state.cache_svc, http_client,
+                boxes=discovery.boxes or list(sensor_data), bbox=discovery.bbox,
+                phenomenon=discovery.phenomenon, interval=discovery.interval,
+                reload_interval=discovery.reload_interval,
+                concurrency=settings.upstream.concurrency, base_url=settings.upstream.base_url,
+                region_svc=app.state.region_svc, discover=settings.worker_id == 0)
+            try:
+                catalog = await app.state.discovery_svc.load()
+            except CacheServiceError as e:
+                print(f"Catalog fetch error: {e}", flush=True)
+            else:
+                if catalog is not None:
+                    app.state.discovery_svc.apply(catalog)
+            app.state.discovery_svc.start()
+        # Only the first worker of a pod runs the refresh loop; the others
+        # serve what it caches.
+        background = settings.refresh_interval > 0
+        leader = settings.worker_id == 0
+        app.state.refresh_svc = RefreshService(
+            app.state.temp_svc, app.state.cache_svc, settings.refresh_interval,
+            delegated=background and not leader)
+        if background and leader:
+            app.state.refresh_svc.start()
+        if settings.warmup_timeout > 0:
+            await app.state.refresh_svc.warm_up(settings.warmup_timeout)
+    try:
+        yield
+    finally:
+        # End open streams first; they would otherwise outlive the services.
+        close_all()
+        if app.state.discovery_svc is not None:
+            await app.state.discovery_svc.stop()
+        if app.state.refresh_svc is not None:
+            await app.state.refresh_svc.stop()
+        if hasattr(app.state, "cache_svc"):
+            await app.state.cache_svc.close()
+        await http_client.aclose()
+        mark_process_dead()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+def get_cache_service(request: Request) -> CacheService:
+    """Return the app-scoped cache service."""
+    return request.app.state.cache_svc
+
+def get_refresh_service(request: Request) -> RefreshService:
+    """Return the app-scoped refresh coordinator."""
+    return request.app.state.refresh_svc
+
+def get_region_service(request: Request) -> Optional[RegionService]:
+    """Return the app-scoped regional query service, if Redis could be set up."""
+    return getattr(request.app.state, "region_svc", None)
+
+def get_history_service(request: Request) -> HistoryService:
+    """Return the app-scoped history service."""
+    return request.app.state.history_svc
 
-app = FastAPI(lifespan=lifespan)
+def get_broadcaster(request: Request) -> Broadcaster:
+    """Return the app-scoped update broadcaster."""
+    return request.app.state.cache_svc.broadcaster
 
 @app.get("/version")
 async def get_version():
     """Get hivebox version."""
     return {"hivebox": __version__}
 
+@app.get("/livez")
+async def livez():
+    """Report that the process is up and its event loop responsive."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readyz(request: Request):
+    """Report ready once Redis answers and a temperature result is at hand."""
+    refresh_svc = request.app.state.refresh_svc
+    if refresh_svc is None:
+        return FastJSONResponse({"status": "not ready", "redis": False, "warm": False}, 503)
+    cache_svc = refresh_svc.cache_svc
+    try:
+        await cache_svc.ping()
+        redis = True
+    except CacheServiceError:
+        redis = False
+    if redis and not refresh_svc.warm:
+        # Warm-up may have timed out; a result cached since then counts.
+        try:
+            await cache_svc.fetch(allow_stale=True)
+            refresh_svc.warm = True
+        except CacheServiceError:
+            pass
+    ready = redis and refresh_svc.warm
+    return FastJSONResponse({"status": "ready" if ready else "not ready",
+                         "redis": redis, "warm": refresh_svc.warm}, 200 if ready else 503)
+
 @app.get("/temperature", response_model=TemperatureResult)
-async def get_temperature(request: Request):
-    temp_svc = TemperatureService(SB_SENS)
-    cache_svc = app.state.cache_svc
+async def get_temperature(
+    request: Request,
+    bbox: Optional[str] = Query(None, description="west,south,east,north in degrees"),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius: Optional[float] = Query(None, gt=0, le=20_000, description="in km"),
+    cache_svc: CacheService = Depends(get_cache_service),
+    refresh_svc: RefreshService = Depends(get_refresh_service),
+    region_svc: Optional[RegionService] = Depends(get_region_service),
+):
+    """Get the average temperature, of all senseBoxes or of those in a region."""
+    region = _region(bbox, lat, lon, radius)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        if region is None:
+            cache, outcome = await _temperature(cache_svc, refresh_svc)
+            RESULT_TIMESTAMP.set(cache.result.timestamp)
+            lifetime = refresh_svc.interval if refresh_svc.running else cache_svc.max_age
+            headers = _cache_headers(cache, lifetime, cache_svc.max_age)
+        else:
+            cache, outcome = await _region_temperature(region_svc, region)
+            headers = _cache_headers(cache, region_svc.ttl, region_svc.ttl)
+        if _not_modified(request, cache.result.timestamp, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        # The body was validated when it was cached; skip FastAPI's
+        # response_model round-trip and send it as is.
+        return Response(content=cache.body, media_type="application/json", headers=headers)
+    finally:
+        TEMPERATURE_LATENCY.labels(outcome=outcome).observe(time.perf_counter() - start)
+
+def _region(bbox: Optional[str], lat: Optional[float], lon: Optional[float],
+            radius: Optional[float]) -> Optional[Region]:
+    """Parse the regional query parameters, if any were given."""
+    circle = (lat, lon, radius)
+    if bbox is None and all(v is None for v in circle):
+        return None
+    if bbox is not None and any(v is not None for v in circle):
+        raise HTTPException(status_code=400, detail="Use either bbox or lat, lon and radius")
     try:
-        cache = await cache_svc.fetch()
-        return cache
+        if bbox is not None:
+            edges = [float(v) for v in bbox.split(",")]
+            if len(edges) != 4:
+                raise ValueError("bbox must be west,south,east,north")
+            return Region.bbox(*edges)
+        if any(v is None for v in circle):
+            raise ValueError("lat, lon and radius must be given together")
+        return Region.circle(lat, lon, radius)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+async def _region_temperature(region_svc: Optional[RegionService], region: Region):
+    """Return the region's result and whether it was a cache hit or miss."""
+    if region_svc is None:
+        raise HTTPException(status_code=503, detail="Regional queries are unavailable")
+    try:
+        return await region_svc.fetch(region)
+    except EmptyRegionError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except TemperatureServiceError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+async def _temperature(cache_svc: CacheService, refresh_svc: RefreshService):
+    """Return the cached result and whether it was a cache hit, stale or miss."""
+    # With the background refresher running, any cached value is served and
+    # upstream is only called here when nothing is cached at all.
+    try:
+        cache = await cache_svc.fetch_cached(allow_stale=refresh_svc.running)
+        fresh = int(time.time()) - cache.result.timestamp < cache_svc.max_age
+        return cache, "hit" if fresh else "stale"
     except CacheServiceError as e:
         print(f"Cache fetch error: {e}")
 
     try:
-        result = temp_svc.get_average_temperature()
+        result = await refresh_svc.refresh()
     except TemperatureServiceError as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+    return CachedResult(result, result.model_dump_json().encode()), "miss"
+
+def _cache_headers(cache: CachedResult, lifetime: int, max_age: int) -> Dict[str, str]:
+    """Build validators and a Cache-Control lifetime from the result's age.
 
+    A newer result is due lifetime seconds after this one, e.g. every
+    refresh interval while the refresher runs; until it is max_age old, the
+    old one may still be served while revalidating.
+    """
+    timestamp = cache.result.timestamp
+    age = max(0, int(time.time()) - timestamp)
+    fresh_for = max(0, min(lifetime, max_age) - age)
+    stale_for = max(0, max_age - age - fresh_for)
+    return {
+        "ETag": f'"{timestamp:x}-{zlib.crc32(cache.body):08x}"',
+        "Last-Modified": formatdate(timestamp, usegmt=True),
+        "Cache-Control": f"public, max-age={fresh_for}, stale-while-revalidate={stale_for}",
+    }
+
+def _not_modified(request: Request, timestamp: int, etag: str) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no tags are sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        return timestamp <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+MAX_HISTORY_BUCKETS = 10_000
+
+@app.get("/temperature/history", response_model=TemperatureHistory)
+async def get_temperature_history(
+    start: Optional[int] = Query(None, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    step: int = Query(3600, gt=0),
+    history_svc: HistoryService = Depends(get_history_service),
+):
+    """Get min/avg/max temperature per step between from and to (unix seconds)."""
+    end = end if end is not None else int(time.time())
+    start = start if start is not None else end - 86400
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if (end - start) // step > MAX_HISTORY_BUCKETS:
+        raise HTTPException(status_code=400, detail="Too many buckets, increase 'step'")
     try:
-        await cache_svc.update(result)
+        return await history_svc.query(start, end, step)
     except CacheServiceError as e:
-        print(f"Cache update error: {e}")
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+STREAM_KEEPALIVE = 15.0
+
+@app.get("/temperature/stream")
+async def stream_temperature(
+    request: Request,
+    cache_svc: CacheService = Depends(get_cache_service),
+    broadcaster: Broadcaster = Depends(get_broadcaster),
+):
+    """Push every new temperature result as a Server-Sent Event."""
+    async def events():
+        # Subscribe before reading the current value so no update slips
+        # between the two.
+        with broadcaster.subscribe() as queue:
+            try:
+                cache = await cache_svc.fetch_cached(allow_stale=True)
+                yield f"data: {cache.body.decode()}\n\n"
+            except CacheServiceError:
+                pass
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                if payload is None:
+                    return
+                yield f"data: {payload}\n\n"
 
-    return result
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/metrics")
 async def metrics():
     """Expose Prometheus metrics."""
     return Response(
-        content=prometheus_client.generate_latest(),
+        content=prometheus_client.generate_latest(metrics_registry()),
         media_type="text/plain"
     )
 
@@ -0,0 +1,229 @@
+"""Microbenchmarks for the hot functions, with saved baselines to compare runs.
+
+Run from src/:
+
+    python -m tests.benchmark.component_benchmark --save baseline.json
+    python -m tests.benchmark.component_benchmark --compare baseline.json
+
+Cache benchmarks use an in-memory Redis stand-in by default so they measure
+CacheService itself; pass --redis to run them against a real server.
+"""
+# pylint: disable=duplicate-code
+
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+import httpx
+from hivebox.aggregate import Aggregator
+from hivebox.cache import CacheService, LocalCache
+from hivebox.temperature import SensorReading, TemperatureResult, TemperatureService
+
+SENSOR_COUNTS = [3, 100, 1000, 10000]
+
+Benchmark = Callable[[], Union[None, Awaitable[None]]]
+
+
+class MemoryRedis:
+    """The subset of redis.asyncio.Redis that CacheService uses on its hot path."""
+
+    def __init__(self):
+        self.data: Dict[str, str] = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, **_kwargs):
+        self.data[key] = value
+        return True
+
+    def pipeline(self, transaction: bool = True):
+        return MemoryPipeline(self)
+
+
+class MemoryPipeline:
+    """Buffer commands and apply them on execute(), like a Redis pipeline."""
+
+    def __init__(self, redis: MemoryRedis):
+        self.redis = redis
+        self.commands: List[tuple] = []
+
+    def set(self, key, value, **_kwargs):
+        self.commands.append((key, value))
+
+    def xadd(self, *_args, **_kwargs):
+        pass
+
+    def publish(self, *_args):
+        pass
+
+    async def execute(self):
+        for key, value in self.commands:
+            self.redis.data[key] = value
+        self.commands = []
+
+
+def sensor_payload() -> bytes:
+    return json.dumps({
+        "lastMeasurement": {
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "value": "16.2"
+        }
+    }).encode()
+
+
+def build_readings(count: int) -> List[SensorReading]:
+    now = datetime.now(timezone.utc)
+    return [SensorReading(f"sensor{i:05}", 10.0 + i % 20, now) for i in range(count)]
+
+
+def build_benchmarks(count: int, client: httpx.AsyncClient,
+                     cache_svc: CacheService) -> Dict[str, Benchmark]:
+    """Return the benchmarks for one sensor count, keyed by name."""
+    sensor_data = {f"box{i:05}": f"sensor{i:05}" for i in range(count)}
+    responses = [httpx.Response(200, content=sensor_payload()) for _ in range(count)]
+    readings = build_readings(count)
+    mean = TemperatureService(sensor_data, aggregator=Aggregator("mean"))
+    median = TemperatureService(sensor_data, aggregator=Aggregator("median"))
+    result = mean.aggregate(readings)
+    encoded = result.model_dump_json()
+
+    def parse():
+        for sensor_id, response in zip(sensor_data.values(), responses):
+            mean._process_sensor_reading(response, sensor_id)
+
+    async def fetch():
+        await TemperatureService(sensor_data, client, concurrency=10).refresh_readings()
+
+    def status():
+        for reading in readings:
+            mean._determine_temperature_status(reading.value)
+
+    def round_trip():
+        TemperatureResult.model_validate_json(result.model_dump_json())
+
+    async def update():
+        await cache_svc.update(result, readings)
+
+    async def fetch_remote():
+        cache_svc.local.invalidate()
+        await cache_svc.fetch(allow_stale=True)
+
+    async def fetch_local():
+        await cache_svc.fetch(allow_stale=True)
+
+    return {
+        "parse": parse,
+        "fetch_mock_transport": fetch,
+        "aggregate_mean": lambda: mean.aggregate(readings),
+        "aggregate_median": lambda: median.aggregate(readings),
+        "status": status,
+        "result_json_round_trip": round_trip,
+        "result_json_parse": lambda: TemperatureResult.model_validate_json(encoded),
+        "cache_update": update,
+        "cache_fetch_redis": fetch_remote,
+        "cache_fetch_l1": fetch_local,
+    }
+
+
+async def time_loops(fn: Benchmark, loops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(loops):
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+    return time.perf_counter() - start
+
+
+async def best_of(fn: Benchmark, repeat: int, min_time: float) -> float:
+    """Return the fastest per-call time over repeat batches of min_time each."""
+    await time_loops(fn, 1)  # warm up imports and caches
+    loops = 1
+    elapsed = await time_loops(fn, loops)
+    while elapsed < min_time:
+        loops *= 2 if elapsed * 10 > min_time else 10
+        elapsed = await time_loops(fn, loops)
+    batches = [elapsed] + [await time_loops(fn, loops) for _ in range(repeat - 1)]
+    return min(batches) / loops
+
+
+def build_transport() -> httpx.MockTransport:
+    payload = sensor_payload()
+    return httpx.MockTransport(lambda _request: httpx.Response(200, content=payload))
+
+
+async def run(counts: List[int], names: Optional[List[str]], repeat: int,
+              min_time: float, redis_url: Optional[str]) -> Dict[str, float]:
+    """Time every selected benchmark for every sensor count."""
+    results = {}
+    cache_svc = CacheService(redis_url or "redis://localhost:6379/0",
+                             {"decode_responses": True}, LocalCache(), history_maxlen=0)
+    if redis_url is None:
+        cache_svc.client = cache_svc.reader = MemoryRedis()
+    async with httpx.AsyncClient(transport=build_transport()) as client:
+        for count in counts:
+            for name, fn in build_benchmarks(count, client, cache_svc).items():
+                if names and name not in names:
+                    continue
+                key = f"{name}/{count}"
+                results[key] = await best_of(fn, repeat, min_time)
+                print(f"{key:<34} {results[key] * 1e6:>12.1f} us", flush=True)
+    if redis_url is not None:
+        await cache_svc.close()
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> int:
+    """Print the change against a baseline; return the number of regressions."""
+    regressions = 0
+    print(f"\n{'benchmark':<34} {'baseline us':>12} {'now us':>12} {'change':>8}")
+    for key, seconds in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{key:<34} {before * 1e6:>12.1f} {seconds * 1e6:>12.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, nargs="+", default=SENSOR_COUNTS)
+    parser.add_argument("--only", nargs="+", help="benchmark names to run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimum seconds per timed batch")
+    parser.add_argument("--redis", help="Redis URL to benchmark the cache against")
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="compare results with this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown fraction reported as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sensors, args.only, args.repeat, args.min_time, args.redis))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        sys.exit(1 if compare(results, baseline, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""End-to-end load harness: main.app against a fake openSenseMap.
+
+Boots the app with uvicorn in a subprocess, points it at a local fake
+openSenseMap with configurable latency, error rate and stale readings, and
+reports throughput and latency percentiles per scenario. Run from src/:
+
+    python -m tests.benchmark.load_harness
+    python -m tests.benchmark.load_harness --scenarios warm redis-down --duration 30
+    python -m tests.benchmark.load_harness --record osm.json --scenarios warm
+    python -m tests.benchmark.load_harness --replay osm.json
+
+A local Redis is expected at --redis (e.g. `docker compose up redis`); the
+redis-down scenario points the app at a closed port instead. --record
+proxies the fake to the real openSenseMap and saves every response, and
+--replay serves those responses back without network access.
+"""
+# pylint: disable=duplicate-code
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import httpx
+import uvicorn
+from fastapi import FastAPI, Response
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from hivebox import OPENSENSEMAP_URL, SENSEBOX_TEMP_SENSORS, load_sensor_data
+
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+@dataclass
+class Scenario:
+    """Upstream behaviour and app environment for one measurement."""
+    latency: float = 0.05
+    error_rate: float = 0.0
+    stale_rate: float = 0.0
+    redis_down: bool = False
+    clear_cache: bool = False
+    prime: bool = True
+    env: Dict[str, str] = field(default_factory=dict)
+
+
+SCENARIOS = {
+    # Empty cache and no start-up warm-up: the first requests compute the
+    # result themselves.
+    "cold": Scenario(clear_cache=True, prime=False, env={"WARMUP_TIMEOUT": "0"}),
+    "warm": Scenario(),
+    # Every request misses the cache and refetches all sensors (coalesced).
+    "redis-down": Scenario(redis_down=True, env={"SENSOR_REPORT_INTERVAL": "0"}),
+    # The refresher fights a slow, flaky upstream while requests are served.
+    "upstream-slow": Scenario(latency=1.0, error_rate=0.1, clear_cache=True,
+                              env={"SENSOR_REPORT_INTERVAL": "0", "REFRESH_INTERVAL": "1"}),
+}
+
+
+class FakeOpenSenseMap:
+    """Serve /boxes/{box}/sensors/{sensor} from synthetic data or a recording.
+
+    With record_from set, requests are proxied there and the responses kept
+    in recordings so they can be saved and replayed later.
+    """
+
+    def __init__(self, scenario: Scenario, recordings: Optional[Dict[str, dict]] = None,
+                 record_from: Optional[str] = None):
+        self.scenario = scenario
+        self.recordings = recordings if recordings is not None else {}
+        self.replay = recordings is not None and record_from is None
+        self.record_from = record_from
+        self.requests = 0
+        self.app = FastAPI()
+        self.app.get("/boxes/{box_id}/sensors/{sensor_id}")(self.sensor)
+
+    async def sensor(self, box_id: str, sensor_id: str):
+        self.requests += 1
+        await asyncio.sleep(self.scenario.latency)
+        if random.random() < self.scenario.error_rate:
+            return Response(status_code=503)
+        path = f"/boxes/{box_id}/sensors/{sensor_id}"
+        if self.replay:
+            recorded = self.recordings.get(path)
+            if recorded is None:
+                return Response(status_code=404)
+            return Response(recorded["body"], recorded["status"], media_type="application/json")
+        if self.record_from is not None:
+            async with httpx.AsyncClient(timeout=30) as client:
+                upstream = await client.get(self.record_from + path)
+            self.recordings[path] = {"status": upstream.status_code, "body": upstream.text}
+            return Response(upstream.content, upstream.status_code, media_type="application/json")
+        age = 7200 if random.random() < self.scenario.stale_rate else random.uniform(0, 60)
+        created = datetime.now(timezone.utc) - timedelta(seconds=age)
+        return {"lastMeasurement": {"createdAt": created.isoformat(),
+                                    "value": f"{random.uniform(5, 30):.2f}"}}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def sensors_from_recordings(recordings: Dict[str, dict]) -> Dict[str, str]:
+    sensors = {}
+    for path in recordings:
+        _, _, box_id, _, sensor_id = path.split("/")
+        sensors[box_id] = sensor_id
+    return sensors
+
+
+async def clear_cache(redis_url: str):
+    """Delete every hivebox key so the app starts without cached data."""
+    client = Redis.from_url(redis_url)
+    try:
+        # Sensor readings are hash-tagged as {hivebox}:sensor:<id>.
+        keys = [key for pattern in ("hivebox:*", "{hivebox}:*")
+                async for key in client.scan_iter(pattern)]
+        if keys:
+            await client.delete(*keys)
+    except RedisConnectionError:
+        print(f"warning: could not clear cache, {redis_url} is unreachable", flush=True)
+    finally:
+        await client.aclose()
+
+
+async def start_app(port: int, env: Dict[str, str], verbose: bool) -> subprocess.Popen:
+    """Start uvicorn with main:app and wait until it answers."""
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env}, stdout=output, stderr=output)
+    async with httpx.AsyncClient() as client:
+        for _ in range(300):
+            if process.poll() is not None:
+                raise RuntimeError(f"app exited with code {process.returncode}")
+            try:
+                await client.get(f"http://127.0.0.1:{port}/version")
+                return process
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("app did not start within 30s")
+
+
+async def generate_load(url: str, concurrency: int, duration: float) -> dict:
+    """Hit url from concurrency workers for duration seconds."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(latencies, statuses, elapsed)
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    histogram = Counter()
+    for latency in ordered:
+        ms = latency * 1000
+        bound = next((b for b in HISTOGRAM_BOUNDS_MS if ms <= b), "inf")
+        histogram[str(bound)] += 1
+    return {
+        "requests": len(ordered),
+        "rps": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000 if ordered else None,
+        "p90_ms": percentile(ordered, 0.90) * 1000 if ordered else None,
+        "p99_ms": percentile(ordered, 0.99) * 1000 if ordered else None,
+        "max_ms": ordered[-1] * 1000 if ordered else None,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "histogram_ms": {str(b): histogram[str(b)] for b in HISTOGRAM_BOUNDS_MS + ["inf"]},
+    }
+
+
+async def run_scenario(name: str, scenario: Scenario, sensors: Dict[str, str],
+                       args: argparse.Namespace,
+                       recordings: Optional[Dict[str, dict]]) -> dict:
+    """Boot the fake upstream and the app, warm up as configured, and measure."""
+    fake = FakeOpenSenseMap(scenario, recordings, OPENSENSEMAP_URL if args.record else None)
+    fake_port, app_port = free_port(), free_port()
+    server = uvicorn.Server(uvicorn.Config(fake.app, host="127.0.0.1", port=fake_port,
+                                           log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    redis_url = f"redis://127.0.0.1:{free_port()}/0" if scenario.redis_down else args.redis
+    if scenario.clear_cache and not scenario.redis_down:
+        await clear_cache(redis_url)
+    env = {
+        "SENSORS": json.dumps(sensors),
+        "UPSTREAM": json.dumps({"base_url": f"http://127.0.0.1:{fake_port}", "timeout": 10}),
+        "REDIS_URL": redis_url,
+        **scenario.env,
+    }
+    process = await start_app(app_port, env, args.verbose)
+    url = f"http://127.0.0.1:{app_port}/temperature"
+    try:
+        async with httpx.AsyncClient(timeout=60) as client:
+            start = time.perf_counter()
+            first = await client.get(url)
+            first_ms = (time.perf_counter() - start) * 1000
+        result = await generate_load(url, args.concurrency, args.duration)
+        if not scenario.prime:
+            result["first_ms"] = first_ms
+            result["first_status"] = first.status_code
+        result["upstream_requests"] = fake.requests
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+        server.should_exit = True
+        await serving
+
+
+def print_result(name: str, result: dict, histogram: bool):
+    def ms(value):
+        return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+    errors = sum(v for k, v in result["statuses"].items() if k != "200")
+    print(f"{name:<14} {result['requests']:>8} {result['rps']:>9.1f} {ms(result['p50_ms'])} "
+          f"{ms(result['p90_ms'])} {ms(result['p99_ms'])} {ms(result['max_ms'])} "
+          f"{errors:>7} {result['upstream_requests']:>9}", flush=True)
+    if "first_ms" in result:
+        print(f"{'':<14} first request {result['first_ms']:.1f} ms "
+              f"(HTTP {result['first_status']})", flush=True)
+    if histogram:
+        peak = max(result["histogram_ms"].values()) or 1
+        for bound, count in result["histogram_ms"].items():
+            label = f"<= {bound} ms" if bound != "inf" else "slower"
+            print(f"{'':<14} {label:>12} {count:>8} {'#' * round(40 * count / peak)}")
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, dict]:
+    recordings = None
+    if args.replay:
+        with open(args.replay, encoding="utf-8") as file:
+            recordings = json.load(file)
+        sensors = sensors_from_recordings(recordings)
+    elif args.record:
+        recordings = {}
+        sensors = load_sensor_data(args.sensors_file) if args.sensors_file else SENSEBOX_TEMP_SENSORS
+    elif args.sensors_file:
+        sensors = load_sensor_data(args.sensors_file)
+    else:
+        sensors = {f"box{i:05}": f"sensor{i:05}" for i in range(args.boxes)}
+
+    print(f"{'scenario':<14} {'requests':>8} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'errors':>7} {'upstream':>9}", flush=True)
+    results = {}
+    for name in args.scenarios:
+        scenario = SCENARIOS[name]
+        for attr in ("latency", "error_rate", "stale_rate"):
+            if getattr(args, attr) is not None:
+                setattr(scenario, attr, getattr(args, attr))
+        if args.record or args.replay:
+            scenario.latency = 0.0 if args.latency is None else args.latency
+        results[name] = await run_scenario(name, scenario, sensors, args, recordings)
+        print_result(name, results[name], args.histogram)
+
+    if args.record:
+        with open(args.record, "w", encoding="utf-8") as file:
+            json.dump(recordings, file, indent=2, sort_keys=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--boxes", type=int, default=3, help="synthetic senseBox count")
+    parser.add_argument("--sensors-file", help="JSON mapping of senseBox IDs to sensor IDs")
+    parser.add_argument("--latency", type=float, help="override upstream latency in seconds")
+    parser.add_argument("--error-rate", type=float, help="override upstream 503 fraction")
+    parser.add_argument("--stale-rate", type=float,
+                        help="override fraction of readings over an hour old")
+    parser.add_argument("--redis", default="redis://127.0.0.1:6379/0")
+    parser.add_argument("--record", help="proxy to openSenseMap and save responses here")
+    parser.add_argument("--replay", help="serve responses saved with --record")
+    parser.add_argument("--histogram", action="store_true", help="print latency histograms")
+    parser.add_argument("--output", help="write all results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark for sensor fetch throughput and memory as the box count grows."""
+# pylint: disable=duplicate-code
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import httpx
+from hivebox.temperature import TemperatureService
+
+BOX_COUNTS = [3, 100, 1000, 5000]
+
+def build_transport(latency: float) -> httpx.MockTransport:
+    """Return a transport answering every sensor after a fixed latency."""
+    payload = {
+        "lastMeasurement": {
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "value": "16.2"
+        }
+    }
+
+    async def handler(_request):
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=payload)
+
+    return httpx.MockTransport(handler)
+
+async def fetch(box_count: int, concurrency: int, latency: float) -> int:
+    """Fetch box_count sensors once and return the number of readings."""
+    sensor_data = {f"box{i:05}": f"sensor{i:05}" for i in range(box_count)}
+    async with httpx.AsyncClient(transport=build_transport(latency)) as client:
+        service = TemperatureService(sensor_data, client, concurrency=concurrency)
+        return len(await service.fetch_readings())
+
+def measure(box_count: int, concurrency: int, latency: float) -> dict:
+    """Time one fetch, then repeat it under tracemalloc for peak memory."""
+    start = time.perf_counter()
+    readings = asyncio.run(fetch(box_count, concurrency, latency))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    asyncio.run(fetch(box_count, concurrency, latency))
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "boxes": box_count,
+        "readings": readings,
+        "seconds": elapsed,
+        "boxes_per_second": box_count / elapsed,
+        "peak_kib": peak / 1024,
+        "bytes_per_box": peak / box_count,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--boxes", type=int, nargs="+", default=BOX_COUNTS)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="simulated upstream latency per request in seconds")
+    args = parser.parse_args()
+
+    print(f"{'boxes':>8} {'seconds':>9} {'boxes/s':>10} {'peak KiB':>10} {'B/box':>8}")
+    for box_count in args.boxes:
+        row = measure(box_count, args.concurrency, args.latency)
+        print(f"{row['boxes']:>8} {row['seconds']:>9.3f} {row['boxes_per_second']:>10.1f} "
+              f"{row['peak_kib']:>10.1f} {row['bytes_per_box']:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 """Test fixtures for CacheService module."""
 
+from datetime import datetime, timezone
 import pytest
+from hivebox.cache import CachedResult, CacheServiceError
 from hivebox.temperature import (
+    SensorReading,
     TemperatureResult
 )
 
@@ -30,4 +33,46 @@ def mock_deserialized_cache_data():
         value=14.8,
         status="Good",
         timestamp=1747774970
-    )
\ No newline at end of file
+    )
+
+@pytest.fixture
+def mock_sensor_readings():
+    """Return SensorReading objects as cached per sensor"""
+    timestamp = datetime(2025, 5, 20, 21, 0, tzinfo=timezone.utc)
+    return [
+        SensorReading(sensor_id="tempSensor01", value=15.5, timestamp=timestamp),
+        SensorReading(sensor_id="tempSensor02", value=17.3, timestamp=timestamp)
+    ]
+
+@pytest.fixture
+def mock_cache_svc(mocker):
+    """Return a cache service mock that misses, grants leases and stores keys in a dict"""
+    store = {}
+    cache_svc = mocker.Mock()
+    cache_svc.tag = "temp:latest"
+    cache_svc.catalog_tag = "catalog"
+    cache_svc.catalog_lease_tag = "lease:catalog"
+    cache_svc.region_key = lambda region: f"temp:region:{region}"
+    cache_svc.fetch = mocker.AsyncMock(side_effect=CacheServiceError("miss"))
+    cache_svc.fetch_cached = mocker.AsyncMock(side_effect=CacheServiceError("miss"))
+    cache_svc.fetch_readings = mocker.AsyncMock(return_value={})
+    cache_svc.update = mocker.AsyncMock()
+    cache_svc.update_region = mocker.AsyncMock(
+        side_effect=lambda key, result, ttl, readings: CachedResult(result, b"{}"))
+    cache_svc.acquire_lease = mocker.AsyncMock(return_value="token")
+    cache_svc.release_lease = mocker.AsyncMock()
+
+    async def call(fn, *args, **kwargs):
+        return await fn(*args, **kwargs)
+
+    async def get(key):
+        return store.get(key)
+
+    async def set_(key, value):
+        store[key] = value
+
+    cache_svc.call = mocker.AsyncMock(side_effect=call)
+    cache_svc.reader.get = mocker.AsyncMock(side_effect=get)
+    cache_svc.client.set = mocker.AsyncMock(side_effect=set_)
+    cache_svc.store = store
+    return cache_svc
@@ -1,6 +1,7 @@
 """Test fixtures for temperature service module."""
 
 from datetime import datetime, timezone, timedelta
+import httpx
 import pytest
 
 @pytest.fixture
@@ -96,3 +97,21 @@ def mock_sensor_responses_invalid_value():
             }
         }
     }
+
+@pytest.fixture
+def mock_sensor_transport():
+    """Return factory building an httpx transport that serves sensor payloads.
+
+    Payloads are keyed by sensor ID; dicts are sent as JSON, strings as raw
+    bodies and exceptions are raised as transport errors.
+    """
+    def build(payloads):
+        def handler(request):
+            payload = payloads[request.url.path.rsplit('/', 1)[-1]]
+            if isinstance(payload, Exception):
+                raise payload
+            if isinstance(payload, str):
+                return httpx.Response(200, text=payload)
+            return httpx.Response(200, json=payload)
+        return httpx.MockTransport(handler)
+    return build
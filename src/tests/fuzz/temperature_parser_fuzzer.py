@@ -24,8 +24,7 @@ def test_one_input(data):
         mock_response = json.dumps(fuzz_dict)
 
         class MockResponse:
-            def json(self):
-                return json.loads(mock_response)
+            content = mock_response.encode()
 
         service._process_sensor_reading(MockResponse(), "test_sensor")
     except Exception:
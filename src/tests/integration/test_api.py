@@ -2,41 +2,84 @@
 # pylint: disable=unused-import,protected-access,redefined-outer-name,duplicate-code
 # ruff: noqa: F401, F811
 
+import time
+import httpx
 import pytest
-import requests
+from prometheus_client import REGISTRY
 from fastapi.testclient import TestClient
 from hivebox import __version__
-from hivebox.cache import CacheServiceError
-from main import app
+import asyncio
+import uvicorn
+from hivebox.broadcast import Broadcaster
+from hivebox.cache import CachedResult, CacheServiceError
+from hivebox.temperature import TemperatureResult, TemperatureService
+from hivebox.geo import GeoIndex
+from hivebox.refresh import RefreshService
+from hivebox.region import RegionService
+from hivebox.runner import Server
+from hivebox.history import HistoryBucket, TemperatureHistory
+from main import (
+    app,
+    get_broadcaster,
+    get_cache_service,
+    get_history_service,
+    get_refresh_service,
+    get_region_service
+)
 from tests.fixtures.temperature_fixtures import (
+    mock_sensor_data,
     mock_sensor_responses,
     mock_sensor_responses_stale,
-    mock_sensor_responses_invalid_value
+    mock_sensor_responses_invalid_value,
+    mock_sensor_transport
 )
 
 class DummyCacheService:
+    tag = "temp:latest"
+    max_age = 3600
     async def fetch(self, *args, **kwargs):
         raise CacheServiceError("Cache unavailable")
+    async def fetch_cached(self, *args, **kwargs):
+        raise CacheServiceError("Cache unavailable")
     async def update(self, *args, **kwargs):
         raise CacheServiceError("Cache unavailable")
+    async def acquire_lease(self, *args, **kwargs):
+        raise CacheServiceError("Cache unavailable")
+    async def release_lease(self, *args, **kwargs):
+        raise CacheServiceError("Cache unavailable")
+    async def fetch_readings(self, *args, **kwargs):
+        raise CacheServiceError("Cache unavailable")
     
 app.state.cache_svc = DummyCacheService()
 client = TestClient(app)
 
+@pytest.fixture
+def upstream(mock_sensor_data, mock_sensor_transport):
+    """Serve the endpoint's refresh coordinator from a mock transport."""
+    def serve(payloads):
+        http_client = httpx.AsyncClient(transport=mock_sensor_transport(payloads))
+        temp_svc = TemperatureService(mock_sensor_data, http_client)
+        refresh_svc = RefreshService(temp_svc, app.state.cache_svc, 0)
+        app.dependency_overrides[get_refresh_service] = lambda: refresh_svc
+    yield serve
+    app.dependency_overrides.pop(get_refresh_service, None)
+
+def _cached(result):
+    return CachedResult(result, result.model_dump_json().encode())
+
+def _outcome_count(outcome):
+    return REGISTRY.get_sample_value(
+        "hivebox_temperature_request_seconds_count", {"outcome": outcome}) or 0
+
 def test_get_version():
     """Test that version endpoint returns correct version information."""
     response = client.get("/version")
     assert response.status_code == 200
     assert response.json() == {"hivebox": __version__}
 
-def test_get_temperature_success(mocker, mock_sensor_responses):
+def test_get_temperature_success(upstream, mock_sensor_responses):
     """Test successful temperature readings from all sensors."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.return_value.json.side_effect = [
-        mock_sensor_responses["tempSensor01"],
-        mock_sensor_responses["tempSensor02"],
-        mock_sensor_responses["tempSensor03"]
-    ]
+    upstream(mock_sensor_responses)
 
     response = client.get("/temperature")
     assert response.status_code == 200
@@ -45,49 +88,401 @@ def test_get_temperature_success(mocker, mock_sensor_responses):
     assert isinstance(data["value"], float)
     assert data["status"] in ["Good", "Too Cold", "Too Hot"]
 
-def test_get_temperature_stale_data(mocker, mock_sensor_responses_stale):
+def test_get_temperature_deadline_on_request_path(mock_sensor_data, mock_sensor_responses):
+    """Test a cold miss answers once quorum is met instead of waiting on a hanging sensor."""
+    async def handler(request):
+        sensor_id = request.url.path.rsplit('/', 1)[-1]
+        if sensor_id == "tempSensor03":
+            await asyncio.Event().wait()
+        return httpx.Response(200, json=mock_sensor_responses[sensor_id])
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    temp_svc = TemperatureService(mock_sensor_data, http_client, deadline=10)
+    refresh_svc = RefreshService(temp_svc, app.state.cache_svc, 0)
+    app.dependency_overrides[get_refresh_service] = lambda: refresh_svc
+    try:
+        start = time.monotonic()
+        response = client.get("/temperature")
+        elapsed = time.monotonic() - start
+    finally:
+        app.dependency_overrides.pop(get_refresh_service)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["sensors"], data["total"], data["degraded"]) == (2, 3, True)
+    assert elapsed < 1
+
+def test_get_temperature_stale_data(upstream, mock_sensor_responses_stale):
     """Test temperature endpoint properly handles stale sensor data."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.return_value.json.side_effect = [
-        mock_sensor_responses_stale["tempSensor01"],
-        mock_sensor_responses_stale["tempSensor02"],
-        mock_sensor_responses_stale["tempSensor03"]
-    ]
+    upstream(mock_sensor_responses_stale)
 
     response = client.get("/temperature")
     assert response.status_code == 500
     assert response.json()["detail"] == "All available readings are over 1 hour old"
 
-def test_get_temperature_invalid_json(mocker):
+def test_get_temperature_invalid_json(upstream, mock_sensor_data):
     """Test temperature endpoint handles invalid JSON responses."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.return_value.json.side_effect = ValueError("Invalid JSON")
+    upstream({sensor_id: "{invalid" for sensor_id in mock_sensor_data.values()})
 
     response = client.get("/temperature")
     assert response.status_code == 500
     assert "Invalid data received" in response.json()["detail"]
 
-def test_get_temperature_invalid_value(mocker, mock_sensor_responses_invalid_value):
+def test_get_temperature_invalid_value(upstream, mock_sensor_data,
+                                       mock_sensor_responses_invalid_value):
     """Test temperature endpoint handles non-numeric temperature values."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.return_value.json.return_value = mock_sensor_responses_invalid_value["tempSensor01"]
+    invalid = mock_sensor_responses_invalid_value["tempSensor01"]
+    upstream({sensor_id: invalid for sensor_id in mock_sensor_data.values()})
 
     response = client.get("/temperature")
     assert response.status_code == 500
     assert "Invalid data received" in response.json()["detail"]
 
-def test_get_temperature_network_error(mocker):
+def test_get_temperature_network_error(upstream, mock_sensor_data):
     """Test temperature endpoint handles network request failures."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.side_effect = requests.RequestException("Connection error")
+    upstream({sensor_id: httpx.ConnectError("Connection error")
+              for sensor_id in mock_sensor_data.values()})
 
     response = client.get("/temperature")
     assert response.status_code == 500
     assert "Failed to fetch data" in response.json()["detail"]
 
+def test_get_temperature_serves_stale_with_refresher(mocker):
+    """Test cached values are served without an upstream call while a refresher runs."""
+    cache_svc = mocker.Mock(max_age=3600)
+    cache_svc.fetch_cached = mocker.AsyncMock(return_value=_cached(
+        TemperatureResult(value=12.5, status="Good", timestamp=1000)))
+    refresh_svc = mocker.Mock(running=True, interval=300)
+    stale_before = _outcome_count("stale")
+    app.dependency_overrides[get_cache_service] = lambda: cache_svc
+    app.dependency_overrides[get_refresh_service] = lambda: refresh_svc
+    try:
+        response = client.get("/temperature")
+    finally:
+        app.dependency_overrides.pop(get_cache_service)
+        app.dependency_overrides.pop(get_refresh_service)
+
+    assert response.status_code == 200
+    assert response.json()["value"] == 12.5
+    assert _outcome_count("stale") == stale_before + 1
+    cache_svc.fetch_cached.assert_awaited_once_with(allow_stale=True)
+    refresh_svc.refresh.assert_not_called()
+
+def test_get_temperature_hit_returns_cached_body(mocker):
+    """Test a fresh hit sends the stored bytes without re-serializing the model."""
+    body = b'{"value":12.5,"status":"Good","timestamp":%d}' % int(time.time())
+    cache_svc = mocker.Mock(max_age=3600)
+    cache_svc.fetch_cached = mocker.AsyncMock(return_value=CachedResult(
+        TemperatureResult.model_validate_json(body), body))
+    dump = mocker.spy(TemperatureResult, "model_dump_json")
+    hits_before = _outcome_count("hit")
+    app.dependency_overrides[get_cache_service] = lambda: cache_svc
+    app.dependency_overrides[get_refresh_service] = lambda: mocker.Mock(running=True, interval=300)
+    try:
+        response = client.get("/temperature")
+    finally:
+        app.dependency_overrides.pop(get_cache_service)
+        app.dependency_overrides.pop(get_refresh_service)
+
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-type"] == "application/json"
+    assert _outcome_count("hit") == hits_before + 1
+    dump.assert_not_called()
+
+@pytest.fixture
+def cached_hit(mocker):
+    """Serve a result computed 100 seconds ago from the cache."""
+    result = TemperatureResult(value=12.5, status="Good", timestamp=int(time.time()) - 100)
+    cache_svc = mocker.Mock(max_age=3600)
+    cache_svc.fetch_cached = mocker.AsyncMock(return_value=_cached(result))
+    app.dependency_overrides[get_cache_service] = lambda: cache_svc
+    app.dependency_overrides[get_refresh_service] = lambda: mocker.Mock(running=True, interval=300)
+    yield result
+    app.dependency_overrides.pop(get_cache_service)
+    app.dependency_overrides.pop(get_refresh_service)
+
+def test_get_temperature_cache_headers(cached_hit):
+    """Test validators and freshness lifetimes follow the result's age."""
+    response = client.get("/temperature")
+
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith(f'"{cached_hit.timestamp:x}-')
+    assert response.headers["last-modified"].endswith(" GMT")
+    max_age, swr = [int(part.split("=")[1])
+                    for part in response.headers["cache-control"].split(", ")[1:]]
+    assert 195 <= max_age <= 200
+    assert 3600 - 101 <= max_age + swr <= 3600 - 100
+
+@pytest.mark.parametrize("header", [
+    lambda r: {"If-None-Match": r.headers["etag"]},
+    lambda r: {"If-None-Match": f'"other", W/{r.headers["etag"]}'},
+    lambda r: {"If-None-Match": "*"},
+    lambda r: {"If-Modified-Since": r.headers["last-modified"]},
+])
+def test_get_temperature_not_modified(cached_hit, header):
+    """Test matching validators get an empty 304 carrying the same headers."""
+    first = client.get("/temperature")
+    response = client.get("/temperature", headers=header(first))
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == first.headers["etag"]
+    assert "cache-control" in response.headers
+
+@pytest.mark.parametrize("query", [
+    "bbox=7,51,8",
+    "bbox=8,52,7,51",
+    "bbox=a,b,c,d",
+    "lat=51.9&lon=7.6",
+    "bbox=7,51,8,52&lat=51.9&lon=7.6&radius=10",
+])
+def test_get_temperature_region_invalid(cached_hit, query):
+    """Test malformed or ambiguous regions are rejected."""
+    response = client.get(f"/temperature?{query}")
+    assert response.status_code == 400
+
+def test_get_temperature_region_unavailable(cached_hit):
+    """Test regional queries fail cleanly when no region service could be set up."""
+    app.dependency_overrides[get_region_service] = lambda: None
+    try:
+        response = client.get("/temperature?lat=51.9&lon=7.6&radius=10")
+    finally:
+        app.dependency_overrides.pop(get_region_service)
+    assert response.status_code == 503
+
+def test_get_temperature_region(mocker, cached_hit):
+    """Test a region is served with its own result and lifetime."""
+    result = TemperatureResult(value=9.5, status="Too Cold", timestamp=int(time.time()),
+                               sensors=2, total=2)
+    region_svc = mocker.Mock(ttl=120)
+    region_svc.fetch = mocker.AsyncMock(return_value=(_cached(result), "miss"))
+    app.dependency_overrides[get_region_service] = lambda: region_svc
+    try:
+        response = client.get("/temperature?bbox=7,51,8,52")
+        empty = client.get("/temperature?lat=51.9&lon=7.6&radius=10")
+    finally:
+        app.dependency_overrides.pop(get_region_service)
+
+    assert response.status_code == 200
+    assert response.json()["value"] == 9.5
+    assert response.headers["cache-control"] == "public, max-age=120, stale-while-revalidate=0"
+    region = region_svc.fetch.await_args_list[0].args[0]
+    assert region.key == "bbox:7.0,51.0,8.0,52.0"
+    assert region_svc.fetch.await_args_list[1].args[0].radius == 10
+
+def test_get_temperature_region_empty(mocker, cached_hit):
+    """Test a valid region without any senseBox is not found rather than an error."""
+    cache_svc = mocker.Mock()
+    cache_svc.region_key.side_effect = lambda key: f"temp:region:{key}"
+    cache_svc.fetch_cached = mocker.AsyncMock(side_effect=CacheServiceError("miss"))
+    region_svc = RegionService(mocker.Mock(sensor_data={}), cache_svc, GeoIndex())
+    app.dependency_overrides[get_region_service] = lambda: region_svc
+    try:
+        response = client.get("/temperature?lat=-45&lon=-120&radius=10")
+    finally:
+        app.dependency_overrides.pop(get_region_service)
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "No senseBoxes in the requested region"
+
+@pytest.mark.parametrize("headers", [
+    {"If-None-Match": '"stale-tag"'},
+    {"If-None-Match": '"stale-tag"', "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"},
+    {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"},
+    {"If-Modified-Since": "not a date"},
+])
+def test_get_temperature_modified(cached_hit, headers):
+    """Test outdated or unparsable validators get the full body."""
+    response = client.get("/temperature", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["value"] == 12.5
+
+def test_get_temperature_miss_coalesced(mocker):
+    """Test a cache miss goes through the refresh coordinator."""
+    refresh_svc = mocker.Mock(running=False)
+    refresh_svc.refresh = mocker.AsyncMock(return_value=TemperatureResult(
+        value=20.0, status="Good", timestamp=1000))
+    miss_before = _outcome_count("miss")
+    app.dependency_overrides[get_refresh_service] = lambda: refresh_svc
+    try:
+        response = client.get("/temperature")
+    finally:
+        app.dependency_overrides.pop(get_refresh_service)
+
+    assert response.status_code == 200
+    assert response.json()["value"] == 20.0
+    assert _outcome_count("miss") == miss_before + 1
+    refresh_svc.refresh.assert_awaited_once()
+
+def test_get_temperature_history(mocker):
+    """Test the history endpoint maps from/to/step onto the history service."""
+    history_svc = mocker.Mock()
+    history_svc.query = mocker.AsyncMock(return_value=TemperatureHistory(
+        start=1000, end=2000, step=500, buckets=[
+            HistoryBucket(start=1000, min=10.0, avg=11.0, max=12.0, count=3)]))
+    app.dependency_overrides[get_history_service] = lambda: history_svc
+    try:
+        response = client.get("/temperature/history", params={"from": 1000, "to": 2000, "step": 500})
+    finally:
+        app.dependency_overrides.pop(get_history_service)
+
+    assert response.status_code == 200
+    assert response.json()["buckets"][0] == {
+        "start": 1000, "min": 10.0, "avg": 11.0, "max": 12.0, "count": 3}
+    history_svc.query.assert_awaited_once_with(1000, 2000, 500)
+
+@pytest.mark.parametrize("params", [
+    {"from": 2000, "to": 1000},
+    {"from": 0, "to": 10_000_000, "step": 60},
+])
+def test_get_temperature_history_bad_range(mocker, params):
+    """Test inverted ranges and oversized bucket counts are rejected."""
+    history_svc = mocker.Mock()
+    app.dependency_overrides[get_history_service] = lambda: history_svc
+    try:
+        response = client.get("/temperature/history", params=params)
+    finally:
+        app.dependency_overrides.pop(get_history_service)
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("params", [{"from": -1}, {"to": -1}])
+def test_get_temperature_history_negative_bounds(mocker, params):
+    """Test negative from/to are rejected as validation errors."""
+    history_svc = mocker.Mock()
+    app.dependency_overrides[get_history_service] = lambda: history_svc
+    try:
+        response = client.get("/temperature/history", params=params)
+    finally:
+        app.dependency_overrides.pop(get_history_service)
+    assert response.status_code == 422
+
+def test_get_temperature_history_cache_down(mocker):
+    """Test Redis failures are reported as service unavailable."""
+    history_svc = mocker.Mock()
+    history_svc.query = mocker.AsyncMock(side_effect=CacheServiceError("Cache unavailable"))
+    app.dependency_overrides[get_history_service] = lambda: history_svc
+    try:
+        response = client.get("/temperature/history")
+    finally:
+        app.dependency_overrides.pop(get_history_service)
+    assert response.status_code == 503
+
+def test_stream_temperature(mocker):
+    """Test the stream sends the cached value, then each published update."""
+    broadcaster = Broadcaster()
+    update = TemperatureResult(value=13.0, status="Good", timestamp=2000)
+
+    async def finish():
+        # Stop the stream once the update has been picked up.
+        while any(not queue.empty() for queue in broadcaster.subscribers):
+            await asyncio.sleep(0)
+        broadcaster.close()
+
+    async def fetch_cached(**kwargs):
+        broadcaster.publish(update.model_dump_json())
+        asyncio.get_running_loop().create_task(finish())
+        return _cached(TemperatureResult(value=12.5, status="Good", timestamp=1000))
+
+    cache_svc = mocker.Mock()
+    cache_svc.fetch_cached = mocker.AsyncMock(side_effect=fetch_cached)
+    app.dependency_overrides[get_cache_service] = lambda: cache_svc
+    app.dependency_overrides[get_broadcaster] = lambda: broadcaster
+    try:
+        with client.stream("GET", "/temperature/stream") as response:
+            events = [line for line in response.iter_lines() if line.startswith("data: ")]
+    finally:
+        app.dependency_overrides.pop(get_cache_service)
+        app.dependency_overrides.pop(get_broadcaster)
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [TemperatureResult.model_validate_json(e[6:]).value for e in events] == [12.5, 13.0]
+
+def test_server_shutdown_ends_open_stream(mocker):
+    """Test shutting the server down ends a stream that is still open."""
+    broadcaster = Broadcaster()
+    server = Server(uvicorn.Config(app))
+    mocker.patch("hivebox.runner.uvicorn.Server.shutdown", mocker.AsyncMock())
+
+    async def fetch_cached(**kwargs):
+        asyncio.get_running_loop().create_task(server.shutdown())
+        return _cached(TemperatureResult(value=12.5, status="Good", timestamp=1000))
+
+    cache_svc = mocker.Mock()
+    cache_svc.fetch_cached = mocker.AsyncMock(side_effect=fetch_cached)
+    app.dependency_overrides[get_cache_service] = lambda: cache_svc
+    app.dependency_overrides[get_broadcaster] = lambda: broadcaster
+    try:
+        with client.stream("GET", "/temperature/stream") as response:
+            events = [line for line in response.iter_lines() if line.startswith("data: ")]
+    finally:
+        app.dependency_overrides.pop(get_cache_service)
+        app.dependency_overrides.pop(get_broadcaster)
+
+    assert len(events) == 1
+    assert broadcaster.closed and not broadcaster.subscribers
+    assert not broadcaster.subscribers
+
+def test_livez():
+    """Test liveness does not depend on Redis or upstream."""
+    response = client.get("/livez")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+@pytest.fixture
+def readiness(mocker):
+    """Install a refresh service with a controllable Redis and warm state."""
+    cache_svc = mocker.Mock()
+    cache_svc.ping = mocker.AsyncMock()
+    cache_svc.fetch = mocker.AsyncMock(side_effect=CacheServiceError("miss"))
+    refresh_svc = mocker.Mock(cache_svc=cache_svc, warm=True)
+    previous = getattr(app.state, "refresh_svc", None)
+    app.state.refresh_svc = refresh_svc
+    yield refresh_svc
+    app.state.refresh_svc = previous
+
+def test_readyz_ready(readiness):
+    """Test a warm pod with reachable Redis is ready."""
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "redis": True, "warm": True}
+
+def test_readyz_redis_down(readiness, mocker):
+    """Test an unreachable Redis keeps the pod out of rotation."""
+    readiness.cache_svc.ping = mocker.AsyncMock(side_effect=CacheServiceError("down"))
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["redis"] is False
+
+def test_readyz_cold(readiness, mocker):
+    """Test a cold pod becomes ready once a result shows up in the cache."""
+    readiness.warm = False
+    assert client.get("/readyz").status_code == 503
+
+    readiness.cache_svc.fetch = mocker.AsyncMock(return_value=TemperatureResult(
+        value=12.5, status="Good", timestamp=1000))
+    assert client.get("/readyz").status_code == 200
+    assert readiness.warm is True
+
+def test_readyz_without_cache_service(readiness):
+    """Test a pod whose cache service failed to initialise is never ready."""
+    app.state.refresh_svc = None
+    assert client.get("/readyz").status_code == 503
+
 def test_metrics():
     """Test that metrics endpoint returns proper Prometheus format."""
     response = client.get("/metrics")
     assert response.status_code == 200
     assert response.headers["content-type"] == "text/plain; charset=utf-8"
     assert isinstance(response.text, str)
+
+def test_metrics_expose_hot_path(upstream, mock_sensor_responses):
+    """Test a served request shows up in the exposed hivebox metrics."""
+    upstream(mock_sensor_responses)
+    client.get("/temperature")
+
+    text = client.get("/metrics").text
+    assert 'hivebox_temperature_request_seconds_count{outcome="miss"}' in text
+    assert 'hivebox_upstream_request_seconds_count{sensor="tempSensor01"}' in text
+    assert 'hivebox_cache_errors_total' in text
+    assert 'hivebox_temperature_timestamp_seconds' in text
@@ -0,0 +1,109 @@
+"""Test suite for Aggregator module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+from datetime import datetime, timedelta, timezone
+import pytest
+
+import hivebox.aggregate
+from hivebox.aggregate import Aggregator
+from hivebox.temperature import SensorReading, TemperatureService, TemperatureServiceError
+
+NOW = datetime(2025, 5, 20, 21, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """Run each test against the NumPy backend and the stdlib fallback."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(hivebox.aggregate, "np", None)
+    return request.param
+
+
+@pytest.fixture
+def readings_with_outlier():
+    """Return nine plausible readings and one broken sensor at 85°C."""
+    values = [15.0, 15.5, 16.0, 16.5, 17.0, 15.2, 15.8, 16.2, 16.8, 85.0]
+    return [
+        SensorReading(sensor_id=f"tempSensor{i:02}", value=value, timestamp=NOW)
+        for i, value in enumerate(values)
+    ]
+
+
+@pytest.mark.parametrize("method,expected", [
+    ("mean", 22.9),
+    ("median", 16.1),
+    ("trimmed", 16.125),
+    ("mad", 16.0),
+])
+def test_aggregator_methods(backend, readings_with_outlier, method, expected):
+    """Test each method's result, and that robust ones ignore the broken sensor."""
+    aggregator = Aggregator(method=method)
+    assert aggregator(readings_with_outlier, NOW) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("method,expected", [
+    ("mean", 23.7778),
+    ("median", 16.2),
+    ("mad", 16.125),
+])
+@pytest.mark.parametrize("bad", [float("nan"), float("inf")])
+def test_aggregator_skips_non_finite(backend, readings_with_outlier, method, expected, bad):
+    """Test one non-finite reading is dropped rather than turning the result into NaN."""
+    readings = readings_with_outlier[1:] + [SensorReading("tempSensor99", bad, NOW)]
+    assert Aggregator(method=method)(readings, NOW) == pytest.approx(expected, abs=1e-4)
+
+
+def test_aggregator_no_finite_readings(backend):
+    """Test readings that are all non-finite are an error."""
+    with pytest.raises(TemperatureServiceError, match="No finite readings"):
+        Aggregator(method="median")([SensorReading("tempSensor01", float("nan"), NOW)], NOW)
+
+
+def test_aggregator_weighted_prefers_recent(backend):
+    """Test age weighting halves a reading's weight every half-life."""
+    readings = [
+        SensorReading("tempSensor01", 10.0, NOW),
+        SensorReading("tempSensor02", 20.0, NOW - timedelta(seconds=1800)),
+    ]
+    aggregator = Aggregator(method="weighted", half_life=1800)
+    assert aggregator(readings, NOW) == pytest.approx((10.0 + 20.0 * 0.5) / 1.5)
+
+
+def test_aggregator_weighted_future_readings_clamped(backend):
+    """Test readings timestamped ahead of now count as fresh, not overweighted."""
+    readings = [
+        SensorReading("tempSensor01", 10.0, NOW + timedelta(seconds=600)),
+        SensorReading("tempSensor02", 20.0, NOW),
+    ]
+    assert Aggregator(method="weighted")(readings, NOW) == pytest.approx(15.0)
+
+
+def test_aggregator_mad_identical_values(backend):
+    """Test a zero MAD keeps the agreeing majority and drops the rest."""
+    readings = [SensorReading(f"s{i}", v, NOW) for i, v in enumerate([16.0, 16.0, 16.0, 40.0])]
+    assert Aggregator(method="mad")(readings, NOW) == pytest.approx(16.0)
+
+
+def test_aggregator_trimmed_small_sample(backend):
+    """Test trimming falls back to the plain mean when nothing would be cut."""
+    readings = [SensorReading(f"s{i}", v, NOW) for i, v in enumerate([10.0, 20.0])]
+    assert Aggregator(method="trimmed", trim=0.2)(readings, NOW) == pytest.approx(15.0)
+
+
+@pytest.mark.parametrize("kwargs", [{"method": "mode"}, {"trim": 0.5}])
+def test_aggregator_rejects_bad_config(kwargs):
+    """Test unknown methods and impossible trim fractions are refused."""
+    with pytest.raises(ValueError):
+        Aggregator(**kwargs)
+
+
+def test_service_uses_configured_aggregator(readings_with_outlier):
+    """Test TemperatureService status follows the robust aggregate."""
+    service = TemperatureService({"senseBox01": "tempSensor01"},
+                                 aggregator=Aggregator(method="median"))
+    result = service.aggregate(readings_with_outlier)
+    assert result.value == 16.1
+    assert result.status == "Good"
@@ -0,0 +1,59 @@
+"""Test suite for CircuitBreaker module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import pytest
+
+from hivebox.breaker import CircuitBreaker, CircuitState
+
+
+def test_breaker_opens_after_threshold():
+    """Test the circuit stays closed until the failure threshold is reached."""
+    breaker = CircuitBreaker(failure_threshold=3)
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets():
+    """Test a success closes the circuit and clears the failure count."""
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    assert not breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow()
+    assert breaker.remaining() == 0.0
+
+
+def test_breaker_half_open_failure_reopens(mocker):
+    """Test a failed trial reopens the circuit with a longer jittered delay."""
+    mocker.patch("hivebox.breaker.time.monotonic", return_value=100.0)
+    mocker.patch("hivebox.breaker.random.uniform", side_effect=lambda low, high: high)
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=1.0, max_delay=5.0)
+
+    breaker.record_failure()
+    assert breaker.remaining() == 1.0
+
+    breaker.half_open()
+    assert not breaker.allow()
+    assert breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.remaining() == 2.0
+
+    for _ in range(5):
+        breaker.half_open()
+        breaker.record_failure()
+    assert breaker.remaining() == 5.0
+
+
+def test_breaker_jitter_within_bounds():
+    """Test the backoff delay is jittered between half and the full delay."""
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=4.0)
+    breaker.record_failure()
+    assert 2.0 <= breaker.remaining() <= 4.0
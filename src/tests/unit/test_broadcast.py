@@ -0,0 +1,72 @@
+"""Test suite for Broadcaster module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import asyncio
+import pytest
+
+from hivebox.broadcast import Broadcaster, close_all
+
+
+@pytest.mark.asyncio
+async def test_publish_reaches_every_subscriber():
+    """Test one publish is delivered to all registered queues."""
+    broadcaster = Broadcaster()
+    with broadcaster.subscribe() as first, broadcaster.subscribe() as second:
+        broadcaster.publish("update")
+        assert await first.get() == "update"
+        assert await second.get() == "update"
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_keeps_latest_only():
+    """Test a subscriber that falls behind skips to the newest message."""
+    broadcaster = Broadcaster()
+    with broadcaster.subscribe() as queue:
+        broadcaster.publish("old")
+        broadcaster.publish("new")
+        assert queue.qsize() == 1
+        assert await queue.get() == "new"
+
+
+@pytest.mark.asyncio
+async def test_subscription_ends_with_block():
+    """Test leaving the with block unregisters the queue."""
+    broadcaster = Broadcaster()
+    with broadcaster.subscribe():
+        assert len(broadcaster.subscribers) == 1
+    assert not broadcaster.subscribers
+    broadcaster.publish("nobody listening")
+
+
+@pytest.mark.asyncio
+async def test_close_signals_subscribers():
+    """Test close() wakes every subscriber with the stop marker."""
+    broadcaster = Broadcaster()
+    with broadcaster.subscribe() as queue:
+        waiter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        broadcaster.close()
+        assert await waiter is None
+
+
+@pytest.mark.asyncio
+async def test_subscribe_after_close_stops_at_once():
+    """Test a closed broadcaster tells new subscribers to stop and drops updates."""
+    broadcaster = Broadcaster()
+    broadcaster.close()
+    broadcaster.publish("late")
+    with broadcaster.subscribe() as queue:
+        assert await queue.get() is None
+        assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_close_all_closes_every_broadcaster():
+    """Test close_all() wakes the subscribers of every live broadcaster."""
+    first, second = Broadcaster(), Broadcaster()
+    with first.subscribe() as one, second.subscribe() as two:
+        close_all()
+        assert await one.get() is None
+        assert await two.get() is None
+    assert first.closed and second.closed
@@ -2,16 +2,25 @@
 # pylint: disable=unused-import,protected-access, redefined-outer-name
 # ruff: noqa: F401, F811
 
+import asyncio
 import time
+from redis.asyncio.cluster import ClusterPipeline, RedisCluster
+from redis.cluster import LoadBalancingStrategy
+from redis.crc import key_slot
+from redis.exceptions import ConnectionError, ResponseError, TimeoutError
 from typing import Any, Callable, Generator, Literal
 import pytest
+from prometheus_client import REGISTRY
 from pytest_mock import MockerFixture
 from pytest_mock.plugin import _mocker
 
+from hivebox.breaker import CircuitBreaker, CircuitState
 from hivebox.cache import (
     CacheMessages,
     CacheService,
-    CacheServiceError
+    CacheServiceError,
+    LocalCache,
+    _dump_reading
 )
 from hivebox.temperature import (
     TemperatureResult
@@ -20,7 +29,8 @@ from tests.fixtures.cache_fixtures import (
     mock_deserialized_cache_data,
     mock_serialized_cache_data,
     mock_redis_dsn,
-    mock_redis_config
+    mock_redis_config,
+    mock_sensor_readings
 )
 
 def test_cachesvc_init(
@@ -40,9 +50,10 @@ async def test_cachesvc_connectfail(
     capfd: pytest.CaptureFixture[str]
 ):
     """Test connect() prints failure message on error."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.ping = mocker.AsyncMock(side_effect=ConnectionError())
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
     service = CacheService(mock_redis_dsn, mock_redis_config)
-    service.last_retry = 1000212360
-    mocker.patch("time.time", return_value=1000213380)
 
     await service.connect()
     out, _err = capfd.readouterr()
@@ -54,10 +65,9 @@ async def test_cachesvc_connect_toosoon(
     mock_redis_config: dict[str, Any],
     mocker: Callable[..., Generator[MockerFixture, None, None]]
 ):
-    """Test connect() raises error if called too soon."""
+    """Test connect() raises error while the circuit is waiting out its backoff."""
     service = CacheService(mock_redis_dsn, mock_redis_config)
-    service.last_retry = 1000000
-    mocker.patch("time.time", return_value=1000000)
+    service.breaker._open()
 
     with pytest.raises(CacheServiceError) as exc:
         await service.connect()
@@ -76,13 +86,13 @@ async def test_cachesvc_connect_success(
     mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
 
     service = CacheService(mock_redis_dsn, mock_redis_config)
-    service.last_retry = 1000000
-    mocker.patch("time.time", return_value=1000301)
+    service.breaker.failures = 2
 
     await service.connect()
     out, _err = capfd.readouterr()
     assert CacheMessages.REDIS_CONN_SUCCESS in out
     assert service.client is mock_redis_client
+    assert service.breaker.failures == 0
 
 @pytest.mark.asyncio
 async def test_cachesvc_check_fail(
@@ -170,4 +180,554 @@ async def test_cachesvc_fetch_outdated_cache(
     mocker.patch.object(service, '_check', return_value=False)
 
     with pytest.raises(CacheServiceError, match=CacheMessages.CACHE_OUTDATED):
-            await service.fetch()
\ No newline at end of file
+            await service.fetch()
+
+@pytest.mark.asyncio
+async def test_cachesvc_fetch_outdated_allow_stale(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_serialized_cache_data,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test fetch(allow_stale=True) serves an outdated cache entry."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.get = mocker.AsyncMock(return_value=mock_serialized_cache_data)
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    mocker.patch.object(service, '_check', return_value=False)
+
+    cache = await service.fetch(allow_stale=True)
+    assert cache.timestamp == 1747774970
+
+
+@pytest.mark.asyncio
+async def test_cachesvc_acquire_lease(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test acquire_lease() sets the lease key with NX and a TTL."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.set = mocker.AsyncMock(return_value=True)
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    token = await service.acquire_lease(30)
+    assert token
+    mock_redis_client.set.assert_awaited_once_with(
+        service.lease_tag, token, nx=True, ex=30)
+
+@pytest.mark.asyncio
+async def test_cachesvc_acquire_lease_held(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test acquire_lease() returns None when another replica holds it."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.set = mocker.AsyncMock(return_value=None)
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    assert await service.acquire_lease(30) is None
+
+@pytest.mark.asyncio
+async def test_cachesvc_lease_connection_error(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test lease operations raise CacheServiceError when Redis is down."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.set = mocker.AsyncMock(side_effect=ConnectionError())
+    mock_redis_client.register_script.return_value = mocker.AsyncMock(
+        side_effect=ConnectionError())
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    with pytest.raises(CacheServiceError, match=CacheMessages.REDIS_CONN_FAIL):
+        await service.acquire_lease(30)
+    with pytest.raises(CacheServiceError, match=CacheMessages.REDIS_CONN_FAIL):
+        await service.release_lease("token")
+
+@pytest.mark.asyncio
+async def test_cachesvc_release_lease(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test release_lease() runs the compare-and-delete script."""
+    mock_redis_client = mocker.Mock()
+    mock_script = mocker.AsyncMock(return_value=1)
+    mock_redis_client.register_script.return_value = mock_script
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    await service.release_lease("token")
+    mock_script.assert_awaited_once_with(keys=[service.lease_tag], args=["token"])
+
+
+def test_localcache_get_set_expiry(mocker: Callable[..., Generator[MockerFixture, None, None]]):
+    """Test LocalCache serves entries until their TTL elapses."""
+    clock = mocker.patch("hivebox.cache.time.monotonic", return_value=100.0)
+    local = LocalCache(maxsize=4, ttl=10)
+    local.set("temp:latest", "value")
+    assert local.get("temp:latest") == "value"
+    clock.return_value = 110.0
+    assert local.get("temp:latest") is None
+    assert "temp:latest" not in local.entries
+
+def test_localcache_evicts_least_recently_used():
+    """Test LocalCache stays within maxsize by evicting the oldest entry."""
+    local = LocalCache(maxsize=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+    assert local.get("a") == 1
+    assert local.get("b") is None
+    assert local.get("c") == 3
+
+def test_localcache_disabled_and_invalidate():
+    """Test a zero TTL disables storage and invalidate() clears entries."""
+    disabled = LocalCache(ttl=0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+    local = LocalCache()
+    local.set("a", 1)
+    local.set("b", 2)
+    local.invalidate("a")
+    assert local.get("a") is None and local.get("b") == 2
+    local.invalidate()
+    assert not local.entries
+
+@pytest.mark.asyncio
+async def test_cachesvc_fetch_local_hit(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_serialized_cache_data,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test repeated fetch() calls are served from L1 without Redis."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.get = mocker.AsyncMock(return_value=mock_serialized_cache_data)
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    first = await service.fetch(allow_stale=True)
+    second = await service.fetch(allow_stale=True)
+    assert first is second
+    mock_redis_client.get.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_cachesvc_fetch_cached_body(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_serialized_cache_data,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test fetch_cached() keeps the stored JSON as the response body."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.get = mocker.AsyncMock(return_value=mock_serialized_cache_data)
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    cache = await service.fetch_cached(allow_stale=True)
+    assert cache.body == mock_serialized_cache_data.encode()
+    assert cache.result.timestamp == 1747774970
+    assert await service.fetch_cached(allow_stale=True) is cache
+
+@pytest.mark.asyncio
+async def test_cachesvc_update_pipelined(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_deserialized_cache_data: TemperatureResult,
+    mock_sensor_readings,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test update() writes aggregate and readings with expiry and notifies replicas in one round-trip."""
+    mock_pipe = mocker.Mock()
+    mock_pipe.execute = mocker.AsyncMock(return_value=[])
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.pipeline.return_value = mock_pipe
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    await service.update(mock_deserialized_cache_data, mock_sensor_readings)
+
+    mock_redis_client.pipeline.assert_called_once_with(transaction=False)
+    mock_pipe.execute.assert_awaited_once()
+    aggregate_expiry = (1747774970 + service.max_age + service.stale_ttl) * 1000
+    mock_pipe.set.assert_any_call(
+        service.tag, mock_deserialized_cache_data.model_dump_json(), pxat=aggregate_expiry)
+    reading_call = mock_pipe.set.call_args_list[1]
+    assert reading_call.args[0] == "{hivebox}:sensor:tempSensor01"
+    assert reading_call.kwargs["pxat"] == (1747774800 + service.max_age) * 1000
+    assert mock_pipe.set.call_count == 1 + len(mock_sensor_readings)
+    mock_pipe.xadd.assert_called_once_with(
+        service.history_tag, {"value": 14.8, "status": "Good", "timestamp": 1747774970},
+        maxlen=service.history_maxlen, approximate=True)
+    mock_pipe.publish.assert_any_call(
+        service.channel, f"{service.instance_id} {service.tag}")
+    mock_pipe.publish.assert_any_call(
+        service.updates_channel, mock_deserialized_cache_data.model_dump_json())
+    cached = service.local.get(service.tag)
+    assert cached.result is mock_deserialized_cache_data
+    assert cached.body == mock_deserialized_cache_data.model_dump_json().encode()
+
+@pytest.mark.asyncio
+async def test_cachesvc_update_region(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_deserialized_cache_data: TemperatureResult,
+    mock_sensor_readings,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test update_region() caches a region for its TTL only, then serves it from L1."""
+    mock_pipe = mocker.Mock()
+    mock_pipe.execute = mocker.AsyncMock(return_value=[])
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.pipeline.return_value = mock_pipe
+    mock_redis_client.get = mocker.AsyncMock()
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    key = service.region_key("bbox:7,51,8,52")
+
+    cache = await service.update_region(key, mock_deserialized_cache_data, 120,
+                                        mock_sensor_readings)
+
+    assert key == "hivebox:temp:region:bbox:7,51,8,52"
+    mock_pipe.set.assert_any_call(
+        key, mock_deserialized_cache_data.model_dump_json(), pxat=(1747774970 + 120) * 1000)
+    assert mock_pipe.set.call_count == 1 + len(mock_sensor_readings)
+    mock_pipe.xadd.assert_not_called()
+    mock_pipe.publish.assert_called_once_with(service.channel, f"{service.instance_id} {key}")
+    assert await service.fetch_cached(allow_stale=True, key=key) == cache
+    assert service.local.get(service.tag) is None
+    mock_redis_client.get.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_cachesvc_update_connection_error(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_deserialized_cache_data: TemperatureResult,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test update() raises CacheServiceError and leaves L1 untouched when Redis is down."""
+    mock_pipe = mocker.Mock()
+    mock_pipe.execute = mocker.AsyncMock(side_effect=ConnectionError())
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.pipeline.return_value = mock_pipe
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    with pytest.raises(CacheServiceError, match=CacheMessages.REDIS_CONN_FAIL):
+        await service.update(mock_deserialized_cache_data)
+    assert service.breaker.failures == 1
+    assert service.local.get(service.tag) is None
+
+@pytest.mark.asyncio
+async def test_cachesvc_circuit_fast_fails(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test repeated failures open the circuit so later calls skip Redis."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.get = mocker.AsyncMock(side_effect=TimeoutError())
+    mock_redis_client.ping = mocker.AsyncMock(side_effect=ConnectionError())
+    mock_redis_client.connection_pool.disconnect = mocker.AsyncMock()
+    mock_redis_client.aclose = mocker.AsyncMock()
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config,
+                           breaker=CircuitBreaker(failure_threshold=2, base_delay=60))
+
+    for _ in range(2):
+        with pytest.raises(CacheServiceError, match=CacheMessages.REDIS_CONN_FAIL):
+            await service.fetch()
+    assert service.breaker.state == CircuitState.OPEN
+    assert service.prober is not None
+
+    with pytest.raises(CacheServiceError, match=CacheMessages.CIRCUIT_OPEN):
+        await service.fetch()
+    assert mock_redis_client.get.await_count == 2
+
+    await service.close()
+    assert service.prober is None
+    mock_redis_client.aclose.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_cachesvc_probe_closes_circuit(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+    capfd: pytest.CaptureFixture[str]
+):
+    """Test the health probe retries with backoff and closes the circuit once Redis answers."""
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.ping = mocker.AsyncMock(side_effect=[ConnectionError(), True])
+    mock_redis_client.connection_pool.disconnect = mocker.AsyncMock()
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config,
+                           breaker=CircuitBreaker(base_delay=0.01, max_delay=0.01))
+    service.breaker._open()
+
+    await asyncio.wait_for(service.probe(), timeout=1)
+
+    assert service.breaker.state == CircuitState.CLOSED
+    assert mock_redis_client.ping.await_count == 2
+    mock_redis_client.connection_pool.disconnect.assert_awaited_once()
+    out, _err = capfd.readouterr()
+    assert CacheMessages.REDIS_CONN_SUCCESS in out
+
+@pytest.mark.asyncio
+async def test_cachesvc_fetch_readings_mget(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_sensor_readings,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test fetch_readings() reads every sensor key in one MGET and skips missing ones."""
+    first = mock_sensor_readings[0]
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.mget = mocker.AsyncMock(
+        return_value=[_dump_reading(first), None, "not json"])
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    readings = await service.fetch_readings(["tempSensor01", "tempSensor02", "tempSensor03"])
+
+    mock_redis_client.mget.assert_awaited_once_with([
+        "{hivebox}:sensor:tempSensor01",
+        "{hivebox}:sensor:tempSensor02",
+        "{hivebox}:sensor:tempSensor03"])
+    assert readings == {"tempSensor01": first}
+    assert await service.fetch_readings([]) == {}
+
+@pytest.mark.asyncio
+async def test_cachesvc_invalidation_from_peer_only(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_deserialized_cache_data: TemperatureResult,
+):
+    """Test peers' invalidations drop L1 entries while our own are ignored."""
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    service.local.set(service.tag, mock_deserialized_cache_data)
+
+    service._on_invalidate(f"{service.instance_id} {service.tag}")
+    assert service.local.get(service.tag) is mock_deserialized_cache_data
+
+    service._on_invalidate(f"peer {service.tag}".encode())
+    assert service.local.get(service.tag) is None
+
+@pytest.mark.asyncio
+async def test_cachesvc_listener_invalidates(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_deserialized_cache_data: TemperatureResult,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test the background listener applies messages from the channel."""
+    delivered = asyncio.Event()
+
+    async def listen():
+        yield {"type": "subscribe", "data": 1}
+        yield {"type": "message", "channel": "hivebox:invalidate",
+               "data": "peer hivebox:temp:latest"}
+        delivered.set()
+        await asyncio.Event().wait()
+
+    mock_pubsub = mocker.Mock()
+    mock_pubsub.subscribe = mocker.AsyncMock()
+    mock_pubsub.aclose = mocker.AsyncMock()
+    mock_pubsub.listen = listen
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.pubsub.return_value = mock_pubsub
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    service.local.set(service.tag, mock_deserialized_cache_data)
+
+    service.start_listener()
+    await asyncio.wait_for(delivered.wait(), timeout=1)
+    await service.stop_listener()
+
+    mock_pubsub.subscribe.assert_awaited_once_with(service.channel, service.updates_channel)
+    mock_pubsub.aclose.assert_awaited_once()
+    assert service.local.get(service.tag) is None
+    assert service.listener is None
+
+@pytest.mark.asyncio
+async def test_cachesvc_listener_relays_updates(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_serialized_cache_data,
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test published results refresh L1 and reach local subscribers."""
+    delivered = asyncio.Event()
+
+    async def listen():
+        yield {"type": "message", "channel": b"hivebox:updates", "data": "{broken"}
+        yield {"type": "message", "channel": b"hivebox:updates",
+               "data": mock_serialized_cache_data.encode()}
+        delivered.set()
+        await asyncio.Event().wait()
+
+    mock_pubsub = mocker.Mock()
+    mock_pubsub.subscribe = mocker.AsyncMock()
+    mock_pubsub.aclose = mocker.AsyncMock()
+    mock_pubsub.listen = listen
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.pubsub.return_value = mock_pubsub
+    mock_redis_client.aclose = mocker.AsyncMock()
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+
+    with service.broadcaster.subscribe() as queue:
+        service.start_listener()
+        await asyncio.wait_for(delivered.wait(), timeout=1)
+        assert queue.get_nowait() == mock_serialized_cache_data
+        assert service.local.get(service.tag).result.value == 14.8
+
+        await service.close()
+        assert queue.get_nowait() is None
+
+@pytest.mark.asyncio
+async def test_cachesvc_metrics(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]],
+):
+    """Test Redis commands are timed by name and errors counted by kind."""
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    async def get(key):
+        return "{broken"
+
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.get = get
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    gets = sample("hivebox_redis_command_seconds_count", command="get")
+    invalid = sample("hivebox_cache_errors_total", kind="cache_invalid")
+
+    with pytest.raises(CacheServiceError, match=CacheMessages.CACHE_INVALID):
+        await service.fetch()
+
+    assert sample("hivebox_redis_command_seconds_count", command="get") == gets + 1
+    assert sample("hivebox_cache_errors_total", kind="cache_invalid") == invalid + 1
+
+def test_cachesvc_sentinel_topology(
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]]
+):
+    """Test sentinel mode writes to the primary and reads from a replica."""
+    sentinel_cls = mocker.patch("hivebox.cache.Sentinel")
+    sentinel = sentinel_cls.return_value
+    topology = {"mode": "sentinel", "sentinels": ["s1:26379", "s2:26380"],
+                "service_name": "hivebox", "read_from_replicas": True}
+    service = CacheService("redis://:secret@ignored:6379/2",
+                           {**mock_redis_config, "max_connections": None}, topology=topology)
+
+    sentinel_cls.assert_called_once_with(
+        [("s1", 26379), ("s2", 26380)], db=2, password="secret", **mock_redis_config)
+    sentinel.master_for.assert_called_once_with("hivebox")
+    sentinel.slave_for.assert_called_once_with("hivebox")
+    assert service.client is sentinel.master_for.return_value
+    assert service.reader is sentinel.slave_for.return_value
+    assert service.subscriber is service.client
+
+@pytest.mark.asyncio
+async def test_cachesvc_cluster_topology(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_sensor_readings,
+    mocker: Callable[..., Generator[MockerFixture, None, None]]
+):
+    """Test update() and fetch_readings() work with a real cluster client."""
+    service = CacheService(mock_redis_dsn, mock_redis_config,
+                           topology={"mode": "cluster", "read_from_replicas": False})
+    assert isinstance(service.client, RedisCluster) and service.reader is service.client
+    assert not isinstance(service.subscriber, RedisCluster)
+    assert service.client.load_balancing_strategy is None
+    replicas = CacheService(mock_redis_dsn, mock_redis_config,
+                            topology={"mode": "cluster", "read_from_replicas": True})
+    assert replicas.client.load_balancing_strategy is LoadBalancingStrategy.ROUND_ROBIN
+    execute = mocker.patch.object(ClusterPipeline, "execute", mocker.AsyncMock(return_value=[]))
+    publish = mocker.patch.object(service.subscriber, "publish", mocker.AsyncMock())
+
+    # A cluster pipeline refuses PUBLISH, so it must go through the subscriber.
+    await service.update(TemperatureResult(value=14.8, status="Good", timestamp=1747774970),
+                         mock_sensor_readings)
+    execute.assert_awaited_once()
+    assert [c.args[0] for c in publish.await_args_list] == [
+        service.channel, service.updates_channel]
+
+    mget = mocker.patch.object(RedisCluster, "mget_nonatomic",
+                               mocker.AsyncMock(return_value=[_dump_reading(mock_sensor_readings[0]), None]))
+    readings = await service.fetch_readings(["tempSensor01", "tempSensor02"])
+    assert list(readings) == ["tempSensor01"]
+    keys = mget.await_args.args[0]
+    assert len({key_slot(key.encode()) for key in keys}) == 1
+
+@pytest.mark.asyncio
+async def test_cachesvc_call_command_error(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]]
+):
+    """Test a command Redis rejects fails the call without opening the circuit."""
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    service.breaker.failure_threshold = 1
+    rejected = mocker.AsyncMock(side_effect=ResponseError("CROSSSLOT"))
+
+    with pytest.raises(CacheServiceError, match=CacheMessages.REDIS_COMMAND_FAIL):
+        await service.call(rejected)
+    assert service.breaker.state == CircuitState.CLOSED
+
+def test_cachesvc_unknown_topology(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any]
+):
+    """Test an unknown topology is rejected."""
+    with pytest.raises(ValueError):
+        CacheService(mock_redis_dsn, mock_redis_config, topology={"mode": "ring"})
+
+@pytest.mark.asyncio
+async def test_cachesvc_reads_from_replica(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mock_serialized_cache_data,
+    mocker: Callable[..., Generator[MockerFixture, None, None]]
+):
+    """Test fetch() goes to the reader while update() goes to the primary."""
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    service.client = mocker.Mock()
+    service.client.pipeline.return_value.execute = mocker.AsyncMock()
+    service.reader = mocker.Mock()
+    service.reader.get = mocker.AsyncMock(return_value=mock_serialized_cache_data)
+
+    result = await service.fetch(allow_stale=True)
+    service.reader.get.assert_awaited_once_with(service.tag)
+    await service.update(result)
+    service.client.pipeline.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_cachesvc_take_tokens(
+    mock_redis_dsn: Literal['redis://127.0.0.0:6379/0'],
+    mock_redis_config: dict[str, Any],
+    mocker: Callable[..., Generator[MockerFixture, None, None]]
+):
+    """Test take_tokens() runs the bucket script and converts the wait to seconds."""
+    script = mocker.AsyncMock(side_effect=[[3, 0], [0, 250]])
+    mock_redis_client = mocker.Mock()
+    mock_redis_client.register_script.return_value = script
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=mock_redis_client)
+    service = CacheService(mock_redis_dsn, mock_redis_config)
+    key = service.bucket_key("upstream")
+
+    assert await service.take_tokens(key, 2.5, 10, 5) == (3, 0.0)
+    assert await service.take_tokens(key, 2.5, 10, 5) == (0, 0.25)
+    script.assert_awaited_with(keys=["hivebox:ratelimit:upstream"], args=[2.5, 10, 5])
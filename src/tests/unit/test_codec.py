@@ -0,0 +1,119 @@
+"""Test suite for the JSON codec module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+
+import hivebox.codec
+from hivebox.codec import (
+    DECODE_ERRORS,
+    FastJSONResponse,
+    dumps,
+    load_measurement,
+    loads,
+    parse_timestamp
+)
+
+
+@pytest.fixture(params=["msgspec", "orjson", "json"])
+def backend(request, monkeypatch):
+    """Run each test against msgspec, orjson and the stdlib fallback."""
+    if request.param == "msgspec":
+        pytest.importorskip("msgspec")
+        return request.param
+    monkeypatch.setattr(hivebox.codec, "msgspec", None)
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(hivebox.codec, "orjson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("2025-05-20T21:00:00.000Z", datetime(2025, 5, 20, 21, 0, tzinfo=timezone.utc)),
+    ("2025-05-20T21:00:00.123Z",
+     datetime(2025, 5, 20, 21, 0, 0, 123000, tzinfo=timezone.utc)),
+    ("2025-05-20T21:00:00Z", datetime(2025, 5, 20, 21, 0, tzinfo=timezone.utc)),
+    ("2025-05-20T21:00:00", datetime(2025, 5, 20, 21, 0, tzinfo=timezone.utc)),
+    ("2025-05-20T23:00:00+02:00",
+     datetime(2025, 5, 20, 23, 0, tzinfo=timezone(timedelta(hours=2)))),
+    ("2025-05-20T21:00:00.123456+00:00",
+     datetime(2025, 5, 20, 21, 0, 0, 123456, tzinfo=timezone.utc)),
+])
+def test_parse_timestamp(value, expected):
+    """Test the openSenseMap form is parsed directly and other ISO forms still work."""
+    assert parse_timestamp(value) == expected
+    assert parse_timestamp(value).tzinfo is not None
+
+
+@pytest.mark.parametrize("value", ["2025-13-20T21:00:00.000Z", "2025-05-20Tab:00:00.000Z",
+                                   "yesterday", ""])
+def test_parse_timestamp_invalid(value):
+    """Test malformed timestamps are rejected."""
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
+
+
+def test_load_measurement(backend):
+    """Test only the last measurement's value and time are extracted."""
+    payload = json.dumps({
+        "_id": "tempSensor01", "title": "Temperatur", "unit": "°C",
+        "lastMeasurement": {"createdAt": "2025-05-20T21:00:00.000Z", "value": "15.5"},
+        "icon": "osem-thermometer",
+    }).encode()
+
+    assert load_measurement(payload) == (
+        15.5, datetime(2025, 5, 20, 21, 0, tzinfo=timezone.utc))
+
+
+@pytest.mark.parametrize("payload", [
+    b"{invalid",
+    b'{"title": "Temperatur"}',
+    b'{"lastMeasurement": null}',
+    b'{"lastMeasurement": {"createdAt": "2025-05-20T21:00:00.000Z"}}',
+    b'{"lastMeasurement": {"createdAt": "2025-05-20T21:00:00.000Z", "value": "warm"}}',
+    b'{"lastMeasurement": {"createdAt": 5, "value": "15.5"}}',
+    b'[]',
+])
+def test_load_measurement_invalid(backend, payload):
+    """Test malformed payloads raise one of DECODE_ERRORS with every backend."""
+    with pytest.raises(DECODE_ERRORS):
+        load_measurement(payload)
+
+
+@pytest.mark.parametrize("value", ["NaN", "nan", "inf", "-Infinity"])
+def test_load_measurement_non_finite(backend, value):
+    """Test non-finite values are rejected like any other malformed payload."""
+    payload = json.dumps({"lastMeasurement": {"createdAt": "2025-05-20T21:00:00.000Z",
+                                              "value": value}}).encode()
+    with pytest.raises(ValueError, match="Non-finite"):
+        load_measurement(payload)
+
+
+def test_dumps_round_trip(backend):
+    """Test compact UTF-8 output that loads back unchanged."""
+    data = {"status": "Too Cold", "unit": "°C", "value": 9.5, "ok": True}
+    encoded = dumps(data)
+
+    assert isinstance(encoded, bytes)
+    assert b" " not in encoded.replace(b"Too Cold", b"")
+    assert loads(encoded) == data
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf")])
+def test_dumps_never_writes_nan(backend, value):
+    """Test non-finite floats never produce the non-standard NaN or Infinity tokens."""
+    if backend == "json":
+        with pytest.raises(ValueError):
+            dumps({"value": value})
+    else:
+        assert dumps({"value": value}) == b'{"value":null}'
+
+
+def test_fast_json_response(backend):
+    """Test the response class renders with the codec."""
+    response = FastJSONResponse({"status": "ready", "warm": True})
+    assert response.body == b'{"status":"ready","warm":true}'
+    assert response.headers["content-type"] == "application/json"
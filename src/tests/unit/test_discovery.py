@@ -0,0 +1,241 @@
+"""Test suite for the senseBox DiscoveryService module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import asyncio
+import time
+import httpx
+import pytest
+
+from hivebox.cache import CacheServiceError
+from hivebox.discovery import (
+    BoxCatalog,
+    BoxEntry,
+    DiscoveryError,
+    DiscoveryService,
+    find_temperature_sensor
+)
+from hivebox.geo import GeoIndex, Region
+from hivebox.ratelimit import RateLimitedError
+from hivebox.region import RegionService
+from hivebox.temperature import TemperatureService
+from tests.fixtures.cache_fixtures import mock_cache_svc
+from tests.fixtures.temperature_fixtures import mock_sensor_data
+
+
+def _box(box_id, sensors, location=(7.62, 51.96)):
+    return {"_id": box_id, "currentLocation": {"coordinates": [*location, 60]},
+            "sensors": [{"_id": f"{box_id}-{i}", "title": title, "unit": unit}
+                        for i, (title, unit) in enumerate(sensors)]}
+
+
+@pytest.fixture
+def mock_boxes():
+    """Return box metadata as served by openSenseMap's /boxes endpoints."""
+    return {
+        "senseBox01": _box("senseBox01", [("rel. Luftfeuchte", "%"), ("Temperatur", "°C")]),
+        "senseBox02": _box("senseBox02", [("Bodentemp", "°C")], (13.4, 52.52)),
+        "senseBox03": _box("senseBox03", [("PM10", "µg/m³")]),
+    }
+
+
+@pytest.fixture
+def mock_box_transport(mock_boxes):
+    """Return a transport serving box metadata and recording requested URLs."""
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        if request.url.path == "/boxes":
+            return httpx.Response(200, json=list(mock_boxes.values()))
+        box = mock_boxes.get(request.url.path.rsplit("/", 1)[-1])
+        if box is None:
+            return httpx.Response(404, json={"message": "Box not found"})
+        return httpx.Response(200, json=box)
+
+    transport = httpx.MockTransport(handler)
+    transport.requests = requests
+    return transport
+
+
+@pytest.fixture
+def discovery(mock_sensor_data, mock_cache_svc, mock_box_transport):
+    """Return a DiscoveryService resolving the fixture boxes plus an unknown one."""
+    temp_svc = TemperatureService(mock_sensor_data)
+    region_svc = RegionService(temp_svc, mock_cache_svc, GeoIndex())
+    return DiscoveryService(temp_svc, mock_cache_svc,
+                            httpx.AsyncClient(transport=mock_box_transport),
+                            boxes=[*mock_sensor_data, "senseBox04"], region_svc=region_svc)
+
+
+@pytest.mark.parametrize("sensors,expected", [
+    ([("Temperatur", "°C")], 0),
+    ([("Bodentemp", "°C"), ("temperature", " °C ")], 1),
+    ([("Bodentemp", "°C")], 0),
+    ([("Temperatur", "°F")], None),
+    ([("PM2.5", "µg/m³")], None),
+    ([], None),
+])
+def test_find_temperature_sensor(sensors, expected):
+    """Test the phenomenon is matched by title and unit, preferring exact titles."""
+    sensor_id = find_temperature_sensor(_box("box", sensors))
+    assert sensor_id == (None if expected is None else f"box-{expected}")
+
+
+@pytest.mark.asyncio
+async def test_discover_boxes(discovery, mock_box_transport, capfd):
+    """Test listed boxes are resolved one request each, skipping those without sensors."""
+    catalog = await discovery.discover()
+
+    assert catalog.sensor_data() == {"senseBox01": "senseBox01-1",
+                                     "senseBox02": "senseBox02-0"}
+    assert catalog.locations()["senseBox02"] == (13.4, 52.52)
+    assert len(mock_box_transport.requests) == 4
+    out, _err = capfd.readouterr()
+    assert "Discovered 2 of 3 senseBoxes" in out
+    assert "Discovery error" in out
+
+
+@pytest.mark.asyncio
+async def test_discover_bbox(discovery, mock_box_transport):
+    """Test a bbox is discovered with a single listing filtered by phenomenon."""
+    discovery.bbox = "7,51,14,53"
+    catalog = await discovery.discover()
+
+    assert set(catalog.boxes) == {"senseBox01", "senseBox02"}
+    [url] = mock_box_transport.requests
+    assert url.path == "/boxes"
+    assert url.params["bbox"] == "7,51,14,53"
+    assert url.params["phenomenon"] == "Temperatur"
+
+
+@pytest.mark.asyncio
+async def test_discover_nothing_found(discovery):
+    """Test an empty catalog is an error instead of dropping every sensor."""
+    discovery.boxes = ["senseBox03"]
+    with pytest.raises(DiscoveryError):
+        await discovery.discover()
+
+
+@pytest.mark.asyncio
+async def test_refresh_discovers_stores_and_applies(discovery, mock_cache_svc):
+    """Test a missing catalog is discovered, stored and applied to the services."""
+    catalog = await discovery.refresh()
+
+    assert BoxCatalog.model_validate_json(mock_cache_svc.store["catalog"]) == catalog
+    assert discovery.temp_svc.sensor_data == catalog.sensor_data()
+    assert discovery.region_svc.sensors(Region.circle(52.52, 13.4, 5)) == {
+        "senseBox02": "senseBox02-0"}
+
+
+@pytest.mark.asyncio
+async def test_refresh_uses_fresh_catalog(discovery, mock_cache_svc, mock_box_transport):
+    """Test a cached catalog within its interval is applied without calling upstream."""
+    cached = BoxCatalog(timestamp=int(time.time()) - 60,
+                        boxes={"box": BoxEntry(sensor_id="sensor")})
+    mock_cache_svc.store["catalog"] = cached.model_dump_json()
+
+    assert await discovery.refresh() == cached
+    assert discovery.temp_svc.sensor_data == {"box": "sensor"}
+    assert not mock_box_transport.requests
+
+
+@pytest.mark.asyncio
+async def test_refresh_follower_never_discovers(discovery, mock_box_transport,
+                                                mock_sensor_data):
+    """Test a non-discovering instance keeps its sensors until a catalog is stored."""
+    discovery.discover_here = False
+
+    assert await discovery.refresh() is None
+    assert discovery.temp_svc.sensor_data == mock_sensor_data
+    assert not mock_box_transport.requests
+
+
+@pytest.mark.asyncio
+async def test_refresh_without_redis(discovery, mock_cache_svc, capfd):
+    """Test discovery still applies its catalog when Redis is down."""
+    mock_cache_svc.call.side_effect = CacheServiceError("down")
+    mock_cache_svc.acquire_lease.side_effect = CacheServiceError("down")
+
+    catalog = await discovery.refresh()
+
+    assert discovery.temp_svc.sensor_data == catalog.sensor_data()
+    out, _err = capfd.readouterr()
+    assert "Catalog fetch error" in out and "Catalog update error" in out
+
+
+@pytest.mark.asyncio
+async def test_refresh_holds_catalog_lease(discovery, mock_cache_svc):
+    """Test discovery runs under the catalog lease and releases it afterwards."""
+    await discovery.refresh()
+
+    mock_cache_svc.acquire_lease.assert_awaited_once_with(600, "lease:catalog")
+    mock_cache_svc.release_lease.assert_awaited_once_with("token", "lease:catalog")
+
+
+@pytest.mark.asyncio
+async def test_refresh_lease_held_elsewhere(discovery, mock_cache_svc, mock_box_transport,
+                                            mock_sensor_data):
+    """Test a replica leaves discovery to the one holding the catalog lease."""
+    mock_cache_svc.acquire_lease.return_value = None
+
+    assert await discovery.refresh() is None
+    assert discovery.temp_svc.sensor_data == mock_sensor_data
+    assert not mock_box_transport.requests
+    mock_cache_svc.release_lease.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_discover_through_limiter(discovery, mocker, mock_box_transport):
+    """Test every upstream request takes a token from the rate limiter first."""
+    discovery.temp_svc.limiter = mocker.Mock(acquire=mocker.AsyncMock())
+
+    await discovery.discover()
+
+    assert discovery.temp_svc.limiter.acquire.await_count == len(mock_box_transport.requests)
+
+
+@pytest.mark.asyncio
+async def test_discover_rate_limited(discovery, mocker, mock_box_transport):
+    """Test a request the limiter rejects is skipped like a failed one."""
+    discovery.temp_svc.limiter = mocker.Mock(
+        acquire=mocker.AsyncMock(side_effect=RateLimitedError("no token")))
+
+    with pytest.raises(DiscoveryError):
+        await discovery.discover()
+    assert not mock_box_transport.requests
+
+
+@pytest.mark.asyncio
+async def test_discover_configured_phenomenon(discovery, mock_boxes):
+    """Test the configured phenomenon names the sensor ahead of any fallback."""
+    mock_boxes["senseBox04"] = _box("senseBox04", [("Boden Temp", "°C"), ("Lufttemp 2m", "°C")])
+    discovery = DiscoveryService(discovery.temp_svc, discovery.cache_svc, discovery.client,
+                                 boxes=["senseBox04"], phenomenon=" Lufttemp 2m")
+
+    catalog = await discovery.discover()
+
+    assert catalog.boxes["senseBox04"].sensor_id == "senseBox04-1"
+
+
+@pytest.mark.asyncio
+async def test_run_survives_unexpected_errors(mocker, discovery, capsys):
+    """Test an unexpected exception is logged and the reload loop keeps going."""
+    reloaded = asyncio.Event()
+    outcomes = iter([ValueError("bug")])
+
+    async def refresh():
+        outcome = next(outcomes, None)
+        if outcome is not None:
+            raise outcome
+        reloaded.set()
+
+    mocker.patch.object(discovery, "refresh", side_effect=refresh)
+    discovery.reload_interval = 0
+    discovery.start()
+    await asyncio.wait_for(reloaded.wait(), timeout=1)
+    assert discovery.running
+    await discovery.stop()
+
+    assert not discovery.running
+    assert "Unexpected discovery error: ValueError('bug')" in capsys.readouterr().out
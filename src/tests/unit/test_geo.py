@@ -0,0 +1,120 @@
+"""Test suite for the geo index module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import random
+import time
+import pytest
+
+from hivebox import load_box_locations
+from hivebox.geo import GeoIndex, Region, haversine
+
+
+@pytest.fixture
+def mock_locations():
+    """Return box locations as [lon, lat]."""
+    return {
+        "muenster": (7.6261, 51.9607),
+        "berlin": (13.4050, 52.5200),
+        "fiji": (179.9, -17.8),
+        "samoa": (-179.9, -13.8),
+    }
+
+
+def test_haversine():
+    """Test distances match known great-circle values."""
+    assert haversine(51.9607, 7.6261, 52.5200, 13.4050) == pytest.approx(397, abs=2)
+    assert haversine(0, 0, 0, 0) == 0
+
+
+def test_search_bbox(mock_locations):
+    """Test a bounding box finds only the boxes inside it."""
+    index = GeoIndex(mock_locations)
+    assert index.search(Region.bbox(5, 50, 10, 53)) == ["muenster"]
+    assert sorted(index.search(Region.bbox(5, 50, 15, 53))) == ["berlin", "muenster"]
+
+
+def test_search_bbox_antimeridian(mock_locations):
+    """Test a box whose west edge is east of its east edge wraps around."""
+    index = GeoIndex(mock_locations)
+    assert sorted(index.search(Region.bbox(179, -20, -179, -10))) == ["fiji", "samoa"]
+
+
+def test_search_circle(mock_locations):
+    """Test a radius search is exact, not just the enclosing cells."""
+    index = GeoIndex(mock_locations)
+    assert index.search(Region.circle(52.5, 13.4, 10)) == ["berlin"]
+    assert sorted(index.search(Region.circle(52.2, 10.5, 250))) == ["berlin", "muenster"]
+    assert sorted(index.search(Region.circle(52.2, 10.5, 150))) == []
+
+
+def test_search_circle_over_pole():
+    """Test a circle reaching a pole covers every longitude."""
+    index = GeoIndex({"north": (-120.0, 89.5), "south": (60.0, 85.0)})
+    region = Region.circle(89.9, 0, 600)
+    assert (region.min_lon, region.max_lon) == (-180.0, 180.0)
+    assert sorted(index.search(region)) == ["north", "south"]
+
+
+def test_region_validation():
+    """Test out of range regions are rejected."""
+    with pytest.raises(ValueError):
+        Region.bbox(0, 10, 1, 5)
+    with pytest.raises(ValueError):
+        Region.bbox(-200, 0, 0, 1)
+    with pytest.raises(ValueError):
+        Region.circle(91, 0, 10)
+    with pytest.raises(ValueError):
+        Region.circle(0, 0, 0)
+
+
+def test_region_key_is_rounded():
+    """Test nearly identical regions share a cache key."""
+    assert Region.circle(51.96071, 7.62612, 10).key == Region.circle(51.96069, 7.6261, 10).key
+    assert Region.bbox(5, 50, 10, 53).key == "bbox:5,50,10,53"
+
+
+def test_add_replaces_location(mock_locations):
+    """Test re-adding a box moves it and remove() drops empty cells."""
+    index = GeoIndex(mock_locations)
+    index.add("muenster", 0.0, 0.0)
+    assert index.search(Region.bbox(5, 50, 10, 53)) == []
+    assert len(index) == 4
+    index.remove("muenster")
+    assert len(index) == 3
+    assert index.search(Region.circle(0, 0, 1)) == []
+
+
+def test_search_wide_region_walks_populated_cells(mock_locations):
+    """Test a region spanning more cells than are populated still finds all boxes."""
+    index = GeoIndex(mock_locations, cell_size=0.1)
+    assert len(index.search(Region.bbox(-180, -90, 180, 90))) == 4
+
+
+def test_search_is_fast_with_many_boxes():
+    """Test a city-sized lookup among 50k boxes stays well under a millisecond."""
+    rng = random.Random(0)
+    index = GeoIndex({f"box{i}": (rng.uniform(-180, 180), rng.uniform(-60, 70))
+                      for i in range(50_000)})
+    region = Region.circle(51.96, 7.63, 25)
+    best = min(_timed(index.search, region) for _ in range(20))
+    assert best < 0.001
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def test_load_box_locations(tmp_path):
+    """Test locations are read as GeoJSON [lon, lat] pairs and validated."""
+    path = tmp_path / "locations.json"
+    path.write_text('{"box1": [7.6, 51.9], "box2": [13.4, 52.5, 34]}')
+    assert load_box_locations(path) == {"box1": (7.6, 51.9), "box2": (13.4, 52.5)}
+    path.write_text('{"box1": [7.6, 151.9]}')
+    with pytest.raises(ValueError):
+        load_box_locations(path)
+    path.write_text('{"box1": "nowhere"}')
+    with pytest.raises(ValueError):
+        load_box_locations(path)
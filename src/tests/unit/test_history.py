@@ -0,0 +1,85 @@
+"""Test suite for HistoryService module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from hivebox.cache import CacheMessages, CacheService, CacheServiceError
+from hivebox.history import HistoryService, TemperatureHistory
+from tests.fixtures.cache_fixtures import mock_redis_dsn, mock_redis_config
+
+
+@pytest.fixture
+def mock_history_client(mocker):
+    """Return a Redis client mock whose history stream holds 1-minute points."""
+    entries = [
+        (f"{(1000 + minute * 60) * 1000}-0",
+         {"value": str(10.0 + minute), "status": "Good", "timestamp": str(1000 + minute * 60)})
+        for minute in range(6)
+    ]
+
+    async def xrange(_key, min, max, count):  # pylint: disable=redefined-builtin
+        exclusive = min.startswith("(")
+        low = min.lstrip("(")
+        selected = [
+            e for e in entries
+            if (e[0] > low if exclusive else int(e[0].split("-")[0]) >= int(low))
+            and int(e[0].split("-")[0]) <= int(max)
+        ]
+        return selected[:count]
+
+    client = mocker.Mock()
+    client.xrange = mocker.AsyncMock(side_effect=xrange)
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=client)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_history_query_buckets(mock_redis_dsn, mock_redis_config, mock_history_client):
+    """Test points are folded into min/avg/max buckets of the requested step."""
+    cache_svc = CacheService(mock_redis_dsn, mock_redis_config)
+    service = HistoryService(cache_svc)
+
+    history = await service.query(1000, 1360, 180)
+
+    assert isinstance(history, TemperatureHistory)
+    assert [(b.start, b.min, b.avg, b.max, b.count) for b in history.buckets] == [
+        (1000, 10.0, 11.0, 12.0, 3),
+        (1180, 13.0, 14.0, 15.0, 3),
+    ]
+    mock_history_client.xrange.assert_awaited_once_with(
+        cache_svc.history_tag, min="1000000", max="1359999", count=1000)
+
+
+@pytest.mark.asyncio
+async def test_history_query_reads_in_chunks(mock_redis_dsn, mock_redis_config,
+                                             mock_history_client):
+    """Test long ranges are paged with exclusive cursors instead of one large read."""
+    service = HistoryService(CacheService(mock_redis_dsn, mock_redis_config), chunk=2)
+
+    history = await service.query(1000, 1360, 60)
+
+    assert [b.count for b in history.buckets] == [1] * 6
+    assert mock_history_client.xrange.await_count == 4
+    assert mock_history_client.xrange.await_args_list[1].kwargs["min"] == "(1060000-0"
+
+
+@pytest.mark.asyncio
+async def test_history_query_empty_range(mock_redis_dsn, mock_redis_config, mock_history_client):
+    """Test a range without points returns no buckets."""
+    service = HistoryService(CacheService(mock_redis_dsn, mock_redis_config))
+    history = await service.query(5000, 6000, 60)
+    assert history.buckets == []
+
+
+@pytest.mark.asyncio
+async def test_history_query_redis_down(mock_redis_dsn, mock_redis_config, mocker):
+    """Test Redis failures surface as CacheServiceError."""
+    client = mocker.Mock()
+    client.xrange = mocker.AsyncMock(side_effect=ConnectionError())
+    mocker.patch("hivebox.cache.Redis.from_url", return_value=client)
+    service = HistoryService(CacheService(mock_redis_dsn, mock_redis_config))
+
+    with pytest.raises(CacheServiceError, match=CacheMessages.REDIS_CONN_FAIL):
+        await service.query(1000, 2000, 60)
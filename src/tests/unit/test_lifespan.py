@@ -2,16 +2,21 @@
 # pylint: disable=unused-import,protected-access, redefined-outer-name
 # ruff: noqa: F401, F811
 
+import httpx
 import pytest
 from fastapi import FastAPI
 from pytest_mock import MockerFixture
-from main import lifespan
+from hivebox import load_sensor_data
+from main import UpstreamConfig, create_http_client, lifespan
+from hivebox.broadcast import Broadcaster
+from hivebox.temperature import TemperatureService
 from hivebox.cache import CacheService, CacheMessages, CacheServiceError
 
 @pytest.mark.asyncio
 async def test_lifespan_cacheservice_attach_success(mocker):
     """Checks CacheService attaches to app.state on connect success."""
     MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    mocker.patch("main.RefreshService", autospec=True)
     mock_cache = MockCacheService.return_value
     mock_cache.connect = mocker.AsyncMock(return_value=None)
 
@@ -20,10 +25,13 @@ async def test_lifespan_cacheservice_attach_success(mocker):
         assert hasattr(app.state, "cache_svc")
         assert app.state.cache_svc is mock_cache
         mock_cache.connect.assert_awaited_once()
+        mock_cache.start_listener.assert_called_once()
+    mock_cache.close.assert_awaited_once()
 
 @pytest.mark.asyncio
 async def test_lifespan_cacheservice_connect_failure(mocker, capsys):
     MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    mocker.patch("main.RefreshService", autospec=True)
     mock_cache = MockCacheService.return_value
     mock_cache.connect = mocker.AsyncMock(side_effect=CacheServiceError)
 
@@ -33,4 +41,202 @@ async def test_lifespan_cacheservice_connect_failure(mocker, capsys):
         assert app.state.cache_svc is mock_cache
 
     captured = capsys.readouterr()
-    assert CacheMessages.REDIS_CONN_FAIL in captured.out
\ No newline at end of file
+    assert CacheMessages.REDIS_CONN_FAIL in captured.out
+
+@pytest.mark.asyncio
+async def test_lifespan_http_client_shared_and_closed(mocker):
+    """Checks one pooled client backs the app-scoped TemperatureService and is closed on shutdown."""
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    mocker.patch("main.RefreshService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+
+    app = FastAPI()
+    async with lifespan(app):
+        http_client = app.state.http_client
+        assert isinstance(http_client, httpx.AsyncClient)
+        assert isinstance(app.state.temp_svc, TemperatureService)
+        assert app.state.temp_svc.client is http_client
+        assert not http_client.is_closed
+    assert http_client.is_closed
+
+def test_create_http_client_http2_fallback(mocker, capsys):
+    """Checks HTTP/2 falls back to HTTP/1.1 when h2 is unavailable."""
+    real_client = httpx.AsyncClient
+    calls = []
+
+    def fake_client(**kwargs):
+        calls.append(kwargs)
+        if kwargs.get("http2"):
+            raise ImportError("h2 missing")
+        return real_client(**kwargs)
+
+    mocker.patch("main.httpx.AsyncClient", side_effect=fake_client)
+    client = create_http_client(UpstreamConfig(http2=True, max_connections=5))
+
+    assert isinstance(client, real_client)
+    assert calls[-1]["limits"].max_connections == 5
+    assert "HTTP/2 requested" in capsys.readouterr().out
+
+@pytest.mark.asyncio
+async def test_lifespan_shutdown_ends_streams(mocker):
+    """Checks shutdown tells open streams to finish before closing the services."""
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    mocker.patch("main.RefreshService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    broadcaster = Broadcaster()
+    streams = []
+    MockCacheService.return_value.close.side_effect = lambda: streams.append(queue.get_nowait())
+
+    app = FastAPI()
+    with broadcaster.subscribe() as queue:
+        async with lifespan(app):
+            assert queue.empty()
+    assert streams == [None]
+
+@pytest.mark.asyncio
+async def test_lifespan_refresher_started_and_stopped(mocker):
+    """Checks the background refresher runs for the lifetime of the app."""
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    MockRefreshService = mocker.patch("main.RefreshService", autospec=True)
+    mock_refresh = MockRefreshService.return_value
+
+    app = FastAPI()
+    async with lifespan(app):
+        assert app.state.refresh_svc is mock_refresh
+        mock_refresh.warm_up.assert_awaited_once_with(10.0)
+        mock_refresh.start.assert_called_once()
+        mock_refresh.stop.assert_not_awaited()
+    mock_refresh.stop.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_lifespan_refresher_disabled(mocker, monkeypatch):
+    """Checks zero refresh and warm-up settings disable both."""
+    monkeypatch.setenv("REFRESH_INTERVAL", "0")
+    monkeypatch.setenv("WARMUP_TIMEOUT", "0")
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    MockRefreshService = mocker.patch("main.RefreshService", autospec=True)
+
+    app = FastAPI()
+    async with lifespan(app):
+        assert app.state.refresh_svc is MockRefreshService.return_value
+    MockRefreshService.return_value.start.assert_not_called()
+    MockRefreshService.return_value.warm_up.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_lifespan_follower_worker_delegates_refresh(mocker, monkeypatch):
+    """Checks only the first worker of a pod runs the refresher and pools are split."""
+    monkeypatch.setenv("HIVEBOX_WORKER_ID", "2")
+    monkeypatch.setenv("HIVEBOX_WORKERS", "4")
+    monkeypatch.setenv("REDIS", '{"encoding": "utf-8", "decode_responses": true, '
+                                '"max_connections": 40}')
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    MockRefreshService = mocker.patch("main.RefreshService", autospec=True)
+
+    app = FastAPI()
+    async with lifespan(app):
+        assert MockRefreshService.call_args.kwargs["delegated"] is True
+        MockRefreshService.return_value.start.assert_not_called()
+    assert MockCacheService.call_args.args[1]["max_connections"] == 10
+
+@pytest.mark.asyncio
+async def test_lifespan_sensors_from_file(mocker, monkeypatch, tmp_path):
+    """Checks the sensor set is loaded from SENSORS_FILE when configured."""
+    sensors_file = tmp_path / "sensors.json"
+    sensors_file.write_text('{"box01": "sensor01", "box02": "sensor02"}')
+    monkeypatch.setenv("SENSORS_FILE", str(sensors_file))
+    monkeypatch.setenv("UPSTREAM", '{"concurrency": 3}')
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    mocker.patch("main.RefreshService", autospec=True)
+
+    app = FastAPI()
+    async with lifespan(app):
+        assert app.state.temp_svc.sensor_data == {"box01": "sensor01", "box02": "sensor02"}
+        assert app.state.temp_svc.concurrency == 3
+
+@pytest.mark.asyncio
+async def test_lifespan_box_locations(mocker, monkeypatch, tmp_path):
+    """Checks box locations from BOX_LOCATIONS_FILE are indexed for regional queries."""
+    locations_file = tmp_path / "locations.json"
+    locations_file.write_text('{"box01": [7.6, 51.9], "box02": [13.4, 52.5]}')
+    monkeypatch.setenv("BOX_LOCATIONS_FILE", str(locations_file))
+    monkeypatch.setenv("GEO", '{"cell_size": 1, "region_ttl": 60}')
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    mocker.patch("main.RefreshService", autospec=True)
+
+    app = FastAPI()
+    async with lifespan(app):
+        region_svc = app.state.region_svc
+        assert len(region_svc.index) == 2
+        assert region_svc.index.cell_size == 1
+        assert region_svc.ttl == 60
+
+@pytest.mark.asyncio
+async def test_lifespan_discovery(mocker, monkeypatch):
+    """Checks discovery resolves the configured boxes, starting from the stored catalog."""
+    monkeypatch.setenv("SENSORS", '{"box01": "sensor01", "box02": "sensor02"}')
+    monkeypatch.setenv("DISCOVERY", '{"enabled": true, "interval": 3600}')
+    monkeypatch.setenv("HIVEBOX_WORKER_ID", "1")
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    mocker.patch("main.RefreshService", autospec=True)
+    MockDiscoveryService = mocker.patch("main.DiscoveryService", autospec=True)
+    discovery = MockDiscoveryService.return_value
+    discovery.load = mocker.AsyncMock(return_value="catalog")
+
+    app = FastAPI()
+    async with lifespan(app):
+        kwargs = MockDiscoveryService.call_args.kwargs
+        assert kwargs["boxes"] == ["box01", "box02"]
+        assert kwargs["interval"] == 3600
+        assert kwargs["discover"] is False
+        assert kwargs["region_svc"] is app.state.region_svc
+        discovery.apply.assert_called_once_with("catalog")
+        discovery.start.assert_called_once()
+    discovery.stop.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_lifespan_rate_limit(mocker, monkeypatch):
+    """Checks upstream calls are rate limited through Redis when a rate is set."""
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    mocker.patch("main.RefreshService", autospec=True)
+
+    app = FastAPI()
+    async with lifespan(app):
+        assert app.state.temp_svc.limiter is None
+
+    monkeypatch.setenv("UPSTREAM_RATE_LIMIT", '{"rate": 2, "burst": 4}')
+    async with lifespan(app):
+        limiter = app.state.temp_svc.limiter
+        assert (limiter.rate, limiter.burst, limiter.prefetch) == (2, 4, 4)
+        assert limiter.local_rate == 2
+
+    monkeypatch.setenv("UPSTREAM_RATE_LIMIT", '{"rate": 12, "replicas": 3}')
+    monkeypatch.setenv("HIVEBOX_WORKERS", "2")
+    async with lifespan(app):
+        assert app.state.temp_svc.limiter.local_rate == 2
+        assert limiter.cache_svc is MockCacheService.return_value
+
+@pytest.mark.asyncio
+async def test_lifespan_sensors_from_env(mocker, monkeypatch):
+    """Checks the sensor set can be given inline through SENSORS."""
+    monkeypatch.setenv("SENSORS", '{"box01": "sensor01"}')
+    MockCacheService = mocker.patch("main.CacheService", autospec=True)
+    MockCacheService.return_value.connect = mocker.AsyncMock(return_value=None)
+    mocker.patch("main.RefreshService", autospec=True)
+
+    app = FastAPI()
+    async with lifespan(app):
+        assert app.state.temp_svc.sensor_data == {"box01": "sensor01"}
+
+def test_load_sensor_data_rejects_malformed(tmp_path):
+    """Checks files that are not an ID-to-ID mapping are rejected."""
+    sensors_file = tmp_path / "sensors.json"
+    sensors_file.write_text('["box01", "sensor01"]')
+    with pytest.raises(ValueError):
+        load_sensor_data(sensors_file)
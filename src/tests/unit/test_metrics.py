@@ -0,0 +1,27 @@
+"""Test suite for metrics module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+from prometheus_client import REGISTRY, generate_latest
+
+from hivebox import metrics
+
+
+def test_registry_single_process(monkeypatch):
+    """Test the default registry is exposed without a multiprocess directory."""
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    assert metrics.registry() is REGISTRY
+    metrics.mark_process_dead()
+
+
+def test_registry_multiprocess(monkeypatch, tmp_path, mocker):
+    """Test workers' sample files are merged and dead workers are marked."""
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    registry = metrics.registry()
+
+    assert registry is not REGISTRY
+    assert generate_latest(registry) == b""
+
+    mark = mocker.patch("hivebox.metrics.multiprocess.mark_process_dead")
+    metrics.mark_process_dead()
+    mark.assert_called_once()
@@ -0,0 +1,183 @@
+"""Test suite for the upstream RateLimiter module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import asyncio
+import time
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from hivebox.cache import CacheServiceError
+from hivebox.ratelimit import RateLimitedError, RateLimiter
+from hivebox.temperature import TemperatureService
+from tests.fixtures.temperature_fixtures import (
+    mock_sensor_data,
+    mock_sensor_responses,
+    mock_sensor_transport
+)
+
+
+class SharedBucket:
+    """In-memory stand-in for the Redis token bucket script."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.calls = 0
+        self.error = None
+
+    def bucket_key(self, name):
+        return f"ratelimit:{name}"
+
+    async def take_tokens(self, key, rate, burst, count):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        granted = min(count, int(tokens))
+        self.buckets[key] = (tokens - granted, now)
+        return granted, 0.0 if granted else (1 - (tokens - granted)) / rate
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def bucket():
+    """Return a token bucket shared by the limiters of several replicas."""
+    return SharedBucket()
+
+
+@pytest.mark.asyncio
+async def test_acquire_prefetches_tokens(bucket):
+    """Test tokens are taken from the shared bucket a batch at a time."""
+    limiter = RateLimiter(bucket, rate=100, burst=20, prefetch=5)
+    before = _sample("hivebox_rate_limit_tokens_total", {"source": "redis"})
+
+    for _ in range(10):
+        await limiter.acquire()
+
+    assert bucket.calls == 2
+    assert _sample("hivebox_rate_limit_tokens_total", {"source": "redis"}) == before + 10
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_refill(bucket):
+    """Test an empty bucket delays the call until a token is due."""
+    limiter = RateLimiter(bucket, rate=50, burst=1, prefetch=1, max_wait=1)
+    delayed = _sample("hivebox_upstream_throttled_total", {"outcome": "delayed"})
+    await limiter.acquire()
+
+    start = time.monotonic()
+    await limiter.acquire()
+
+    assert time.monotonic() - start >= 0.015
+    assert _sample("hivebox_upstream_throttled_total", {"outcome": "delayed"}) == delayed + 1
+
+
+@pytest.mark.asyncio
+async def test_acquire_rejects_after_max_wait(mocker):
+    """Test a call is rejected instead of waiting past max_wait."""
+    cache_svc = mocker.Mock()
+    cache_svc.take_tokens = mocker.AsyncMock(return_value=(0, 10.0))
+    limiter = RateLimiter(cache_svc, rate=0.1, max_wait=0.05)
+    rejected = _sample("hivebox_upstream_throttled_total", {"outcome": "rejected"})
+
+    with pytest.raises(RateLimitedError):
+        await limiter.acquire()
+    assert _sample("hivebox_upstream_throttled_total", {"outcome": "rejected"}) == rejected + 1
+
+
+@pytest.mark.asyncio
+async def test_acquire_without_waiting(mocker):
+    """Test max_wait=0 takes an available token and rejects only when there is none."""
+    cache_svc = mocker.Mock()
+    cache_svc.take_tokens = mocker.AsyncMock(side_effect=[(1, 0.0), (0, 1.0)])
+    limiter = RateLimiter(cache_svc, rate=1, max_wait=0)
+
+    await limiter.acquire()
+    with pytest.raises(RateLimitedError):
+        await limiter.acquire()
+    assert cache_svc.take_tokens.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_replicas_share_budget(bucket):
+    """Test replicas together never exceed the burst plus the refill rate."""
+    replicas = [RateLimiter(bucket, rate=20, burst=6, prefetch=2, max_wait=0.02)
+                for _ in range(3)]
+    granted = 0
+
+    async def call(limiter):
+        nonlocal granted
+        try:
+            await limiter.acquire()
+            granted += 1
+        except RateLimitedError:
+            pass
+
+    start = time.monotonic()
+    await asyncio.gather(*(call(limiter) for limiter in replicas for _ in range(10)))
+
+    assert 6 <= granted <= 6 + 20 * (time.monotonic() - start) + 1
+
+
+@pytest.mark.asyncio
+async def test_prefetched_tokens_expire(bucket):
+    """Test unspent prefetched tokens are not kept past their refill time."""
+    limiter = RateLimiter(bucket, rate=1000, burst=10, prefetch=10)
+    await limiter.acquire()
+    assert limiter.tokens == 9
+
+    await asyncio.sleep(0.02)
+    await limiter.acquire()
+
+    assert bucket.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_acquire_falls_back_to_local_bucket(bucket):
+    """Test the limiter keeps limiting on its own while Redis is down."""
+    bucket.error = CacheServiceError("down")
+    limiter = RateLimiter(bucket, rate=1, burst=2, prefetch=1, max_wait=0.05)
+    before = _sample("hivebox_rate_limit_tokens_total", {"source": "local"})
+
+    await limiter.acquire()
+    await limiter.acquire()
+    with pytest.raises(RateLimitedError):
+        await limiter.acquire()
+    assert _sample("hivebox_rate_limit_tokens_total", {"source": "local"}) == before + 2
+
+
+@pytest.mark.asyncio
+async def test_local_bucket_split_across_replicas(bucket):
+    """Test each replica's fallback bucket gets only its share of the budget."""
+    bucket.error = CacheServiceError("down")
+    limiter = RateLimiter(bucket, rate=4, burst=8, prefetch=1, max_wait=0.05, replicas=4)
+
+    await limiter.acquire()
+    await limiter.acquire()
+    with pytest.raises(RateLimitedError):
+        await limiter.acquire()
+    assert limiter.local_rate == 1
+
+
+@pytest.mark.asyncio
+async def test_temperature_service_takes_tokens(mocker, mock_sensor_data, mock_sensor_responses,
+                                                mock_sensor_transport):
+    """Test every upstream request takes a token and rate limited sensors are skipped."""
+    limiter = mocker.Mock()
+    limiter.acquire = mocker.AsyncMock(
+        side_effect=[None, None, RateLimitedError("No upstream call token within 5s")])
+    transport = mock_sensor_transport(mock_sensor_responses)
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client, concurrency=1, limiter=limiter)
+        result = await service.get_average_temperature()
+
+    assert limiter.acquire.await_count == 3
+    assert (result.sensors, result.degraded) == (2, True)
+    assert "No upstream call token" in service.errors["tempSensor03"]
@@ -0,0 +1,295 @@
+"""Test suite for background RefreshService module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import asyncio
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+import pytest
+from prometheus_client import CollectorRegistry, multiprocess
+
+from hivebox.cache import CacheServiceError
+from hivebox.refresh import RefreshService
+from hivebox.temperature import SensorReading, TemperatureResult, TemperatureServiceError
+from tests.fixtures.cache_fixtures import mock_cache_svc, mock_deserialized_cache_data
+
+
+@pytest.fixture
+def mock_readings():
+    """Return readings as produced by TemperatureService.refresh_readings."""
+    return [SensorReading(sensor_id="tempSensor01", value=14.8,
+                          timestamp=datetime.now(timezone.utc))]
+
+
+@pytest.fixture
+def mock_temp_svc(mocker, mock_readings, mock_deserialized_cache_data):
+    """Return a temperature service mock aggregating to the cached fixture."""
+    temp_svc = mocker.Mock()
+    temp_svc.sensor_data = {"senseBox01": "tempSensor01"}
+    temp_svc.refresh_readings = mocker.AsyncMock(return_value=mock_readings)
+    temp_svc.current_readings.return_value = mock_readings
+    temp_svc.aggregate.return_value = mock_deserialized_cache_data
+    return temp_svc
+
+
+@pytest.mark.asyncio
+async def test_refresh_updates_cache(mock_temp_svc, mock_cache_svc, mock_readings,
+                                     mock_deserialized_cache_data):
+    """Test refresh() computes a result and writes it with its readings to the cache."""
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    result = await service.refresh()
+
+    assert result is mock_deserialized_cache_data
+    mock_temp_svc.aggregate.assert_called_once_with(mock_readings)
+    mock_temp_svc.refresh_readings.assert_awaited_once_with(until_quorum=True)
+    mock_cache_svc.update.assert_awaited_once_with(mock_deserialized_cache_data, mock_readings)
+    mock_cache_svc.release_lease.assert_awaited_once_with("token", None)
+
+
+@pytest.mark.asyncio
+async def test_refresh_cache_error_still_returns(mocker, mock_temp_svc, mock_cache_svc,
+                                                 mock_deserialized_cache_data, capsys):
+    """Test a failed cache write is reported but the fresh result is kept."""
+    mock_cache_svc.update = mocker.AsyncMock(side_effect=CacheServiceError("down"))
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    assert await service.refresh() is mock_deserialized_cache_data
+    assert "Cache update error: down" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_run_survives_upstream_errors(mocker, mock_temp_svc, mock_cache_svc, mock_readings):
+    """Test the loop keeps refreshing after an upstream failure."""
+    outcomes = iter([TemperatureServiceError("upstream down")])
+
+    async def fetch(**kwargs):
+        outcome = next(outcomes, mock_readings)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    mock_temp_svc.refresh_readings = mocker.AsyncMock(side_effect=fetch)
+    updated = asyncio.Event()
+    mock_cache_svc.update = mocker.AsyncMock(side_effect=lambda *args: updated.set())
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 0)
+    service.start()
+    await asyncio.wait_for(updated.wait(), timeout=1)
+    await service.stop()
+
+    assert mock_temp_svc.refresh_readings.await_count >= 2
+    assert service.task is None
+
+
+@pytest.mark.asyncio
+async def test_run_survives_unexpected_errors(mocker, mock_temp_svc, mock_cache_svc,
+                                              mock_readings, capsys):
+    """Test an unexpected exception is logged and the loop stays running."""
+    outcomes = iter([ValueError("bug")])
+
+    async def fetch(**kwargs):
+        outcome = next(outcomes, mock_readings)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    mock_temp_svc.refresh_readings = mocker.AsyncMock(side_effect=fetch)
+    updated = asyncio.Event()
+    mock_cache_svc.update = mocker.AsyncMock(side_effect=lambda *args: updated.set())
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 0)
+    service.start()
+    await asyncio.wait_for(updated.wait(), timeout=1)
+    assert service.running
+    await service.stop()
+
+    assert "Unexpected background refresh error: ValueError('bug')" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_start_is_idempotent(mocker, mock_temp_svc, mock_cache_svc):
+    """Test start() does not spawn a second loop while one is running."""
+    mock_temp_svc.refresh_readings = mocker.AsyncMock(
+        side_effect=TemperatureServiceError("upstream down"))
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+
+    service.start()
+    task = service.task
+    service.start()
+    assert service.task is task
+    assert service.running
+    await service.stop()
+    assert not service.running
+
+
+@pytest.mark.asyncio
+async def test_refresh_coalesces_concurrent_callers(mocker, mock_temp_svc, mock_cache_svc,
+                                                    mock_readings, mock_deserialized_cache_data):
+    """Test concurrent misses in one process trigger a single upstream fetch."""
+    release = asyncio.Event()
+
+    async def fetch(**kwargs):
+        await release.wait()
+        return mock_readings
+
+    mock_temp_svc.refresh_readings = mocker.AsyncMock(side_effect=fetch)
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+
+    waiters = [asyncio.create_task(service.refresh()) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert all(r is mock_deserialized_cache_data for r in results)
+    mock_temp_svc.refresh_readings.assert_awaited_once()
+    mock_cache_svc.acquire_lease.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_refresh_waits_for_peer_lease(mocker, mock_temp_svc, mock_cache_svc,
+                                            mock_deserialized_cache_data):
+    """Test a replica without the lease reuses the peer's cached result."""
+    mock_cache_svc.acquire_lease = mocker.AsyncMock(return_value=None)
+    mock_cache_svc.fetch = mocker.AsyncMock(side_effect=[
+        CacheServiceError("miss"), mock_deserialized_cache_data])
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    service.poll_interval = 0
+    result = await service.refresh()
+
+    assert result is mock_deserialized_cache_data
+    mock_temp_svc.refresh_readings.assert_not_awaited()
+    mock_cache_svc.fetch.assert_awaited_with(allow_stale=True)
+    mock_cache_svc.release_lease.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_refresh_peer_timeout_computes_locally(mocker, mock_temp_svc, mock_cache_svc,
+                                                     mock_deserialized_cache_data):
+    """Test a replica computes itself when the lease holder never delivers."""
+    mock_cache_svc.acquire_lease = mocker.AsyncMock(return_value=None)
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60, lease_wait=0)
+    result = await service.refresh()
+
+    assert result is mock_deserialized_cache_data
+    mock_temp_svc.refresh_readings.assert_awaited_once()
+    mock_cache_svc.release_lease.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_refresh_without_redis_computes_locally(mocker, mock_temp_svc, mock_cache_svc,
+                                                      mock_deserialized_cache_data):
+    """Test an unreachable Redis does not block recomputation."""
+    mock_cache_svc.acquire_lease = mocker.AsyncMock(side_effect=CacheServiceError("down"))
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    assert await service.refresh() is mock_deserialized_cache_data
+    mock_cache_svc.release_lease.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_refresh_seeds_from_cached_readings(mocker, mock_temp_svc, mock_cache_svc,
+                                                  mock_readings):
+    """Test readings stored by other replicas are adopted before fetching."""
+    mock_cache_svc.fetch_readings = mocker.AsyncMock(
+        return_value={"tempSensor01": mock_readings[0]})
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    await service.refresh()
+
+    mock_cache_svc.fetch_readings.assert_awaited_once()
+    assert list(mock_cache_svc.fetch_readings.await_args.args[0]) == ["tempSensor01"]
+    mock_temp_svc.seed.assert_called_once()
+    assert list(mock_temp_svc.seed.call_args.args[0]) == mock_readings
+
+
+@pytest.mark.asyncio
+async def test_refresh_stores_only_changed_readings(mocker, mock_temp_svc, mock_cache_svc,
+                                                    mock_readings, mock_deserialized_cache_data):
+    """Test unchanged sensors are aggregated from kept state but not rewritten."""
+    mock_temp_svc.refresh_readings = mocker.AsyncMock(return_value=[])
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    await service.refresh()
+
+    mock_temp_svc.aggregate.assert_called_once_with(mock_readings)
+    mock_cache_svc.update.assert_awaited_once_with(mock_deserialized_cache_data, [])
+
+
+@pytest.mark.asyncio
+async def test_delegated_reports_running_without_loop(mock_temp_svc, mock_cache_svc):
+    """Test a follower worker serves stale values without running its own loop."""
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60, delegated=True)
+    assert service.running
+    assert service.task is None
+
+
+@pytest.mark.asyncio
+async def test_warm_up_from_cache(mocker, mock_temp_svc, mock_cache_svc,
+                                  mock_deserialized_cache_data):
+    """Test warm-up loads the cached result without recomputing."""
+    mock_cache_svc.fetch = mocker.AsyncMock(return_value=mock_deserialized_cache_data)
+
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    assert await service.warm_up(1) is True
+    mock_cache_svc.fetch.assert_awaited_once_with(allow_stale=True)
+    mock_temp_svc.refresh_readings.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_computes_on_miss(mock_temp_svc, mock_cache_svc,
+                                        mock_deserialized_cache_data):
+    """Test warm-up computes and stores a result when nothing is cached."""
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    assert await service.warm_up(1) is True
+    mock_cache_svc.update.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_bounded(mocker, mock_temp_svc, mock_cache_svc, capsys):
+    """Test a slow or failing upstream leaves the service cold instead of blocking."""
+    async def hang(**kwargs):
+        await asyncio.Event().wait()
+
+    mock_temp_svc.refresh_readings = mocker.AsyncMock(side_effect=hang)
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    assert await service.warm_up(0.01) is False
+    assert "Warm-up did not finish" in capsys.readouterr().out
+
+    mock_temp_svc.refresh_readings = mocker.AsyncMock(
+        side_effect=TemperatureServiceError("upstream down"))
+    service = RefreshService(mock_temp_svc, mock_cache_svc, 60)
+    assert await service.warm_up(1) is False
+    assert not service.warm
+
+
+REFRESH_WORKER = """
+import asyncio, sys
+from datetime import datetime, timezone
+from unittest import mock
+from hivebox.refresh import RefreshService
+from hivebox.temperature import SensorReading
+
+readings = [SensorReading(sensor_id="tempSensor01", value=14.8,
+                          timestamp=datetime.fromtimestamp(1747774970, timezone.utc))]
+temp_svc = mock.Mock(sensor_data={"senseBox01": "tempSensor01"})
+temp_svc.refresh_readings = mock.AsyncMock(return_value=readings)
+temp_svc.current_readings.return_value = readings
+cache_svc = mock.AsyncMock()
+cache_svc.fetch_readings.return_value = {}
+asyncio.run(RefreshService(temp_svc, cache_svc, 60, delegated=sys.argv[1] == "1").refresh())
+"""
+
+
+def test_oldest_reading_across_workers(tmp_path, monkeypatch):
+    """Test the pod reports the leader's oldest reading, not a follower's unset 0."""
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    for delegated in ("0", "1"):
+        subprocess.run([sys.executable, "-c", REFRESH_WORKER, delegated], check=True,
+                       cwd=Path(__file__).parents[2])
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, str(tmp_path))
+    assert registry.get_sample_value("hivebox_oldest_reading_timestamp_seconds") == 1747774970
@@ -0,0 +1,105 @@
+"""Test suite for the regional RegionService module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import asyncio
+import httpx
+import pytest
+
+from hivebox.cache import CachedResult, CacheServiceError
+from hivebox.geo import GeoIndex, Region
+from hivebox.region import EmptyRegionError, RegionService
+from hivebox.temperature import TemperatureService, TemperatureServiceError
+from tests.fixtures.cache_fixtures import mock_cache_svc
+from tests.fixtures.temperature_fixtures import (
+    mock_sensor_data,
+    mock_sensor_responses,
+    mock_sensor_transport
+)
+
+
+@pytest.fixture
+def mock_index():
+    """Return an index placing two boxes in Münster and one in Berlin."""
+    return GeoIndex({
+        "senseBox01": (7.62, 51.96),
+        "senseBox02": (7.60, 51.95),
+        "senseBox03": (13.40, 52.52),
+    })
+
+
+@pytest.fixture
+def region_svc(mock_sensor_data, mock_sensor_responses, mock_sensor_transport,
+               mock_cache_svc, mock_index):
+    """Return a RegionService whose upstream serves the sensor fixtures."""
+    transport = mock_sensor_transport(mock_sensor_responses)
+    temp_svc = TemperatureService(mock_sensor_data, httpx.AsyncClient(transport=transport))
+    return RegionService(temp_svc, mock_cache_svc, mock_index, ttl=120)
+
+
+@pytest.mark.asyncio
+async def test_fetch_averages_region_only(region_svc, mock_cache_svc):
+    """Test a miss fetches and averages only the region's sensors and caches them."""
+    cache, outcome = await region_svc.fetch(Region.circle(51.96, 7.62, 10))
+
+    assert outcome == "miss"
+    assert cache.result.value == 16.4
+    assert (cache.result.sensors, cache.result.total, cache.result.degraded) == (2, 2, False)
+    assert set(region_svc.temp_svc.readings) == {"tempSensor01", "tempSensor02"}
+    key, result, ttl, readings = mock_cache_svc.update_region.await_args.args
+    assert key == "temp:region:circle:51.96,7.62,10"
+    assert ttl == 120
+    assert {r.sensor_id for r in readings} == {"tempSensor01", "tempSensor02"}
+    mock_cache_svc.fetch_readings.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached_region(mocker, region_svc, mock_cache_svc):
+    """Test a cached region is served without touching upstream."""
+    cached = CachedResult(None, b'{"value":16.4}')
+    mock_cache_svc.fetch_cached = mocker.AsyncMock(return_value=cached)
+    cache, outcome = await region_svc.fetch(Region.bbox(7, 51, 8, 52))
+
+    assert (cache, outcome) == (cached, "hit")
+    mock_cache_svc.fetch_cached.assert_awaited_once_with(
+        allow_stale=True, key="temp:region:bbox:7,51,8,52")
+    assert not region_svc.temp_svc.readings
+
+
+@pytest.mark.asyncio
+async def test_fetch_empty_region(region_svc):
+    """Test a region without boxes is an error rather than a global average."""
+    with pytest.raises(EmptyRegionError, match="No senseBoxes"):
+        await region_svc.fetch(Region.bbox(-10, -10, -5, -5))
+
+
+@pytest.mark.asyncio
+async def test_fetch_ignores_unconfigured_boxes(region_svc):
+    """Test located boxes without a configured sensor are skipped."""
+    region_svc.index.add("senseBox99", 51.96, 7.62)
+    assert region_svc.sensors(Region.circle(51.96, 7.62, 10)) == {
+        "senseBox01": "tempSensor01", "senseBox02": "tempSensor02"}
+
+
+@pytest.mark.asyncio
+async def test_fetch_coalesces_and_survives_cache_errors(region_svc, mock_cache_svc,
+                                                         mock_sensor_transport,
+                                                         mock_sensor_responses):
+    """Test concurrent misses share one computation even when Redis is down."""
+    calls = []
+    transport = mock_sensor_transport(mock_sensor_responses)
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return transport.handle_request(request)
+
+    region_svc.temp_svc.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mock_cache_svc.fetch_readings.side_effect = CacheServiceError("down")
+    mock_cache_svc.update_region.side_effect = CacheServiceError("down")
+    region = Region.bbox(7, 51, 8, 52)
+
+    results = await asyncio.gather(*(region_svc.fetch(region) for _ in range(5)))
+
+    assert len(calls) == 2
+    assert {cache.result.value for cache, _ in results} == {16.4}
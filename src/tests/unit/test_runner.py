@@ -0,0 +1,84 @@
+"""Test suite for the production runner module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import pytest
+import uvicorn
+
+from hivebox.broadcast import Broadcaster
+from hivebox.runner import Server, Supervisor, cpu_quota, worker_count
+
+
+@pytest.mark.parametrize("files,expected", [
+    ({"cpu.max": "150000 100000\n"}, 1.5),
+    ({"cpu/cpu.cfs_quota_us": "300000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 3.0),
+])
+def test_cpu_quota_from_cgroup(tmp_path, files, expected):
+    """Test cgroup v2 and v1 CPU limits are read."""
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    assert cpu_quota(tmp_path) == expected
+
+
+@pytest.mark.parametrize("files", [
+    {"cpu.max": "max 100000\n"},
+    {"cpu/cpu.cfs_quota_us": "-1\n", "cpu/cpu.cfs_period_us": "100000\n"},
+    {},
+])
+def test_cpu_quota_unlimited_uses_cpu_count(tmp_path, mocker, files):
+    """Test an unlimited or missing quota falls back to the usable CPUs."""
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    mocker.patch("hivebox.runner.os.sched_getaffinity", return_value={0, 1, 2, 3}, create=True)
+    assert cpu_quota(tmp_path) == 4
+
+
+def test_worker_count(tmp_path):
+    """Test partial CPUs round up and WEB_CONCURRENCY takes precedence."""
+    (tmp_path / "cpu.max").write_text("20000 100000\n")
+    assert worker_count({}, tmp_path) == 1
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert worker_count({}, tmp_path) == 3
+    assert worker_count({"WEB_CONCURRENCY": "8"}, tmp_path) == 8
+    assert worker_count({"WEB_CONCURRENCY": "0"}, tmp_path) == 1
+
+
+@pytest.mark.asyncio
+async def test_server_shutdown_ends_streams_first(mocker):
+    """Test open streams are told to finish before uvicorn drains connections."""
+    broadcaster = Broadcaster()
+    with broadcaster.subscribe() as queue:
+        drain = mocker.patch("hivebox.runner.uvicorn.Server.shutdown",
+                             mocker.AsyncMock(side_effect=lambda **_: queue.get_nowait()))
+        await Server(uvicorn.Config("main:app")).shutdown()
+    drain.assert_awaited_once()
+    assert broadcaster.closed
+
+
+def test_worker_count_reads_environment(tmp_path, monkeypatch):
+    """Test WEB_CONCURRENCY is read when called, not when the module was imported."""
+    (tmp_path / "cpu.max").write_text("100000 100000\n")
+    monkeypatch.setenv("WEB_CONCURRENCY", "5")
+    assert worker_count(cgroup_root=tmp_path) == 5
+
+
+@pytest.mark.parametrize("error,status", [(None, 0), (RuntimeError("boom"), 1)])
+def test_worker_exit_status(mocker, error, status):
+    """Test a forked worker exits non-zero when the server crashes."""
+    mocker.patch("hivebox.runner.os.fork", return_value=0)
+    mocker.patch("hivebox.runner.signal.signal")
+    mocker.patch.dict("hivebox.runner.os.environ")
+    exit_ = mocker.patch("hivebox.runner.os._exit")
+    mocker.patch.object(Server, "run", side_effect=error)
+    supervisor = Supervisor(uvicorn.Config("main:app"), 2)
+
+    if error is None:
+        supervisor.spawn(0, mocker.Mock())
+    else:
+        with pytest.raises(RuntimeError):
+            supervisor.spawn(0, mocker.Mock())
+    exit_.assert_called_once_with(status)
@@ -0,0 +1,88 @@
+"""Test suite for SingleFlight request coalescing module."""
+# pylint: disable=unused-import,protected-access, redefined-outer-name
+# ruff: noqa: F401, F811
+
+import asyncio
+import pytest
+
+from hivebox.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_singleflight_coalesces_concurrent_calls():
+    """Test concurrent callers for one key share a single execution."""
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return 42
+
+    waiters = [asyncio.create_task(flight.do("temp", compute)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == [42] * 10
+    assert calls == 1
+    assert not flight.calls
+
+
+@pytest.mark.asyncio
+async def test_singleflight_distinct_keys_run_separately():
+    """Test different keys are not coalesced."""
+    flight = SingleFlight()
+
+    async def compute(value):
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(
+        flight.do("a", lambda: compute(1)),
+        flight.do("b", lambda: compute(2)))
+    assert results == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_singleflight_shares_exceptions_and_resets():
+    """Test a failure reaches every waiter and the next call starts fresh."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        if calls == 1:
+            raise ValueError("upstream down")
+        return "ok"
+
+    results = await asyncio.gather(
+        flight.do("temp", compute), flight.do("temp", compute),
+        return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert await flight.do("temp", compute) == "ok"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_singleflight_cancelled_waiter_keeps_call_alive():
+    """Test cancelling one waiter does not cancel the shared call."""
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("temp", compute))
+    second = asyncio.create_task(flight.do("temp", compute))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
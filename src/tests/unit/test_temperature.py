@@ -2,18 +2,21 @@
 # pylint: disable=unused-import,protected-access, redefined-outer-name
 # ruff: noqa: F401, F811
 
-import json
+import asyncio
+from datetime import datetime, timedelta, timezone
+import httpx
 import pytest
-import requests
 
 from tests.fixtures.temperature_fixtures import (
     mock_sensor_data,
     mock_sensor_responses,
     mock_sensor_responses_stale,
     mock_sensor_responses_invalid_json,
-    mock_sensor_responses_invalid_value
+    mock_sensor_responses_invalid_value,
+    mock_sensor_transport
 )
 from hivebox.temperature import (
+    SensorReading,
     TemperatureResult,
     TemperatureService,
     TemperatureServiceError
@@ -49,39 +52,53 @@ def test_determine_temperature_status(mock_sensor_data, temperature, expected_st
     assert status == expected_status
 
 
-def test_get_average_temperature(mock_sensor_data, mock_sensor_responses, mocker):
+@pytest.mark.asyncio
+async def test_get_average_temperature(mock_sensor_data, mock_sensor_responses,
+                                       mock_sensor_transport):
     """Test calculating average temperature from multiple sensor readings."""
-    mock_get = mocker.patch('requests.get')
-
-    mock_get.return_value.json.side_effect = [
-        mock_sensor_responses["tempSensor01"],
-        mock_sensor_responses["tempSensor02"],
-        mock_sensor_responses["tempSensor03"]
-    ]
-    mock_get.return_value.raise_for_status.return_value = None
-
-    service = TemperatureService(mock_sensor_data)
-    result = service.get_average_temperature()
+    transport = mock_sensor_transport(mock_sensor_responses)
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        result = await service.get_average_temperature()
 
     assert isinstance(result, TemperatureResult)
     assert isinstance(result.timestamp, int)
     assert result.value == 16.3
     assert result.status == "Good"
-    assert mock_get.call_count == 3
+    assert (result.sensors, result.total, result.degraded) == (3, 3, False)
 
 
-def test_fetch_readings_successful(mock_sensor_data, mock_sensor_responses, mocker):
-    """Test successful fetch of sensor readings."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.return_value.json.side_effect = [
-        mock_sensor_responses["tempSensor01"],
-        mock_sensor_responses["tempSensor02"],
-        mock_sensor_responses["tempSensor03"]
-    ]
-    mock_get.return_value.raise_for_status.return_value = None
+@pytest.mark.asyncio
+async def test_get_average_temperature_own_client(mock_sensor_data, mock_sensor_responses,
+                                                  mock_sensor_transport, mocker):
+    """Test a short-lived client is opened when none is injected."""
+    transport = mock_sensor_transport(mock_sensor_responses)
+    client = httpx.AsyncClient(transport=transport)
+    mock_client_cls = mocker.patch('hivebox.temperature.httpx.AsyncClient',
+                                   return_value=client)
 
     service = TemperatureService(mock_sensor_data)
-    readings = service._fetch_readings()
+    result = await service.get_average_temperature()
+
+    assert result.value == 16.3
+    mock_client_cls.assert_called_once()
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_fetch_readings_successful(mock_sensor_data, mock_sensor_responses,
+                                         mock_sensor_transport):
+    """Test successful fetch of sensor readings."""
+    requested = []
+    transport = mock_sensor_transport(mock_sensor_responses)
+
+    async def handler(request):
+        requested.append(request.url.path)
+        return transport.handler(request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        readings = await service.fetch_readings()
 
     assert len(readings) == 3
 
@@ -92,67 +109,322 @@ def test_fetch_readings_successful(mock_sensor_data, mock_sensor_responses, mock
         assert isinstance(reading.value, float)
         assert reading.sensor_id in ["tempSensor01", "tempSensor02", "tempSensor03"]
 
-    assert mock_get.call_count == 3
+    assert len(requested) == 3
 
 
-def test_fetch_readings_stale(mock_sensor_data, mock_sensor_responses_stale, mocker):
-    """Test behavior when all sensor readings are older than one hour."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.return_value.json.side_effect = [
-        mock_sensor_responses_stale["tempSensor01"],
-        mock_sensor_responses_stale["tempSensor02"],
-        mock_sensor_responses_stale["tempSensor03"]
-    ]
-    mock_get.return_value.raise_for_status.return_value = None
+@pytest.mark.asyncio
+async def test_fetch_readings_concurrent(mock_sensor_data, mock_sensor_responses):
+    """Test all sensors are requested concurrently rather than one at a time."""
+    in_flight = 0
+    peak = 0
 
-    service = TemperatureService(mock_sensor_data)
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        sensor_id = request.url.path.rsplit('/', 1)[-1]
+        return httpx.Response(200, json=mock_sensor_responses[sensor_id])
 
-    with pytest.raises(TemperatureServiceError) as e:
-        service._fetch_readings()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        readings = await service.fetch_readings()
+
+    assert len(readings) == 3
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_fetch_readings_stale(mock_sensor_data, mock_sensor_responses_stale,
+                                    mock_sensor_transport):
+    """Test behavior when all sensor readings are older than one hour."""
+    transport = mock_sensor_transport(mock_sensor_responses_stale)
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client)
+
+        with pytest.raises(TemperatureServiceError) as e:
+            await service.fetch_readings()
     assert str(e.value) == "All available readings are over 1 hour old"
 
 
-def test_fetch_readings_connection_error(mock_sensor_data, mocker):
-    """Test handling of connection errors during sensor reading fetch."""
-    mock_get = mocker.patch('requests.get')
-    mock_get.side_effect = requests.exceptions.ConnectionError()
-    service = TemperatureService(mock_sensor_data)
-    sensor_id = list(mock_sensor_data.values())[0]
+@pytest.mark.asyncio
+async def test_fetch_readings_connection_error(mock_sensor_data, mock_sensor_responses,
+                                               mock_sensor_transport):
+    """Test a failed sensor breaks a quorum that requires every sensor."""
+    payloads = dict(mock_sensor_responses)
+    payloads["tempSensor02"] = httpx.ConnectError("Connection refused")
+    transport = mock_sensor_transport(payloads)
 
-    with pytest.raises(TemperatureServiceError) as e:
-        service._fetch_readings()
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client, quorum=1.0)
+        with pytest.raises(TemperatureServiceError) as e:
+            await service.fetch_readings()
 
-    error_msg = str(e.value)
-    assert f"Failed to fetch data for sensor {sensor_id}" in error_msg
-    assert isinstance(mock_get.side_effect, requests.exceptions.ConnectionError)
+    assert "Only 2 of 3 sensors reported, 3 required" in str(e.value)
+    assert "Failed to fetch data for sensor tempSensor02" in str(e.value)
 
 
-def test_fetch_readings_invalid_json(mock_sensor_data, mock_sensor_responses_invalid_json, mocker):
-    """Test handling of invalid JSON responses from sensors."""
-    mock_get = mocker.patch('requests.get')
-    mock_response = mocker.Mock()
-    mock_response.json.side_effect = [
-        json.JSONDecodeError('Invalid JSON',
-        mock_sensor_responses_invalid_json["tempSensor01"], 0)
-    ]
-    mock_get.return_value = mock_response
+@pytest.mark.asyncio
+async def test_fetch_readings_partial_quorum(mock_sensor_data, mock_sensor_responses,
+                                            mock_sensor_transport):
+    """Test a failed sensor yields a degraded result when quorum is still met."""
+    payloads = dict(mock_sensor_responses)
+    payloads["tempSensor02"] = httpx.ConnectError("Connection refused")
+    transport = mock_sensor_transport(payloads)
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        result = await service.get_average_temperature()
+
+    assert (result.sensors, result.total, result.degraded) == (2, 3, True)
+    assert list(service.errors) == ["tempSensor02"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_readings_subset(mock_sensor_data, mock_sensor_responses,
+                                       mock_sensor_transport):
+    """Test a subset is refreshed and held to quorum on its own, errors included."""
+    payloads = dict(mock_sensor_responses)
+    payloads["tempSensor02"] = httpx.ConnectError("Connection refused")
+    subset = {"senseBox02": "tempSensor02", "senseBox03": "tempSensor03"}
+
+    async with httpx.AsyncClient(transport=mock_sensor_transport(payloads)) as client:
+        service = TemperatureService(mock_sensor_data, client, quorum=1.0)
+        changed = await service.refresh_readings(subset)
+
+    assert [r.sensor_id for r in changed] == ["tempSensor03"]
+    with pytest.raises(TemperatureServiceError, match="Only 1 of 2 sensors.*refused"):
+        service.current_readings(subset)
+    result = service.aggregate(service.current_readings({"senseBox03": "tempSensor03"}),
+                               total=1)
+    assert (result.value, result.sensors, result.total, result.degraded) == (16.2, 1, 1, False)
+
 
+def test_set_sensors_drops_old_state(mock_sensor_data):
+    """Test switching sensor sets keeps only the readings of sensors still in use."""
     service = TemperatureService(mock_sensor_data)
-    with pytest.raises(TemperatureServiceError) as e:
-        service._fetch_readings()
+    now = datetime.now(timezone.utc)
+    service.seed([SensorReading("tempSensor01", 15.0, now), SensorReading("tempSensor02", 16.0, now)])
+    service.errors = {"tempSensor02": "Connection refused"}
+
+    service.set_sensors({"senseBox01": "tempSensor01", "senseBox09": "tempSensor09"})
+
+    assert list(service.readings) == ["tempSensor01"]
+    assert not service.errors
+    with pytest.raises(TemperatureServiceError):
+        service.set_sensors({})
+
+
+@pytest.mark.asyncio
+async def test_fetch_readings_deadline(mock_sensor_data, mock_sensor_responses):
+    """Test a hanging sensor is dropped once the overall deadline passes."""
+    async def handler(request):
+        sensor_id = request.url.path.rsplit('/', 1)[-1]
+        if sensor_id == "tempSensor03":
+            await asyncio.Event().wait()
+        return httpx.Response(200, json=mock_sensor_responses[sensor_id])
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        service = TemperatureService(mock_sensor_data, client, deadline=0.05)
+        result = await asyncio.wait_for(service.get_average_temperature(), timeout=1)
+
+    assert (result.sensors, result.degraded) == (2, True)
+    assert "within the 0.05s deadline" in service.errors["tempSensor03"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_readings_until_quorum(mock_sensor_data, mock_sensor_responses):
+    """Test a refresh waited on by a request ends once quorum is met, well before the deadline."""
+    async def handler(request):
+        sensor_id = request.url.path.rsplit('/', 1)[-1]
+        if sensor_id == "tempSensor03":
+            await asyncio.Event().wait()
+        return httpx.Response(200, json=mock_sensor_responses[sensor_id])
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        service = TemperatureService(mock_sensor_data, client, deadline=10, quorum=0.6)
+        changed = await asyncio.wait_for(service.refresh_readings(until_quorum=True), timeout=1)
+
+    assert sorted(r.sensor_id for r in changed) == ["tempSensor01", "tempSensor02"]
+    assert "tempSensor03" not in service.errors
+    assert len(service.current_readings()) == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh_readings_until_quorum_already_met(mocker, mock_sensor_data,
+                                                        mock_sensor_responses):
+    """Test no sensor is fetched when a quorum is still current."""
+    async with httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json=mock_sensor_responses[
+                request.url.path.rsplit('/', 1)[-1]]))) as client:
+        service = TemperatureService(mock_sensor_data, client, report_interval=3600)
+        await service.refresh_readings({"senseBox01": "tempSensor01",
+                                        "senseBox02": "tempSensor02"})
+        get = mocker.spy(client, "get")
+        assert await service.refresh_readings(until_quorum=True) == []
+    get.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fetch_readings_http_error(mock_sensor_data):
+    """Test non-2xx upstream responses are reported as fetch failures."""
+    transport = httpx.MockTransport(lambda request: httpx.Response(404, json={}))
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        with pytest.raises(TemperatureServiceError) as e:
+            await service.fetch_readings()
+    assert "Failed to fetch data for sensor" in str(e.value)
+
+
+@pytest.mark.asyncio
+async def test_fetch_readings_invalid_json(mock_sensor_data, mock_sensor_responses_invalid_json,
+                                           mock_sensor_transport):
+    """Test handling of invalid JSON responses from sensors."""
+    transport = mock_sensor_transport(mock_sensor_responses_invalid_json)
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        with pytest.raises(TemperatureServiceError) as e:
+            await service.fetch_readings()
     assert "Invalid data received from sensor" in str(e.value)
 
 
-def test_fetch_readings_value_error(mock_sensor_data, mock_sensor_responses_invalid_value, mocker):
+@pytest.mark.asyncio
+async def test_fetch_readings_value_error(mock_sensor_data, mock_sensor_responses_invalid_value,
+                                          mock_sensor_transport):
     """Test handling of invalid temperature value responses."""
-    mock_get = mocker.patch('requests.get')
-    mock_response = mocker.Mock()
-    mock_response.json.return_value = mock_sensor_responses_invalid_value["tempSensor01"]
-    mock_response.raise_for_status.return_value = None
-    mock_get.return_value = mock_response
+    invalid = mock_sensor_responses_invalid_value["tempSensor01"]
+    transport = mock_sensor_transport({
+        "tempSensor01": invalid,
+        "tempSensor02": invalid,
+        "tempSensor03": invalid
+    })
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        with pytest.raises(TemperatureServiceError) as e:
+            await service.fetch_readings()
+    assert "Invalid data received from sensor" in str(e.value)
 
-    service = TemperatureService(mock_sensor_data)
 
+@pytest.mark.asyncio
+async def test_fetch_readings_nan_sensor_fails(mock_sensor_data, mock_sensor_responses,
+                                              mock_sensor_transport):
+    """Test a sensor reporting NaN counts as failed instead of poisoning the average."""
+    payloads = dict(mock_sensor_responses)
+    payloads["tempSensor03"] = {"lastMeasurement": {
+        **mock_sensor_responses["tempSensor03"]["lastMeasurement"], "value": "NaN"}}
+    async with httpx.AsyncClient(transport=mock_sensor_transport(payloads)) as client:
+        service = TemperatureService(mock_sensor_data, client)
+        result = await service.get_average_temperature()
+
+    assert (result.sensors, result.degraded) == (2, True)
+    assert "Invalid data received from sensor" in service.errors["tempSensor03"]
+
+
+def test_process_sensor_reading_missing_field(mock_sensor_data):
+    """Test responses without a last measurement are rejected as invalid data."""
+    service = TemperatureService(mock_sensor_data)
+    response = httpx.Response(200, json={"title": "Temperatur"})
     with pytest.raises(TemperatureServiceError) as e:
-        service._fetch_readings()
-    assert "Invalid data received from sensor" in str(e.value)
+        service._process_sensor_reading(response, "tempSensor01")
+    assert "Invalid data received from sensor tempSensor01" in str(e.value)
+
+
+@pytest.mark.asyncio
+async def test_refresh_readings_skips_sensors_not_due(mock_sensor_data, mock_sensor_responses,
+                                                      mock_sensor_transport):
+    """Test only sensors without a recent reading are requested again."""
+    requested = []
+    transport = mock_sensor_transport(mock_sensor_responses)
+
+    def handler(request):
+        requested.append(request.url.path.rsplit('/', 1)[-1])
+        return transport.handler(request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        service = TemperatureService(mock_sensor_data, client, report_interval=300)
+        first = await service.refresh_readings()
+        assert len(first) == 3
+
+        old = service.readings["tempSensor02"]
+        service.readings["tempSensor02"] = SensorReading(
+            sensor_id=old.sensor_id, value=old.value,
+            timestamp=old.timestamp - timedelta(minutes=10))
+        requested.clear()
+        changed = await service.refresh_readings()
+
+    assert requested == ["tempSensor02"]
+    assert [r.sensor_id for r in changed] == ["tempSensor02"]
+    assert len(service.current_readings()) == 3
+
+
+@pytest.mark.asyncio
+async def test_refresh_readings_unchanged_measurement(mock_sensor_data, mock_sensor_responses,
+                                                      mock_sensor_transport):
+    """Test a due sensor that has not published anything new is not reported as changed."""
+    transport = mock_sensor_transport(mock_sensor_responses)
+    async with httpx.AsyncClient(transport=transport) as client:
+        service = TemperatureService(mock_sensor_data, client, report_interval=0)
+        await service.refresh_readings()
+        changed = await service.refresh_readings()
+
+    assert changed == []
+    assert service.aggregate(service.current_readings()).value == 16.3
+
+
+def test_seed_keeps_newest_reading(mock_sensor_data):
+    """Test seeded readings only replace older kept readings."""
+    now = datetime.now(timezone.utc)
+    service = TemperatureService(mock_sensor_data)
+    service.readings["tempSensor01"] = SensorReading("tempSensor01", 15.0, now)
+
+    service.seed([
+        SensorReading("tempSensor01", 10.0, now - timedelta(minutes=5)),
+        SensorReading("tempSensor02", 20.0, now),
+    ])
+
+    assert service.readings["tempSensor01"].value == 15.0
+    assert service.readings["tempSensor02"].value == 20.0
+    assert not service._is_due("tempSensor02", now)
+    assert service._is_due("tempSensor03", now)
+
+
+@pytest.mark.asyncio
+async def test_fetch_readings_bounded_concurrency(mock_sensor_responses):
+    """Test large sensor sets never have more than `concurrency` requests in flight."""
+    sensor_data = {f"senseBox{i:03}": f"tempSensor{i:03}" for i in range(50)}
+    payload = mock_sensor_responses["tempSensor01"]
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return httpx.Response(200, json=payload)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        service = TemperatureService(sensor_data, client, concurrency=4)
+        readings = await service.fetch_readings()
+
+    assert len(readings) == 50
+    assert peak == 4
+
+@pytest.mark.asyncio
+async def test_fetch_readings_custom_base_url(mock_sensor_data, mock_sensor_responses):
+    """Test sensors are requested from the configured openSenseMap base URL."""
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, json=mock_sensor_responses[request.url.path.rsplit('/', 1)[-1]])
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        service = TemperatureService(mock_sensor_data, client, base_url="http://fake:9000")
+        await service.fetch_readings()
+
+    assert sorted(requested) == [
+        f"http://fake:9000/boxes/{box_id}/sensors/{sensor_id}"
+        for box_id, sensor_id in sorted(mock_sensor_data.items())]